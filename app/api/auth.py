@@ -1,23 +1,25 @@
 # Authentication API router
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime, timedelta
 
-from app.models.schemas import UserCreate, UserLogin, UserResponse, Token, TokenData
+from app.models.schemas import UserCreate, UserLogin, UserResponse, Token, TokenData, LogoutRequest, RefreshRequest
 from app.models.user import User, UserSession
 from app.core.database import get_db
-from app.services.auth_service import AuthService
+from app.api.deps import get_auth_service
+from app.core.tracing import span
+from app.services.auth_service import AuthService, PasswordPoolBusy
 
 router = APIRouter()
 security = HTTPBearer()
-auth_service = AuthService()
 
 # Dependency to get current user
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    auth_service: AuthService = Depends(get_auth_service)
 ) -> User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -26,11 +28,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token_data = auth_service.verify_token(credentials.credentials)
-    if token_data is None:
-        raise credentials_exception
-    
-    user = auth_service.get_user(db, username=token_data.username)
+    user = await auth_service.get_user_for_token(db, credentials.credentials)
     if user is None:
         raise credentials_exception
     
@@ -44,11 +42,15 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_db),
+    auth_service: AuthService = Depends(get_auth_service)
+):
     """Register a new user"""
     try:
         # Check if user already exists
-        existing_user = auth_service.get_user(db, user.username)
+        existing_user = await auth_service.get_user(db, user.username)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -56,7 +58,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             )
         
         # Check if email already exists
-        existing_email = db.query(User).filter(User.email == user.email).first()
+        existing_email = await auth_service.get_user_by_email(db, user.email)
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -64,7 +66,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             )
         
         # Create new user
-        db_user = auth_service.create_user(db, user)
+        db_user = await auth_service.create_user(db, user)
         
         return UserResponse(
             id=db_user.id,
@@ -78,6 +80,12 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent authentication requests",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -85,11 +93,15 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(
+    user_credentials: UserLogin,
+    db: AsyncSession = Depends(get_db),
+    auth_service: AuthService = Depends(get_auth_service)
+):
     """Login user and return tokens"""
     try:
         # Authenticate user
-        user = auth_service.authenticate_user(db, user_credentials.username, user_credentials.password)
+        user = await auth_service.authenticate_user(db, user_credentials.username, user_credentials.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -104,21 +116,23 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             )
         
         # Create tokens
-        access_token_expires = timedelta(minutes=auth_service.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = auth_service.create_access_token(
-            data={"sub": user.username, "user_id": user.id},
-            expires_delta=access_token_expires
-        )
-        
-        refresh_token = auth_service.create_refresh_token(
-            data={"sub": user.username, "user_id": user.id}
-        )
-        
-        # Update last login
-        auth_service.update_last_login(db, user)
+        with span("auth.create_tokens"):
+            access_token_expires = timedelta(minutes=auth_service.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+            access_token = auth_service.create_access_token(
+                data={"sub": user.username, "user_id": user.id},
+                expires_delta=access_token_expires
+            )
+            
+            refresh_token = auth_service.create_refresh_token(
+                data={"sub": user.username, "user_id": user.id}
+            )
         
-        # Create session
-        auth_service.create_session(db, user.id, refresh_token)
+        with span("auth.record_login"):
+            # Update last login
+            await auth_service.update_last_login(db, user)
+            
+            # Create session
+            await auth_service.create_session(db, user.id, refresh_token)
         
         return Token(
             access_token=access_token,
@@ -128,12 +142,57 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent authentication requests",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Login failed"
         )
 
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    request: RefreshRequest,
+    db: AsyncSession = Depends(get_db),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Exchange a refresh token for new tokens; the old refresh token stops working"""
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    # Revoked tokens still go through rotate_session, which treats a replay as theft
+    token_data = auth_service.verify_token(request.refresh_token, token_type="refresh")
+    if token_data is None:
+        raise invalid_token
+    
+    user = await auth_service.get_cached_user(db, token_data.username)
+    if user is None or not user.is_active:
+        raise invalid_token
+    
+    # Rotate: the new refresh token replaces the old session atomically
+    token_claims = {"sub": user.username, "user_id": user.id}
+    refresh_token = auth_service.create_refresh_token(data=token_claims)
+    if not await auth_service.rotate_session(db, user.id, request.refresh_token, refresh_token):
+        raise invalid_token
+    
+    access_token = auth_service.create_access_token(
+        data=token_claims,
+        expires_delta=timedelta(minutes=auth_service.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    
+    return Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=auth_service.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """Get current user information"""
@@ -147,9 +206,52 @@ async def get_current_user_info(current_user: User = Depends(get_current_active_
         last_login=current_user.last_login
     )
 
+@router.post("/logout")
+async def logout(
+    request: LogoutRequest = LogoutRequest(),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Revoke the access token and end the refresh session"""
+    token_data = auth_service.verify_token(credentials.credentials)
+    if token_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+    
+    # Only a session of the user whose access token this is may be ended
+    if request.refresh_token:
+        refresh_data = auth_service.verify_token(
+            request.refresh_token, token_type="refresh"
+        )
+        if refresh_data is None or refresh_data.user_id != token_data.user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid refresh token"
+            )
+    
+    auth_service.revoke_token(credentials.credentials, token_data.exp)
+    if request.refresh_token:
+        await auth_service.deactivate_session(
+            db, request.refresh_token, token_data.user_id
+        )
+    
+    return {"status": "success", "message": "Logged out"}
+
+@router.get("/cache-stats")
+async def auth_cache_stats(
+    current_user: User = Depends(get_current_user),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Get token and user cache hit/miss metrics"""
+    return auth_service.get_cache_stats()
+
 @router.get("/verify")
 async def verify_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
 ):
     """Verify if token is valid"""
     token_data = auth_service.verify_token(credentials.credentials)
@@ -1,20 +1,23 @@
 # Camera API router
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas import CameraConfig
 from app.core.database import get_db
+from app.api.deps import get_camera_service, get_scene_monitor_service
 from app.services.camera_service import CameraService
+from app.services.scene_monitor_service import SceneMonitorService
 from app.api.auth import get_current_active_user
+from app.api.rate_limit import limit_by_ip
 from app.models.user import User
 
 router = APIRouter()
-camera_service = CameraService()
 
 
-@router.post("/start")
+@router.post("/start", dependencies=[Depends(limit_by_ip("camera"))])
 async def start_camera(
     config: CameraConfig,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    camera_service: CameraService = Depends(get_camera_service),
     # Temporarily remove auth requirement for testing
     # current_user: User = Depends(get_current_active_user)
 ):
@@ -29,9 +32,10 @@ async def start_camera(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/stop")
+@router.post("/stop", dependencies=[Depends(limit_by_ip("camera"))])
 async def stop_camera(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    camera_service: CameraService = Depends(get_camera_service),
     # Temporarily remove auth requirement for testing
     # current_user: User = Depends(get_current_active_user)
 ):
@@ -45,7 +49,8 @@ async def stop_camera(
 
 @router.get("/status")
 async def camera_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    camera_service: CameraService = Depends(get_camera_service),
     # Temporarily remove auth requirement for testing
     # current_user: User = Depends(get_current_active_user)
 ):
@@ -53,4 +58,13 @@ async def camera_status(
     return {
         "is_active": camera_service.is_active,
         "has_camera": camera_service.camera is not None,
+        "active_in_other_worker": camera_service.remote_active,
     }
+
+
+@router.get("/scene-monitor")
+async def scene_monitor_status(
+    scene_monitor: SceneMonitorService = Depends(get_scene_monitor_service),
+):
+    """Get automatic scene analysis settings, decisions and the latest result"""
+    return scene_monitor.get_status()
@@ -0,0 +1,44 @@
+# Dependencies handing routes the services built by the app lifespan
+from starlette.requests import HTTPConnection
+
+from app.services.auth_service import AuthService
+from app.services.camera_service import CameraService
+from app.services.container import ServiceContainer
+from app.services.llm_service import LLMService
+from app.services.scene_monitor_service import SceneMonitorService
+from app.services.upload_service import UploadService
+from app.services.video_service import VideoAnalysisService
+from app.services.websocket_service import WebSocketService
+
+
+# HTTPConnection covers both HTTP requests and WebSockets
+def get_services(connection: HTTPConnection) -> ServiceContainer:
+    return connection.app.state.services
+
+
+def get_auth_service(connection: HTTPConnection) -> AuthService:
+    return connection.app.state.services.auth
+
+
+def get_camera_service(connection: HTTPConnection) -> CameraService:
+    return connection.app.state.services.camera
+
+
+def get_llm_service(connection: HTTPConnection) -> LLMService:
+    return connection.app.state.services.llm
+
+
+def get_scene_monitor_service(connection: HTTPConnection) -> SceneMonitorService:
+    return connection.app.state.services.scene_monitor
+
+
+def get_upload_service(connection: HTTPConnection) -> UploadService:
+    return connection.app.state.services.upload
+
+
+def get_video_service(connection: HTTPConnection) -> VideoAnalysisService:
+    return connection.app.state.services.video
+
+
+def get_websocket_service(connection: HTTPConnection) -> WebSocketService:
+    return connection.app.state.services.websocket
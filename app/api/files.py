@@ -0,0 +1,71 @@
+# File upload API router
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app.api.auth import get_current_active_user
+from app.api.deps import get_llm_service, get_upload_service
+from app.api.rate_limit import limit_analysis_by_user, limit_by_user
+from app.models.schemas import UploadResponse
+from app.models.user import User
+from app.services.llm_service import LLMService
+from app.services.upload_service import (
+    InvalidUpload,
+    UnsupportedFileType,
+    UploadService,
+    UploadTooLarge,
+)
+
+router = APIRouter()
+
+
+@router.post(
+    "/upload",
+    response_model=UploadResponse,
+    # Analysis goes to the LLM, so it also draws on the "llm" limit
+    dependencies=[
+        Depends(limit_by_user("upload")),
+        Depends(limit_analysis_by_user("llm")),
+    ],
+)
+async def upload_file(
+    request: Request,
+    analyze: bool = False,
+    prompt: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    upload_service: UploadService = Depends(get_upload_service),
+    llm_service: LLMService = Depends(get_llm_service),
+):
+    """Stream a multipart 'file' field to disk, optionally analyzing an image"""
+    # The body is read here as a stream, never parsed into memory by FastAPI
+    try:
+        stored = await upload_service.save_stream(request.headers, request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    except UnsupportedFileType as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e)
+        )
+    except InvalidUpload as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    analysis = None
+    if analyze:
+        if stored.file_type.kind != "image":
+            upload_service.remove(stored)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Only images can be analyzed",
+            )
+        analysis = await llm_service.process_image_file(stored.path, prompt)
+
+    return UploadResponse(
+        file_id=stored.file_id,
+        filename=stored.filename,
+        content_type=stored.file_type.content_type,
+        kind=stored.file_type.kind,
+        size=stored.size,
+        analysis=analysis,
+    )
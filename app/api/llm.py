@@ -1,19 +1,21 @@
 # LLM API router
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas import LLMRequest, LLMTextRequest, LLMResponse
 from app.core.database import get_db
+from app.api.deps import get_llm_service
 from app.services.llm_service import LLMService
 from app.api.auth import get_current_active_user
+from app.api.rate_limit import limit_by_ip, limit_by_user
 from app.models.user import User
 
 router = APIRouter()
-llm_service = LLMService()
 
 
 @router.get("/status")
 async def llm_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service),
     # Temporarily remove auth requirement for testing
     # current_user: User = Depends(get_current_active_user)
 ):
@@ -29,10 +31,15 @@ async def llm_status(
         }
 
 
-@router.post("/process", response_model=LLMResponse)
+@router.post(
+    "/process",
+    response_model=LLMResponse,
+    dependencies=[Depends(limit_by_user("llm"))],
+)
 async def process_with_llm(
     request: LLMRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service),
     current_user: User = Depends(get_current_active_user),
 ):
     """Process image with LLM"""
@@ -45,10 +52,13 @@ async def process_with_llm(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/chat", response_model=LLMResponse)
+@router.post(
+    "/chat", response_model=LLMResponse, dependencies=[Depends(limit_by_ip("llm"))]
+)
 async def chat_with_llm(
     request: LLMTextRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service),
     # Temporarily remove auth requirement for testing
     # current_user: User = Depends(get_current_active_user),
 ):
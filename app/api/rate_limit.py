@@ -0,0 +1,57 @@
+# Rate-limit dependencies for API routes
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.api.auth import get_current_active_user
+from app.core.rate_limit import check_rate_limit
+from app.models.user import User
+
+
+def _enforce(route_class: str, key: str, response: Response):
+    result = check_rate_limit(route_class, key)
+    if result is None:
+        return
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=result.headers(),
+        )
+    response.headers.update(result.headers())
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(route_class: str):
+    """Dependency limiting a route class per client IP, for routes without auth"""
+
+    async def dependency(request: Request, response: Response):
+        _enforce(route_class, f"ip:{client_ip(request)}", response)
+
+    return dependency
+
+
+def limit_by_user(route_class: str):
+    """Dependency limiting a route class per authenticated user"""
+
+    async def dependency(
+        response: Response, current_user: User = Depends(get_current_active_user)
+    ):
+        _enforce(route_class, f"user:{current_user.id}", response)
+
+    return dependency
+
+
+def limit_analysis_by_user(route_class: str):
+    """Like limit_by_user, but only charged when the request sets ?analyze=true"""
+
+    async def dependency(
+        response: Response,
+        analyze: bool = False,
+        current_user: User = Depends(get_current_active_user),
+    ):
+        if analyze:
+            _enforce(route_class, f"user:{current_user.id}", response)
+
+    return dependency
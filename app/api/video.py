@@ -0,0 +1,88 @@
+# Video analysis API router
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.api.auth import get_current_active_user
+from app.api.deps import get_upload_service, get_video_service
+from app.api.rate_limit import limit_by_user
+from app.models.schemas import VideoJobRequest
+from app.models.user import User
+from app.services.upload_service import UploadService
+from app.services.video_service import VideoAnalysisService, VideoJob
+
+router = APIRouter()
+
+
+def _get_job(job_id: str, user: User, video_service: VideoAnalysisService) -> VideoJob:
+    job = video_service.get_job(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such job")
+    return job
+
+
+@router.post(
+    "/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_by_user("llm"))],
+)
+async def start_video_job(
+    request: VideoJobRequest,
+    current_user: User = Depends(get_current_active_user),
+    upload_service: UploadService = Depends(get_upload_service),
+    video_service: VideoAnalysisService = Depends(get_video_service),
+):
+    """Start analyzing an uploaded video; poll or stream the job for results"""
+    stored = upload_service.find(request.file_id)
+    if stored is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No such file"
+        )
+    if stored.file_type.kind != "video":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a video"
+        )
+    job = video_service.start_job(
+        current_user.id, stored.file_id, stored.path, request.prompt
+    )
+    return job.get_status()
+
+
+@router.get("/jobs/{job_id}")
+async def get_video_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    video_service: VideoAnalysisService = Depends(get_video_service),
+):
+    """Get a job's progress and the segments analyzed so far"""
+    return _get_job(job_id, current_user, video_service).get_status()
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_video_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    video_service: VideoAnalysisService = Depends(get_video_service),
+):
+    """Stream segments as newline-delimited JSON as each one is analyzed"""
+    job = _get_job(job_id, current_user, video_service)
+
+    async def events():
+        # Subscribe and snapshot together, so no segment is missed or repeated
+        queue = job.subscribe()
+        try:
+            for segment in list(job.segments):
+                yield json.dumps({"type": "segment", **segment}) + "\n"
+            if job.done:
+                yield json.dumps({"type": "done", **job.get_status()}) + "\n"
+                return
+            while True:
+                event = await queue.get()
+                yield json.dumps(event) + "\n"
+                if event["type"] == "done":
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -1,96 +1,219 @@
 # WebSocket API router
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from typing import Optional
 import asyncio
-import logging
-from app.services.camera_service import CameraService
+import base64
+import binascii
+from app.api.auth import get_current_active_user
+from app.api.deps import get_services, get_websocket_service
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+from app.core.tracing import client_trace_id, start_trace
+from app.models.schemas import AudioRequest
+from app.models.user import User
+from app.services.container import ServiceContainer
 from app.services.llm_service import LLMService
 from app.services.websocket_service import WebSocketService
 
 router = APIRouter()
-logger = logging.getLogger(__name__)
+hot_logger = get_hot_path_logger(__name__)
 
-camera_service = CameraService()
-llm_service = LLMService()
-websocket_service = WebSocketService()
+
+async def answer_llm_message(
+    llm_service: LLMService,
+    websocket_service: WebSocketService,
+    websocket: WebSocket,
+    data: dict,
+):
+    """Answer a process_image or chat_message request through the send queue
+
+    Runs as a task on the client's connection, so the receive loop keeps
+    reading pongs while the LLM works.
+    """
+    # Replies carry the trace ID (the client's, if it sent one)
+    with start_trace(
+        f"ws {data.get('type')}", client_trace_id(data.get("trace_id"))
+    ) as trace:
+        if data.get("type") == "process_image":
+            try:
+                hot_logger.debug(
+                    "Processing image with prompt: %s (%d chars of image data)",
+                    data.get("prompt", "No prompt"),
+                    len(data.get("image_data") or ""),
+                )
+
+                # Process image with LLM
+                result = await llm_service.process_image_with_llm(
+                    data.get("image_data"),
+                    data.get(
+                        "prompt",
+                        "Analyze this image and provide helpful insights.",
+                    ),
+                )
+
+                websocket_service.send_to(
+                    websocket,
+                    {
+                        "type": "llm_response",
+                        "data": result.dict(),
+                        "trace_id": trace.trace_id,
+                    },
+                )
+            except Exception as e:
+                hot_logger.error("LLM processing error: %s", e)
+                websocket_service.send_to(
+                    websocket,
+                    {
+                        "type": "error",
+                        "message": f"Failed to process image: {str(e)}",
+                        "trace_id": trace.trace_id,
+                    },
+                )
+
+        elif data.get("type") == "chat_message":
+            try:
+                # Process text-only message with LLM
+                result = await llm_service.process_text_with_llm(
+                    data.get("message", "")
+                )
+
+                websocket_service.send_to(
+                    websocket,
+                    {
+                        "type": "llm_response",
+                        "data": result.dict(),
+                        "trace_id": trace.trace_id,
+                    },
+                )
+            except Exception as e:
+                hot_logger.error("LLM text processing error: %s", e)
+                websocket_service.send_to(
+                    websocket,
+                    {
+                        "type": "error",
+                        "message": f"Failed to process message: {str(e)}",
+                        "trace_id": trace.trace_id,
+                    },
+                )
 
 
 @router.websocket("/")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket, services: ServiceContainer = Depends(get_services)
+):
     """WebSocket endpoint for real-time communication"""
+    llm_service = services.llm
+    websocket_service = services.websocket
     # Accept the WebSocket connection without any authentication checks
-    await websocket.accept()
-    websocket_service.add_client(websocket)
-    logger.info(
-        f"Client connected. Total clients: {len(websocket_service.connected_clients)}"
+    client = await websocket_service.accept(websocket)
+    if client is None:
+        return
+    hot_logger.info(
+        "Client connected. Total clients: %d", len(websocket_service.connected_clients)
     )
 
     try:
-        while True:
-            # Send camera frames to all connected clients (15 FPS)
-            if camera_service.is_active:
-                frame_data = await camera_service.capture_frame()
-                if frame_data:
-                    await websocket.send_json(
-                        {
-                            "type": "frame",
-                            "data": frame_data,
-                            "timestamp": asyncio.get_event_loop().time(),
-                        }
-                    )
-                    # Throttle to 15 FPS (66.67ms between frames)
-                    await asyncio.sleep(1 / 15)
-
-            # Process any incoming messages
+        while not client.closed:
+            # Camera frames arrive through the broadcast fan-out; this loop
+            # only handles incoming messages
             try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=0.1)
-
-                if data.get("type") == "process_image":
-                    try:
-                        # Process image with LLM
-                        result = await llm_service.process_image_with_llm(
-                            data.get("image_data"),
-                            data.get(
-                                "prompt",
-                                "Analyze this image and provide helpful insights.",
-                            ),
-                        )
-
-                        await websocket.send_json(
-                            {"type": "llm_response", "data": result.dict()}
-                        )
-                    except Exception as e:
-                        logger.error(f"LLM processing error: {e}")
-                        await websocket.send_json(
-                            {
-                                "type": "error",
-                                "message": f"Failed to process image: {str(e)}",
-                            }
-                        )
-                
-                elif data.get("type") == "chat_message":
-                    try:
-                        # Process text-only message with LLM
-                        result = await llm_service.process_text_with_llm(
-                            data.get("message", "")
-                        )
-
-                        await websocket.send_json(
-                            {"type": "llm_response", "data": result.dict()}
-                        )
-                    except Exception as e:
-                        logger.error(f"LLM text processing error: {e}")
-                        await websocket.send_json(
-                            {
-                                "type": "error",
-                                "message": f"Failed to process message: {str(e)}",
-                            }
-                        )
+                data = await asyncio.wait_for(
+                    websocket_service.receive(websocket), timeout=1.0
+                )
+
+                # Pongs only refresh liveness, which receive() already did
+                if not isinstance(data, dict) or data.get("type") not in (
+                    "process_image",
+                    "chat_message",
+                ):
+                    continue
+                if websocket_service.rate_limited(websocket, "llm"):
+                    continue
+
+                client.run(
+                    answer_llm_message(llm_service, websocket_service, websocket, data)
+                )
 
             except asyncio.TimeoutError:
                 continue
 
     except WebSocketDisconnect:
+        pass
+    finally:
         websocket_service.remove_client(websocket)
-        logger.info(
-            f"Client disconnected. Total clients: {len(websocket_service.connected_clients)}"
+        hot_logger.info(
+            "Client disconnected. Total clients: %d",
+            len(websocket_service.connected_clients),
         )
+
+
+@router.websocket("/audio")
+async def audio_endpoint(
+    websocket: WebSocket,
+    sample_rate: Optional[int] = Query(None, ge=8000, le=192000),
+    channels: Optional[int] = Query(None, ge=1, le=8),
+    services: ServiceContainer = Depends(get_services),
+):
+    """Stream 16-bit PCM in and get partial and final transcripts back"""
+    if not settings.MICROPHONE_ENABLED:
+        await websocket.close(code=1008, reason="Microphone input is disabled")
+        return
+    websocket_service = services.websocket
+    # Transcripts only; camera frames and broadcasts would crowd them out
+    client = await websocket_service.accept(websocket, broadcasts=False)
+    if client is None:
+        return
+    session = services.audio.open_session(
+        lambda message: websocket_service.send_to(websocket, message),
+        sample_rate,
+        channels,
+    )
+
+    try:
+        while not client.closed:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            if message["type"] == "websocket.disconnect":
+                break
+
+            # Binary frames are raw PCM, sent as-is from the microphone
+            if message.get("bytes") is not None:
+                client.touch(None)
+                session.feed(message["bytes"])
+                continue
+
+            data = websocket_service.decode(websocket, message)
+            if not isinstance(data, dict):
+                continue
+            if data.get("type") == "flush":
+                session.flush()
+            elif "audio_data" in data:
+                # Base64 chunks in an AudioRequest, for clients that only send text
+                try:
+                    request = AudioRequest(**data)
+                    if request.action != "transcribe":
+                        raise ValueError(f"Unsupported action '{request.action}'")
+                    session.feed(base64.b64decode(request.audio_data))
+                except (ValidationError, ValueError, binascii.Error) as e:
+                    websocket_service.send_to(
+                        websocket,
+                        {"type": "error", "message": f"Invalid audio message: {e}"},
+                    )
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await services.audio.close_session(session)
+        websocket_service.remove_client(websocket)
+
+
+@router.get("/stats")
+async def websocket_stats(
+    current_user: User = Depends(get_current_active_user),
+    websocket_service: WebSocketService = Depends(get_websocket_service),
+):
+    """Get per-client send queue and lag metrics, without client addresses"""
+    return websocket_service.get_stats()
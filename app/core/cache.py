@@ -0,0 +1,104 @@
+# In-process TTL cache
+import heapq
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live entry, or None on a miss"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value for ttl seconds (the cache default if not given)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove an entry and return its value"""
+        entry = self.entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ExpiringSet:
+    """Keys kept until their own expiry time, never evicted for space
+
+    For state that must hold for as long as it matters, like revoked tokens;
+    it grows only with keys that have not expired yet. Expired keys are
+    pruned, soonest expiry first, whenever one is added.
+    """
+
+    def __init__(self):
+        self.expires: Dict[str, float] = {}
+        self.heap: List[Tuple[float, str]] = []
+
+    def add(self, key: str, expires_at: float):
+        """Hold key until expires_at, a time.time() timestamp"""
+        self.prune()
+        if expires_at <= time.time() or self.expires.get(key, 0.0) >= expires_at:
+            return
+        self.expires[key] = expires_at
+        heapq.heappush(self.heap, (expires_at, key))
+
+    def __contains__(self, key: str) -> bool:
+        expires_at = self.expires.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        return len(self.expires)
+
+    def prune(self):
+        """Drop every key whose expiry has passed"""
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            # A key added again with a later expiry keeps its newer entry
+            if self.expires.get(key) == expires_at:
+                del self.expires[key]
@@ -11,6 +11,17 @@ class Settings(BaseSettings):
     DEBUG_MODE: bool = False
     LOG_LEVEL: str = "INFO"
 
+    # Logging (written by a background thread; see app/core/log.py)
+    LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    LOG_JSON: bool = False  # one JSON object per line instead of LOG_FORMAT
+    LOG_FILE: str = ""  # also write to this rotating file when set
+    LOG_MAX_SIZE: int = 10485760
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, not waited on
+    LOG_HOT_PATH_SAMPLE_RATE: float = 1.0
+    LOG_HOT_PATH_BURST: int = 10  # per message template per interval
+    LOG_HOT_PATH_INTERVAL: float = 10.0
+
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
@@ -20,6 +31,19 @@ class Settings(BaseSettings):
     # Database Configuration
     DATABASE_URL: str = "sqlite:///./ai_camera_assistant.db"
     DATABASE_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = False
+
+    # SQLite Profile ('tuned' applies the pragmas below, 'default' leaves SQLite's)
+    SQLITE_PROFILE: str = "tuned"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE: int = -65536  # negative values are KiB
+    SQLITE_BUSY_TIMEOUT: int = 5000  # milliseconds
 
     # JWT Authentication
     JWT_SECRET_KEY: str = "your-super-secret-jwt-key-change-this-in-production"
@@ -32,6 +56,16 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: str = "*"
     CORS_ENABLED: bool = True
     BCRYPT_ROUNDS: int = 12
+    BCRYPT_WORKERS: int = 2  # 0 hashes on the event loop
+    BCRYPT_MAX_PENDING: int = 32
+    AUTH_CACHE_TTL: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    SESSION_CLEANUP_INTERVAL: int = 3600  # seconds; 0 disables
+    SESSION_RETENTION_HOURS: int = 24
+    LOGIN_WRITE_BEHIND: bool = True
+    LOGIN_WRITE_BEHIND_SESSIONS: bool = False  # refresh needs the row; single worker only
+    LOGIN_WRITE_BEHIND_INTERVAL: float = 1.0
+    LOGIN_WRITE_BEHIND_MAX_BATCH: int = 500
 
     # LLM Configuration
     OLLAMA_URL: str = "http://ollama:11434"
@@ -55,18 +89,91 @@ class Settings(BaseSettings):
     AUDIO_FORMAT: int = 16
     MICROPHONE_ENABLED: bool = True
     SPEAKER_ENABLED: bool = True
+    AUDIO_TRANSCRIBER: str = "local"  # 'local' (stand-in, no model) or 'http'
+    AUDIO_TRANSCRIBE_URL: str = "http://whisper:8000/v1/audio/transcriptions"
+    AUDIO_SILENCE_THRESHOLD: float = 0.02  # RMS per chunk, fraction of full scale
+    AUDIO_SILENCE_MS: int = 500  # silence that ends a segment
+    AUDIO_MIN_SPEECH_MS: int = 200  # shorter bursts are dropped as noise
+    AUDIO_PARTIAL_INTERVAL: float = 1.0  # seconds between partial transcripts
 
     # Performance Settings
     MAX_CONNECTIONS: int = 10
     PROCESSING_TIMEOUT: int = 30
+    LLM_MAX_CONCURRENCY: int = 2  # generate requests in flight to Ollama per worker
     FRAME_BUFFER_SIZE: int = 5
-    AUDIO_BUFFER_SIZE: int = 10
+    AUDIO_BUFFER_SIZE: int = 10  # seconds of audio kept per client; longest segment
+
+    # WebSocket Broadcast Settings
+    WS_SEND_QUEUE_SIZE: int = 32
+    WS_QUEUE_FULL_POLICY: str = "drop_oldest"  # 'drop_oldest' or 'disconnect'
+    WS_MAX_DROPPED_MESSAGES: int = 100
+    WS_HEARTBEAT_INTERVAL: float = 15.0
+    WS_HEARTBEAT_TIMEOUT: float = 45.0
+    WS_IDLE_TIMEOUT: float = 0.0  # 0 disables idle reaping
+
+    # Monitoring
+    METRICS_ENABLED: bool = True
+
+    # Tracing (per-stage spans for HTTP requests, WebSocket messages and frames)
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 1.0  # fraction of requests/messages/frames traced
+    TRACE_SLOW_THRESHOLD: float = 5.0  # seconds; slower traces are logged
+    TRACE_BUFFER_SIZE: int = 100  # recent traces kept per trace name
+
+    # Sampling profiler for slow HTTP requests (opt-in; writes folded stacks)
+    PROFILER_ENABLED: bool = False
+    PROFILER_SAMPLE_RATE: float = 0.1  # fraction of requests profiled
+    PROFILER_SLOW_THRESHOLD: float = 1.0  # seconds; faster profiles are discarded
+    PROFILER_INTERVAL: float = 0.005  # seconds between stack samples
+    PROFILER_DIR: str = "profiles"
+
+    # Rate Limiting (token buckets per user, or per IP without auth)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LLM_PER_MINUTE: float = 20  # 0 disables the class
+    RATE_LIMIT_LLM_BURST: int = 5
+    RATE_LIMIT_CAMERA_PER_MINUTE: float = 30
+    RATE_LIMIT_CAMERA_BURST: int = 10
+    RATE_LIMIT_UPLOAD_PER_MINUTE: float = 10
+    RATE_LIMIT_UPLOAD_BURST: int = 3
+    RATE_LIMIT_MAX_KEYS: int = 10000
+
+    # Cross-worker Fan-out Settings
+    PUBSUB_TRANSPORT: str = "local"  # 'local' (single process) or 'unix'
+    PUBSUB_SOCKET_PATH: str = "/tmp/visionai-pubsub.sock"
+    PUBSUB_MAX_BUFFER: int = 4194304
+
+    # Shared-memory Frame Ring (slot count is FRAME_BUFFER_SIZE)
+    FRAME_RING_ENABLED: bool = False
+    FRAME_RING_NAME: str = "visionai-frames"
+    FRAME_RING_SLOT_SIZE: int = 1048576
+
+    # Serialization Settings
+    SERIALIZATION_CODEC: str = "orjson"  # 'json' or 'orjson'
+    WS_MSGPACK_ENABLED: bool = True
 
     # File Storage
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10485760
     ALLOWED_FILE_TYPES: List[str] = ["jpg", "jpeg", "png", "gif", "mp3", "wav", "mp4"]
 
+    # Video Analysis
+    VIDEO_SAMPLE_FPS: float = 2.0  # frames per second compared for scene changes
+    VIDEO_SCENE_THRESHOLD: float = 0.12  # mean grayscale difference (0-1) for a cut
+    VIDEO_MIN_SCENE_SECONDS: float = 1.0
+    VIDEO_MAX_SEGMENTS: int = 50  # LLM calls per video; the last segment absorbs the rest
+    VIDEO_KEYFRAME_WIDTH: int = 512
+    VIDEO_LLM_CONCURRENCY: int = 2  # keyframes in flight per job
+    VIDEO_DECODE_WORKERS: int = 2  # videos decoded at once per worker process
+    VIDEO_MAX_JOBS: int = 100  # finished jobs kept for polling
+
+    # Automatic Scene Analysis of the live camera
+    SCENE_MONITOR_ENABLED: bool = False
+    SCENE_SAMPLE_FPS: float = 2.0
+    SCENE_CHANGE_THRESHOLD: float = 0.1  # mean pixel difference from the last analyzed frame, 0-1
+    SCENE_MIN_INTERVAL: float = 10.0  # seconds between analyses
+    SCENE_MAX_PER_HOUR: int = 60  # 0 for no budget
+    SCENE_PROMPT: str = "Describe what is happening in this scene."
+
     # Development Settings
     RELOAD_ON_CHANGE: bool = True
     AUTO_MIGRATE: bool = True
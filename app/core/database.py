@@ -1,26 +1,148 @@
 # Database configuration
-from sqlalchemy import create_engine
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+query_seconds = registry.histogram(
+    "visionai_db_query_seconds", "Time to execute a database statement"
+)
+
+# Async driver used when DATABASE_URL names a backend without one
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+KNOWN_ASYNC_DRIVERS = {"aiosqlite", "asyncpg", "psycopg", "aiomysql", "asyncmy"}
+
+
+def get_async_url(database_url: str) -> URL:
+    """Swap a sync driver in a database URL for its async counterpart"""
+    url = make_url(database_url)
+    if url.get_driver_name() in KNOWN_ASYNC_DRIVERS:
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(profile: str) -> List[str]:
+    """PRAGMA statements for a SQLite profile ('default' leaves SQLite's own settings)"""
+    if profile == "default":
+        return []
+    if profile != "tuned":
+        logger.warning(f"Unknown SQLite profile '{profile}', using tuned")
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}",
+    ]
+
+
+def _engine_options(url: URL) -> dict:
+    options = {"echo": settings.DATABASE_ECHO}
+    if _is_memory_sqlite(url):
+        # In-memory SQLite lives in a single connection, so keep the default StaticPool
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if url.get_backend_name() == "sqlite":
+        # aiosqlite defaults to opening a connection per checkout. SQLite
+        # admits one writer at a time, so connections beyond the pool would
+        # only queue on the database lock; wait for a pooled one instead.
+        options.update(poolclass=AsyncAdaptedQueuePool, max_overflow=0)
+    return options
+
+
+def create_engine(
+    database_url: str, sqlite_profile: Optional[str] = None
+) -> AsyncEngine:
+    """Build an async engine, applying the SQLite profile to each new connection"""
+    url = get_async_url(database_url)
+    engine = create_async_engine(url, **_engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        pragmas = sqlite_pragmas(sqlite_profile or settings.SQLITE_PROFILE)
+        if pragmas:
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def apply_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+                cursor.close()
+
+    _time_queries(engine)
+    return engine
+
+
+def _time_queries(engine: AsyncEngine):
+    """Record statement execution time for every connection of an engine"""
+
+    # The start time lives on the statement's own execution context, so a
+    # statement that raises leaves nothing behind for the next one
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_start", None)
+        if started is not None:
+            query_seconds.observe(time.perf_counter() - started)
+
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DATABASE_ECHO
+engine = create_engine(settings.DATABASE_URL)
+
+registry.callback(
+    "visionai_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    lambda: getattr(engine.pool, "checkedout", lambda: 0)(),
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory; objects stay readable after commit without a lazy reload
+SessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
 
+
+async def init_db():
+    """Create any missing tables"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
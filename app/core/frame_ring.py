@@ -0,0 +1,170 @@
+# Shared-memory ring of encoded camera frames
+import logging
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VFRM"
+# magic, slot count, slot size, latest sequence number
+HEADER = struct.Struct("<4sIIQ")
+LATEST_SEQ_OFFSET = HEADER.size - 8
+# sequence number, capture timestamp, payload length
+SLOT_HEADER = struct.Struct("<QdI")
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """Keep the ring out of the resource tracker
+
+    uvicorn workers share their parent's tracker, which keeps one entry per
+    name, so letting every process register and unregister the same segment
+    corrupts its bookkeeping. The ring manages its own lifetime instead, and
+    create() clears out segments left behind by a crashed owner.
+    """
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class SharedFrameRing:
+    """Single-writer ring of encoded frames in POSIX shared memory
+
+    The writer never waits on readers. Each slot carries its sequence number,
+    which the writer clears before overwriting the slot and sets again once
+    the new frame is in place, so readers can tell whether a slot they are
+    looking at is still the frame they asked for.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, self.slots, self.slot_size, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a frame ring")
+        self.stride = SLOT_HEADER.size + self.slot_size
+        self.seq = self.latest_seq()
+
+    @classmethod
+    def create(cls, name: str, slots: int, slot_size: int) -> "SharedFrameRing":
+        """Create a ring, replacing any stale segment left under the same name"""
+        size = HEADER.size + slots * (SLOT_HEADER.size + slot_size)
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _untrack(shm)
+        HEADER.pack_into(shm.buf, 0, MAGIC, slots, slot_size, 0)
+        for i in range(slots):
+            SLOT_HEADER.pack_into(
+                shm.buf, HEADER.size + i * (SLOT_HEADER.size + slot_size), 0, 0.0, 0
+            )
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameRing":
+        """Attach to a ring created by another process"""
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return cls(shm, owner=False)
+
+    def _slot_offset(self, seq: int) -> int:
+        return HEADER.size + (seq % self.slots) * self.stride
+
+    def latest_seq(self) -> int:
+        """Sequence number of the newest complete frame (0 if none)"""
+        return HEADER.unpack_from(self.buf, 0)[3]
+
+    def write(self, data: bytes, timestamp: Optional[float] = None) -> int:
+        """Publish a frame and return its sequence number"""
+        if len(data) > self.slot_size:
+            raise ValueError(
+                f"Frame of {len(data)} bytes exceeds ring slot size {self.slot_size}"
+            )
+        seq = self.seq + 1
+        offset = self._slot_offset(seq)
+        start = offset + SLOT_HEADER.size
+
+        # Invalidate, fill, then mark the slot with its new sequence number
+        SLOT_HEADER.pack_into(self.buf, offset, 0, 0.0, 0)
+        self.buf[start : start + len(data)] = data
+        SLOT_HEADER.pack_into(
+            self.buf, offset, seq, timestamp or time.time(), len(data)
+        )
+        struct.pack_into("<Q", self.buf, LATEST_SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def read(
+        self, seq: Optional[int] = None
+    ) -> Optional[Tuple[int, float, memoryview]]:
+        """Get a zero-copy view of a frame (the latest by default)
+
+        The view aliases the ring, so check is_current(seq) after using it
+        and release it before close().
+        """
+        if seq is None:
+            seq = self.latest_seq()
+        if seq == 0:
+            return None
+        offset = self._slot_offset(seq)
+        slot_seq, timestamp, length = SLOT_HEADER.unpack_from(self.buf, offset)
+        if slot_seq != seq:
+            return None
+        start = offset + SLOT_HEADER.size
+        return seq, timestamp, self.buf[start : start + length]
+
+    def is_current(self, seq: int) -> bool:
+        """True if the slot holding seq has not been overwritten"""
+        return SLOT_HEADER.unpack_from(self.buf, self._slot_offset(seq))[0] == seq
+
+    def read_bytes(
+        self, seq: Optional[int] = None
+    ) -> Optional[Tuple[int, float, bytes]]:
+        """Copy a frame out of the ring, or None if it was overwritten meanwhile"""
+        frame = self.read(seq)
+        if frame is None:
+            return None
+        seq, timestamp, view = frame
+        try:
+            data = bytes(view)
+        finally:
+            view.release()
+        if not self.is_current(seq):
+            return None
+        return seq, timestamp, data
+
+    def replaced(self) -> bool:
+        """True if the ring's name no longer refers to this segment"""
+        try:
+            current = shared_memory.SharedMemory(name=self.shm._name)
+        except FileNotFoundError:
+            return True
+        _untrack(current)
+        try:
+            return os.fstat(current._fd).st_ino != os.fstat(self.shm._fd).st_ino
+        finally:
+            current.close()
+
+    def close(self, unlink: bool = True):
+        """Detach from the ring; the owner also removes it unless told not to
+
+        Pass unlink=False when another process has already replaced the
+        segment under the same name.
+        """
+        self.buf = None
+        self.shm.close()
+        if self.owner and unlink:
+            # unlink() unregisters, so balance it first
+            resource_tracker.register(self.shm._name, "shared_memory")
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
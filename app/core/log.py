@@ -0,0 +1,256 @@
+# Central logging setup: queued output, structured records and hot-path sampling
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the record's extras as top-level fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TraceFilter(logging.Filter):
+    """Tag records with the active trace ID (runs on the logging thread's caller)"""
+
+    def __init__(self):
+        super().__init__()
+        # Imported here because tracing logs through this module's helpers
+        from app.core.tracing import current_trace
+
+        self.current_trace = current_trace
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "trace_id"):
+            trace = self.current_trace()
+            if trace is not None:
+                record.trace_id = trace.trace_id
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without formatting or waiting
+
+    Formatting happens on the listener thread; when the queue is full the
+    record is dropped and counted rather than blocking the event loop. route
+    names the handlers the listener should write the record with.
+    """
+
+    dropped = 0  # shared by every instance, like the queue
+
+    def __init__(self, log_queue: queue.Queue, route: str = ""):
+        super().__init__(log_queue)
+        self.route = route
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record needs no pickling prep
+        record._route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that writes each record with its route's handlers"""
+
+    def __init__(
+        self, log_queue: queue.Queue, routes: Dict[str, List[logging.Handler]]
+    ):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = routes
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def handle(self, record: logging.LogRecord):
+        for handler in self.routes.get(getattr(record, "_route", ""), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+# Loggers that bring their own handlers (uvicorn configures these before the
+# app is imported); their handlers move onto the writer thread as they are
+QUEUED_LOGGERS = ("uvicorn", "uvicorn.access")
+
+# Libraries that log every request at INFO; kept at WARNING unless debugging
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+_listener: Optional[RoutingQueueListener] = None
+queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def _output_handlers() -> List[logging.Handler]:
+    if settings.LOG_JSON:
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(settings.LOG_FORMAT)
+
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if settings.LOG_FILE:
+        directory = os.path.dirname(settings.LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                settings.LOG_FILE,
+                maxBytes=settings.LOG_MAX_SIZE,
+                backupCount=settings.LOG_BACKUP_COUNT,
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging():
+    """Route the root logger through a queue to a background writer thread
+
+    Handlers are installed once; later calls only restart a writer that
+    stop_logging() stopped, so the app can go through several lifespans.
+    """
+    global _listener, queue_handler
+    if _listener is not None:
+        if not _listener.running:
+            _listener.start()
+        return
+
+    log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    routes = {"": _output_handlers()}
+    for name in QUEUED_LOGGERS:
+        logger = logging.getLogger(name)
+        if not logger.handlers:
+            continue
+        routes[name] = logger.handlers[:]
+        for handler in routes[name]:
+            logger.removeHandler(handler)
+        logger.addHandler(NonBlockingQueueHandler(log_queue, name))
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(TraceFilter())
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    if root.level > logging.DEBUG:
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+
+    _listener = RoutingQueueListener(log_queue, routes)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread until setup_logging()"""
+    if _listener is not None and _listener.running:
+        _listener.stop()
+
+
+class HotPathLogger:
+    """Sampled, rate-limited logging for per-frame and per-request messages
+
+    Each message template is its own stream: a LOG_HOT_PATH_SAMPLE_RATE
+    fraction of calls is considered, and at most LOG_HOT_PATH_BURST of those
+    are emitted per LOG_HOT_PATH_INTERVAL. The next emitted record carries the
+    number suppressed in between. Pass %-style args, not f-strings, so
+    suppressed calls never format anything.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        # template -> [window start, emitted in window, suppressed since last emit]
+        self.windows: Dict[str, List[float]] = {}
+
+    def log(self, level: int, msg: str, *args: Any, stacklevel: int = 2):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = settings.LOG_HOT_PATH_SAMPLE_RATE
+        window = self.windows.get(msg)
+        if window is None:
+            window = self.windows[msg] = [time.monotonic(), 0, 0]
+        if rate < 1.0 and random.random() >= rate:
+            window[2] += 1
+            return
+
+        now = time.monotonic()
+        if now - window[0] >= settings.LOG_HOT_PATH_INTERVAL:
+            window[0] = now
+            window[1] = 0
+        if window[1] >= settings.LOG_HOT_PATH_BURST:
+            window[2] += 1
+            return
+
+        window[1] += 1
+        suppressed = int(window[2])
+        window[2] = 0
+        if suppressed:
+            self.logger.log(
+                level,
+                msg + " (%d similar suppressed)",
+                *args,
+                suppressed,
+                extra={"suppressed": suppressed},
+                stacklevel=stacklevel,
+            )
+        else:
+            self.logger.log(level, msg, *args, stacklevel=stacklevel)
+
+    # stacklevel=3 attributes records to our caller, not to these wrappers
+    def debug(self, msg: str, *args: Any):
+        self.log(logging.DEBUG, msg, *args, stacklevel=3)
+
+    def info(self, msg: str, *args: Any):
+        self.log(logging.INFO, msg, *args, stacklevel=3)
+
+    def warning(self, msg: str, *args: Any):
+        self.log(logging.WARNING, msg, *args, stacklevel=3)
+
+    def error(self, msg: str, *args: Any):
+        self.log(logging.ERROR, msg, *args, stacklevel=3)
+
+
+def get_hot_path_logger(name: str) -> HotPathLogger:
+    return HotPathLogger(logging.getLogger(name))
+
+
+registry.callback(
+    "visionai_log_records_dropped_total",
+    "Log records dropped because the writer queue was full",
+    lambda: NonBlockingQueueHandler.dropped,
+    type="counter",
+)
+registry.callback(
+    "visionai_log_queue_depth",
+    "Log records waiting for the writer thread",
+    lambda: queue_handler.queue.qsize() if queue_handler else 0,
+)
+
@@ -0,0 +1,321 @@
+# Low-overhead metrics rendered in the Prometheus text format
+import bisect
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+# Seconds; spans sub-millisecond frame work up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+CallbackResult = Union[float, Iterable[Tuple[LabelValues, float]]]
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(v))}"' for name, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Timer:
+    """Context manager that observes its elapsed time into a histogram"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "HistogramChild"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> Timer:
+        return Timer(self)
+
+
+class Metric:
+    """A named metric family; labelled children are created on first use"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[LabelValues, object] = {}
+        if not self.labelnames:
+            self.default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        """Get the child for a set of label values (cache it on hot paths)"""
+        child = self.children.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}, got {values}"
+                )
+            child = self.children[key] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        """Drop a labelled child, e.g. for a client that disconnected"""
+        self.children.pop(tuple(str(v) for v in values), None)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: LabelValues, child) -> List[str]:
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.default.inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def set(self, value: float):
+        self.default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.default.dec(amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.default.observe(value)
+
+    def time(self) -> Timer:
+        return self.default.time()
+
+    def _render_child(self, values: LabelValues, child: HistogramChild) -> List[str]:
+        names = self.labelnames + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+            cumulative += count
+            labels = _format_labels(names, values + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """A gauge or counter read from existing state when metrics are scraped
+
+    The callback returns a single value, or (label values, value) pairs when
+    the metric has labels.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], CallbackResult],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ):
+        self.callback = callback
+        self.type = type
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        result = self.callback()
+        if not self.labelnames:
+            result = [((), result)]
+        for values, value in result:
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}{labels} {_format_value(float(value))}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], CallbackResult],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> CallbackMetric:
+        """Register a scrape-time metric, replacing any earlier one of the same name
+
+        Services register these against their own state, so the newest
+        instance wins rather than failing on re-creation.
+        """
+        metric = CallbackMetric(name, documentation, callback, labelnames, type)
+        self.metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(str(e))}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; each worker exposes its own numbers
+registry = MetricsRegistry()
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
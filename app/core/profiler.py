@@ -0,0 +1,146 @@
+# Opt-in sampling profiler for slow HTTP requests
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Set
+
+from app.core.config import settings
+from app.core.tracing import current_trace
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames that mean the event loop was waiting rather than working: the
+# selector call for asyncio's loop, or the loop's entry point under uvloop
+_IDLE_LEAVES = {
+    "selectors.py:select",
+    "runners.py:run",
+    "base_events.py:run_forever",
+    "base_events.py:run_until_complete",
+}
+
+
+def _fold(frame) -> str:
+    """Collapse a stack into 'outer;...;inner' for flame graph tools"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    if names and names[0] in _IDLE_LEAVES:
+        names[0] = "(idle)"
+    return ";".join(reversed(names))
+
+
+class ProfileWindow:
+    """Stack samples collected while one profiled request was in flight"""
+
+    __slots__ = ("samples", "started")
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.started = time.perf_counter()
+
+
+class SamplingProfiler:
+    """Sample one thread's stack from a background thread while windows are open
+
+    Samples are taken from the event loop thread, so a window also sees other
+    requests interleaved with the one being profiled; "(idle)" marks the loop
+    waiting on I/O.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.target_thread: Optional[int] = None
+        self.windows: Set[ProfileWindow] = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def open(self) -> ProfileWindow:
+        """Start collecting samples of the calling thread"""
+        window = ProfileWindow()
+        with self.lock:
+            self.target_thread = threading.get_ident()
+            self.windows.add(window)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="visionai-profiler", daemon=True
+                )
+                self.thread.start()
+        self.wake.set()
+        return window
+
+    def close(self, window: ProfileWindow) -> Counter:
+        """Stop collecting for a window and return its folded stack counts"""
+        with self.lock:
+            self.windows.discard(window)
+            if not self.windows:
+                self.wake.clear()
+        return window.samples
+
+    def _run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.target_thread)
+            if frame is None:
+                continue
+            stack = _fold(frame)
+            with self.lock:
+                for window in self.windows:
+                    window.samples[stack] += 1
+
+
+profiler = SamplingProfiler(settings.PROFILER_INTERVAL)
+
+
+def write_profile(samples: Counter, path: str):
+    """Write samples in the folded format read by flamegraph.pl and speedscope"""
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class ProfilerMiddleware:
+    """Profile a PROFILER_SAMPLE_RATE fraction of HTTP requests, keeping slow ones"""
+
+    def __init__(self, app):
+        self.app = app
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.PROFILER_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        window = profiler.open()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            samples = profiler.close(window)
+            elapsed = time.perf_counter() - window.started
+            if elapsed >= settings.PROFILER_SLOW_THRESHOLD and samples:
+                self._save(scope, samples, elapsed)
+
+    def _save(self, scope, samples: Counter, elapsed: float):
+        trace = current_trace()
+        trace_id = trace.trace_id if trace else "untraced"
+        # Never let an ID reach the path with separators in it
+        trace_id = re.sub(r"[^A-Za-z0-9_-]", "_", trace_id)
+        name = f"{int(time.time() * 1000)}-{trace_id}.folded"
+        path = os.path.join(settings.PROFILER_DIR, name)
+        try:
+            write_profile(samples, path)
+        except OSError as e:
+            logger.warning(f"Could not write profile {path}: {e}")
+            return
+        logger.info(
+            f"Profiled slow request {scope['method']} {scope['path']} "
+            f"({elapsed * 1e3:.0f}ms, {sum(samples.values())} samples): {path}"
+        )
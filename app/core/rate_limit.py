@@ -0,0 +1,121 @@
+# In-memory token-bucket rate limiting
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the request would be allowed
+    reset_after: float  # seconds until the bucket is full again
+
+    def headers(self) -> Dict[str, str]:
+        """Standard rate-limit response headers"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(self.reset_after + 0.999)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(int(self.retry_after + 0.999))
+        return headers
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled continuously at rate_per_minute up to burst
+
+    Buckets are kept in an LRU bounded at max_keys; a key evicted for being
+    idle that long would have refilled anyway.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, key: Hashable, cost: float = 1.0) -> RateLimitResult:
+        """Take cost tokens from key's bucket if it has them"""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+
+        allowed = bucket[0] >= cost
+        if allowed:
+            bucket[0] -= cost
+            self.allowed += 1
+            retry_after = 0.0
+        else:
+            self.rejected += 1
+            retry_after = (cost - bucket[0]) / self.rate
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.burst,
+            remaining=int(bucket[0]),
+            retry_after=retry_after,
+            reset_after=(self.burst - bucket[0]) / self.rate,
+        )
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get limiter counters"""
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tracked_keys": len(self.buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+def _build_limiters() -> Dict[str, TokenBucketLimiter]:
+    limits = {
+        "llm": (settings.RATE_LIMIT_LLM_PER_MINUTE, settings.RATE_LIMIT_LLM_BURST),
+        "camera": (
+            settings.RATE_LIMIT_CAMERA_PER_MINUTE,
+            settings.RATE_LIMIT_CAMERA_BURST,
+        ),
+        "upload": (
+            settings.RATE_LIMIT_UPLOAD_PER_MINUTE,
+            settings.RATE_LIMIT_UPLOAD_BURST,
+        ),
+    }
+    return {
+        route_class: TokenBucketLimiter(rate, burst, settings.RATE_LIMIT_MAX_KEYS)
+        for route_class, (rate, burst) in limits.items()
+        if rate > 0
+    }
+
+
+# One limiter per route class; counts are per worker process
+rate_limiters = _build_limiters() if settings.RATE_LIMIT_ENABLED else {}
+
+registry.callback(
+    "visionai_rate_limit_rejected_total",
+    "Requests rejected by the rate limiter",
+    lambda: [((name,), limiter.rejected) for name, limiter in rate_limiters.items()],
+    labelnames=("route_class",),
+    type="counter",
+)
+
+
+def check_rate_limit(route_class: str, key: Hashable) -> Optional[RateLimitResult]:
+    """Check key against a route class's limit (None if that class is unlimited)"""
+    limiter = rate_limiters.get(route_class)
+    if limiter is None:
+        return None
+    return limiter.check(key)
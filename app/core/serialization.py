@@ -0,0 +1,158 @@
+# Serialization codecs for WebSocket and REST payloads
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+
+hot_logger = get_hot_path_logger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+Payload = Union[str, bytes]
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for types the codecs do not handle natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class Codec:
+    """Encodes messages for the wire; binary codecs are sent as bytes frames"""
+
+    name = "base"
+    binary = False
+
+    def encode(self, message: Any) -> Payload:
+        raise NotImplementedError
+
+    def decode(self, data: Payload) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    name = "json"
+
+    def encode(self, message: Any) -> str:
+        return json.dumps(message, separators=(",", ":"), default=_default)
+
+    def decode(self, data: Payload) -> Any:
+        return json.loads(data)
+
+
+class ORJSONCodec(Codec):
+    name = "orjson"
+
+    def encode(self, message: Any) -> str:
+        # Browsers expect JSON in text frames, so hand back a str
+        return orjson.dumps(message, default=_default).decode("utf-8")
+
+    def decode(self, data: Payload) -> Any:
+        return orjson.loads(data)
+
+
+class MsgPackCodec(Codec):
+    name = "msgpack"
+    binary = True
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message, default=_default, use_bin_type=True)
+
+    def decode(self, data: Payload) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return msgpack.unpackb(data, raw=False)
+
+
+def available_codecs() -> Dict[str, Codec]:
+    """Get all codecs whose dependencies are installed"""
+    codecs: Dict[str, Codec] = {"json": JSONCodec()}
+    if orjson is not None:
+        codecs["orjson"] = ORJSONCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgPackCodec()
+    return codecs
+
+
+_codecs = available_codecs()
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Get a codec by name, falling back to the fastest available JSON codec"""
+    if name is None:
+        name = settings.SERIALIZATION_CODEC
+    codec = _codecs.get(name)
+    if codec is None:
+        # Called per connection, so a bad SERIALIZATION_CODEC would flood the log
+        hot_logger.warning("Codec '%s' is not available, falling back to JSON", name)
+        codec = _codecs.get("orjson", _codecs["json"])
+    return codec
+
+
+def get_json_codec() -> Codec:
+    """Get the configured text codec used for JSON clients"""
+    codec = get_codec()
+    if codec.binary:
+        codec = _codecs.get("orjson", _codecs["json"])
+    return codec
+
+
+def negotiate_codec(websocket: WebSocket) -> Tuple[Codec, Optional[str]]:
+    """Pick a codec from the client's requested subprotocols or ?encoding= param
+
+    Returns the codec and the subprotocol to echo back on accept, if any.
+    """
+    requested = list(websocket.scope.get("subprotocols") or [])
+    encoding = websocket.query_params.get("encoding")
+    if encoding:
+        requested.append(encoding)
+
+    for name in requested:
+        if name == "msgpack" and settings.WS_MSGPACK_ENABLED and msgpack is not None:
+            codec = _codecs["msgpack"]
+        elif name == "json":
+            codec = get_json_codec()
+        else:
+            continue
+        subprotocol = (
+            name if name in (websocket.scope.get("subprotocols") or []) else None
+        )
+        return codec, subprotocol
+
+    return get_json_codec(), None
+
+
+if orjson is not None:
+
+    class FastJSONResponse(JSONResponse):
+        """JSON response rendered with orjson"""
+
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(content, default=_default)
+
+else:
+    FastJSONResponse = JSONResponse
+
+
+def get_response_class():
+    """Get the default response class for REST routes"""
+    if settings.SERIALIZATION_CODEC == "json":
+        return JSONResponse
+    return FastJSONResponse
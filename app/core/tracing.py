@@ -0,0 +1,232 @@
+# Lightweight per-request stage tracing
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+
+hot_logger = get_hot_path_logger(__name__)
+
+TRACE_HEADER = "x-trace-id"
+# Trace names are bounded by the app's routes, but cap them all the same
+MAX_TRACE_NAMES = 256
+# Longest client-supplied trace ID that is kept (HTTP header or WebSocket field)
+MAX_TRACE_ID_LENGTH = 64
+# Trace IDs end up in log lines and profile file names
+TRACE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def new_trace_id() -> str:
+    return os.urandom(8).hex()
+
+
+def client_trace_id(value: Any) -> Optional[str]:
+    """Trace ID sent by a client, truncated, or None if it is not a safe string
+
+    Only letters, digits, '_' and '-' are accepted; anything else gets a
+    server-generated ID instead.
+    """
+    if not isinstance(value, str):
+        return None
+    value = value[:MAX_TRACE_ID_LENGTH]
+    if not TRACE_ID_PATTERN.fullmatch(value):
+        return None
+    return value
+
+
+class Trace:
+    """A named unit of work and the stages (spans) it spent time in"""
+
+    __slots__ = (
+        "trace_id",
+        "name",
+        "sampled",
+        "started",
+        "wall_started",
+        "duration",
+        "spans",
+    )
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, sampled: bool = True):
+        self.trace_id = trace_id or new_trace_id()
+        self.name = name
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.duration: Optional[float] = None
+        # (stage, offset from trace start, duration), in completion order
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add_span(self, name: str, started: float, duration: float):
+        self.spans.append((name, started - self.started, duration))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.wall_started,
+            "duration_ms": (self.duration or 0.0) * 1e3,
+            "spans": [
+                {"name": name, "offset_ms": offset * 1e3, "duration_ms": duration * 1e3}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("visionai_trace", default=None)
+
+# Completed traces, most recent last, bounded per trace name so high-rate
+# traces (frames) don't push out rare ones (LLM calls)
+recent_traces: Dict[str, Deque[Trace]] = {}
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace active in this context, if it is being recorded"""
+    return _current.get()
+
+
+def _finish(trace: Trace):
+    trace.duration = time.perf_counter() - trace.started
+    buffer = recent_traces.get(trace.name)
+    if buffer is None and len(recent_traces) < MAX_TRACE_NAMES:
+        buffer = recent_traces[trace.name] = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+    if buffer is not None:
+        buffer.append(trace)
+    if trace.duration >= settings.TRACE_SLOW_THRESHOLD:
+        stages = ", ".join(
+            f"{name}={duration * 1e3:.1f}ms" for name, _, duration in trace.spans
+        )
+        hot_logger.warning(
+            "Slow trace %s %s: %.1fms (%s)",
+            trace.name,
+            trace.trace_id,
+            trace.duration * 1e3,
+            stages,
+        )
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """Record a trace for the enclosed work, subject to TRACE_SAMPLE_RATE
+
+    Always yields a Trace so callers can echo its ID; spans are only
+    collected when it was sampled.
+    """
+    sampled = settings.TRACING_ENABLED and (
+        settings.TRACE_SAMPLE_RATE >= 1.0
+        or random.random() < settings.TRACE_SAMPLE_RATE
+    )
+    trace = Trace(name, trace_id, sampled)
+    if not sampled:
+        yield trace
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        _finish(trace)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add_span(self.name, self.started, time.perf_counter() - self.started)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def span(name: str):
+    """Time the enclosed stage into the current trace (a no-op outside one)"""
+    trace = _current.get()
+    if trace is None:
+        return _no_span
+    return _Span(trace, name)
+
+
+def record_span(name: str, started: float, duration: float):
+    """Add an already-measured stage (perf_counter start) to the current trace"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(name, started, duration)
+
+
+def get_traces(
+    name: Optional[str] = None, min_duration: float = 0.0, limit: int = 50
+) -> List[Dict[str, Any]]:
+    """Most recent completed traces first, optionally filtered"""
+    names = [name] if name else list(recent_traces)
+    traces = [
+        trace
+        for trace_name in names
+        for trace in recent_traces.get(trace_name, ())
+        if trace.duration >= min_duration
+    ]
+    traces.sort(key=lambda trace: trace.wall_started, reverse=True)
+    return [trace.to_dict() for trace in traces[:limit]]
+
+
+class TracingMiddleware:
+    """Trace each HTTP request, honouring and returning an X-Trace-Id header
+
+    Traces are named by the matched route's path template, so /video/jobs/abc
+    and /video/jobs/def share one buffer; requests no route matched share
+    one name.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-trace-id":
+                trace_id = client_trace_id(value.decode("latin-1"))
+                break
+
+        with start_trace(f"http {scope['method']}", trace_id) as trace:
+            header = (TRACE_HEADER.encode(), trace.trace_id.encode("latin-1"))
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], header]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                # The router sets the route on the scope once it has matched
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "<unmatched>"
+                trace.name = f"http {scope['method']} {path}"
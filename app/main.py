@@ -1,30 +1,53 @@
 # AI Camera Assistant - Backend Application
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import asyncio
-import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
 
-from app.api import auth, camera, llm, websocket
+from app.api import auth, camera, files, llm, video, websocket
+from app.api.deps import get_services
+from app.api.websocket import answer_llm_message
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.services.camera_service import CameraService
-from app.services.llm_service import LLMService
-from app.services.websocket_service import WebSocketService
+from app.core.database import engine, init_db
+from app.core.log import get_hot_path_logger, setup_logging, stop_logging
+from app.core.metrics import CONTENT_TYPE, registry
+from app.core.profiler import ProfilerMiddleware
+from app.core.serialization import get_response_class
+from app.core.tracing import TracingMiddleware, get_traces
+from app.services.container import ServiceContainer
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+hot_logger = get_hot_path_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables and build the services on startup; tear down on shutdown"""
+    # Log through a background writer thread at LOG_LEVEL from startup to
+    # shutdown; importing the app starts no threads
+    setup_logging()
+    await init_db()
+    services = app.state.services = ServiceContainer()
+    await services.start()
+    yield
+    await services.stop()
+    await engine.dispose()
+    stop_logging()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="VisionAI",
     version="1.0.0",
     description="Production-ready AI Vision Assistant with JWT Authentication",
+    default_response_class=get_response_class(),
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -38,106 +61,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-camera_service = CameraService()
-llm_service = LLMService()
-websocket_service = WebSocketService()
+# Added last so it runs outermost; the profiler reads the request's trace
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
 app.include_router(camera.router, prefix="/camera", tags=["camera"])
 app.include_router(llm.router, prefix="/llm", tags=["llm"])
+app.include_router(files.router, prefix="/files", tags=["files"])
+app.include_router(video.router, prefix="/video", tags=["video"])
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
 
 
 # Direct WebSocket endpoint without router
 @app.websocket("/ws-direct")
-async def websocket_direct(websocket: WebSocket):
+async def websocket_direct(
+    websocket: WebSocket, services: ServiceContainer = Depends(get_services)
+):
     """Direct WebSocket endpoint for testing"""
-    await websocket.accept()
-    websocket_service.add_client(websocket)
-    logger = logging.getLogger(__name__)
-    logger.info(
-        f"Direct WebSocket client connected. Total clients: {len(websocket_service.connected_clients)}"
+    llm_service = services.llm
+    websocket_service = services.websocket
+    client = await websocket_service.accept(websocket)
+    if client is None:
+        return
+    hot_logger.info(
+        "Direct WebSocket client connected. Total clients: %d",
+        len(websocket_service.connected_clients),
     )
 
     try:
-        while True:
-            # Send camera frames to all connected clients (15 FPS)
-            if camera_service.is_active:
-                frame_data = await camera_service.capture_frame()
-                if frame_data:
-                    await websocket.send_json(
-                        {
-                            "type": "frame",
-                            "data": frame_data,
-                            "timestamp": asyncio.get_event_loop().time(),
-                        }
-                    )
-                    # Throttle to 15 FPS (66.67ms between frames)
-                    await asyncio.sleep(1 / 15)
-
-            # Process any incoming messages
+        while not client.closed:
+            # Camera frames arrive through the broadcast fan-out; this loop
+            # only handles incoming messages
             try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=0.1)
-
-                if data.get("type") == "process_image":
-                    try:
-                        # Log the received data for debugging
-                        logger.info(
-                            f"Processing image with prompt: {data.get('prompt', 'No prompt')}"
-                        )
-                        logger.info(
-                            f"Image data length: {len(data.get('image_data', ''))}"
-                        )
-
-                        # Process image with LLM
-                        result = await llm_service.process_image_with_llm(
-                            data.get("image_data"),
-                            data.get(
-                                "prompt",
-                                "Analyze this image and provide helpful insights.",
-                            ),
-                        )
-
-                        await websocket.send_json(
-                            {"type": "llm_response", "data": result.dict()}
-                        )
-                    except Exception as e:
-                        logger.error(f"LLM processing error: {e}")
-                        await websocket.send_json(
-                            {
-                                "type": "error",
-                                "message": f"Failed to process image: {str(e)}",
-                            }
-                        )
-
-                elif data.get("type") == "chat_message":
-                    try:
-                        # Process text-only message with LLM
-                        result = await llm_service.process_text_with_llm(
-                            data.get("message", "")
-                        )
-
-                        await websocket.send_json(
-                            {"type": "llm_response", "data": result.dict()}
-                        )
-                    except Exception as e:
-                        logger.error(f"LLM text processing error: {e}")
-                        await websocket.send_json(
-                            {
-                                "type": "error",
-                                "message": f"Failed to process message: {str(e)}",
-                            }
-                        )
+                data = await asyncio.wait_for(
+                    websocket_service.receive(websocket), timeout=1.0
+                )
+
+                # Pongs only refresh liveness, which receive() already did
+                if not isinstance(data, dict) or data.get("type") not in (
+                    "process_image",
+                    "chat_message",
+                ):
+                    continue
+                if websocket_service.rate_limited(websocket, "llm"):
+                    continue
+
+                client.run(
+                    answer_llm_message(llm_service, websocket_service, websocket, data)
+                )
 
             except asyncio.TimeoutError:
                 continue
 
     except WebSocketDisconnect:
+        pass
+    finally:
         websocket_service.remove_client(websocket)
-        logger.info(
-            f"Direct WebSocket client disconnected. Total clients: {len(websocket_service.connected_clients)}"
+        hot_logger.info(
+            "Direct WebSocket client disconnected. Total clients: %d",
+            len(websocket_service.connected_clients),
         )
 
 
@@ -151,6 +137,24 @@ async def health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics for this worker process"""
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+if settings.TRACING_ENABLED:
+
+    @app.get("/debug/traces", include_in_schema=False)
+    async def debug_traces(
+        name: Optional[str] = None, min_ms: float = 0.0, limit: int = 50
+    ):
+        """Recent per-stage traces for this worker process, newest first"""
+        return {"traces": get_traces(name, min_ms / 1e3, limit)}
+
+
 if __name__ == "__main__":
     import uvicorn
 
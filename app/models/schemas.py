@@ -35,6 +35,15 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[int] = None
+    exp: Optional[int] = None
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class CameraConfig(BaseModel):
@@ -58,6 +67,20 @@ class LLMResponse(BaseModel):
     processing_time: float
 
 
+class UploadResponse(BaseModel):
+    file_id: str
+    filename: str
+    content_type: str
+    kind: str
+    size: int
+    analysis: Optional[LLMResponse] = None
+
+
+class VideoJobRequest(BaseModel):
+    file_id: str
+    prompt: Optional[str] = None
+
+
 class AudioRequest(BaseModel):
     audio_data: str
     action: str  # 'transcribe' or 'play'
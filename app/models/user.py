@@ -1,5 +1,5 @@
 # Database models
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -25,3 +25,8 @@ class UserSession(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True))
     is_active = Column(Boolean, default=True)
+
+    # Serves the live-session lookups and the expired-session cleanup
+    __table_args__ = (
+        Index("ix_user_sessions_active_expires", "is_active", "expires_at"),
+    )
@@ -0,0 +1,357 @@
+# Audio service: streamed PCM segmented on silence and transcribed as it arrives
+import asyncio
+import io
+import logging
+import time
+import wave
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+import httpx
+
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+from app.core.metrics import registry
+from app.models.schemas import AudioResponse
+
+logger = logging.getLogger(__name__)
+hot_logger = get_hot_path_logger(__name__)
+
+transcribe_seconds = registry.histogram(
+    "visionai_audio_transcribe_seconds",
+    "Transcription backend latency per segment",
+    ["kind"],
+)
+partials_skipped = registry.counter(
+    "visionai_audio_partials_skipped_total",
+    "Partial transcripts skipped because newer audio was already waiting",
+)
+segments_dropped = registry.counter(
+    "visionai_audio_segments_dropped_total",
+    "Segments overwritten in the ring before the backend got to them",
+)
+
+FULL_SCALE = 32768.0
+
+# numpy is slow to import, so it loads when the first audio stream opens
+np = None
+
+
+def _load_numpy():
+    """Import numpy on first use"""
+    global np
+    if np is None:
+        import numpy as np
+
+
+class PCMRing:
+    """Fixed-size ring of the latest int16 samples, addressed by absolute sample index"""
+
+    def __init__(self, capacity: int):
+        _load_numpy()
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.total = 0  # samples ever written
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.total - self.capacity)
+
+    def write(self, samples: "np.ndarray"):
+        count = len(samples)
+        data = samples[-self.capacity :]
+        offset = (self.total + count - len(data)) % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self.buffer[offset : offset + first] = data[:first]
+        self.buffer[: len(data) - first] = data[first:]
+        self.total += count
+
+    def read(self, start: int, end: int) -> Optional["np.ndarray"]:
+        """Copy samples [start, end), or None if some were already overwritten"""
+        if start < self.oldest or end > self.total:
+            return None
+        offset = start % self.capacity
+        count = end - start
+        if offset + count <= self.capacity:
+            return self.buffer[offset : offset + count].copy()
+        return np.concatenate(
+            (self.buffer[offset:], self.buffer[: offset + count - self.capacity])
+        )
+
+
+class Segment(NamedTuple):
+    index: int
+    start: int  # absolute sample index
+    end: int
+    final: bool
+
+
+class SpeechSegmenter:
+    """Split a sample stream into speech segments separated by silence
+
+    Samples are cut into chunks of chunk_size and each chunk's RMS energy is
+    computed in one numpy pass. A segment starts at the first chunk above
+    threshold and ends after silence_ms of quiet chunks, or when it reaches
+    max_samples. While it is open, a partial Segment is emitted every
+    partial_interval seconds.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        chunk_size: int,
+        threshold: float,
+        silence_ms: int,
+        min_speech_ms: int,
+        partial_interval: float,
+        max_samples: int,
+    ):
+        _load_numpy()
+        self.chunk_size = chunk_size
+        self.threshold = threshold
+        self.silence_samples = sample_rate * silence_ms // 1000
+        self.min_speech_samples = sample_rate * min_speech_ms // 1000
+        self.partial_samples = max(chunk_size, int(sample_rate * partial_interval))
+        self.max_samples = max(chunk_size, max_samples - max_samples % chunk_size)
+        self.carry = np.zeros(0, dtype=np.int16)
+        self.position = 0  # absolute index of the first sample in carry
+        self.index = 0
+        self.start: Optional[int] = None  # open segment
+        self.voiced_end = 0
+        self.next_partial = 0
+        self.partials_sent = False
+
+    def energy(self, samples: "np.ndarray") -> "np.ndarray":
+        """RMS of each whole chunk, as a fraction of full scale"""
+        chunks = samples.reshape(-1, self.chunk_size).astype(np.float32)
+        return np.sqrt(np.mean(chunks * chunks, axis=1)) / FULL_SCALE
+
+    def feed(self, samples: "np.ndarray") -> List[Segment]:
+        data = np.concatenate((self.carry, samples)) if len(self.carry) else samples
+        whole = len(data) - len(data) % self.chunk_size
+        self.carry = data[whole:]
+        voiced = self.energy(data[:whole]) > self.threshold
+
+        events: List[Segment] = []
+        position = self.position
+        for is_voiced in voiced.tolist():
+            end = position + self.chunk_size
+            if is_voiced:
+                if self.start is None:
+                    self._open(position)
+                self.voiced_end = end
+            if self.start is not None:
+                if end - self.voiced_end >= self.silence_samples:
+                    self._close(self.voiced_end, events)
+                elif end - self.start >= self.max_samples:
+                    self._close(end, events)
+                    self._open(end)
+                elif end >= self.next_partial:
+                    events.append(Segment(self.index, self.start, end, False))
+                    self.partials_sent = True
+                    self.next_partial = end + self.partial_samples
+            position = end
+        self.position = position
+        return events
+
+    def flush(self) -> List[Segment]:
+        """Close the open segment, if any, at the last voiced chunk"""
+        events: List[Segment] = []
+        if self.start is not None:
+            self._close(self.voiced_end, events)
+        return events
+
+    def _open(self, start: int):
+        self.start = start
+        self.voiced_end = start
+        self.next_partial = start + self.partial_samples
+        self.partials_sent = False
+
+    def _close(self, end: int, events: List[Segment]):
+        # Clicks and breaths are dropped, unless partials already showed them
+        if end - self.start >= self.min_speech_samples or self.partials_sent:
+            events.append(Segment(self.index, self.start, end, True))
+            self.index += 1
+        self.start = None
+
+
+class TranscriptionBackend:
+    """Turns a mono int16 segment into text"""
+
+    async def transcribe(self, samples: "np.ndarray", sample_rate: int) -> str:
+        raise NotImplementedError
+
+
+class LocalTranscriber(TranscriptionBackend):
+    """Stand-in that only reports how much speech it was given; no model needed"""
+
+    async def transcribe(self, samples: "np.ndarray", sample_rate: int) -> str:
+        return f"[{len(samples) / sample_rate:.1f}s of speech]"
+
+
+class HTTPTranscriber(TranscriptionBackend):
+    """Posts each segment as WAV to an OpenAI-compatible transcription endpoint"""
+
+    def __init__(self, url: str, model: str):
+        self.url = url
+        self.model = model
+
+    async def transcribe(self, samples: "np.ndarray", sample_rate: int) -> str:
+        wav = io.BytesIO()
+        with wave.open(wav, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            f.writeframes(samples.astype("<i2").tobytes())
+        async with httpx.AsyncClient(timeout=settings.PROCESSING_TIMEOUT) as client:
+            response = await client.post(
+                self.url,
+                data={"model": self.model},
+                files={"file": ("segment.wav", wav.getvalue(), "audio/wav")},
+            )
+            response.raise_for_status()
+            return response.json().get("text", "").strip()
+
+
+def create_transcriber(name: str) -> TranscriptionBackend:
+    """Build the transcription backend named in settings"""
+    if name == "http":
+        return HTTPTranscriber(settings.AUDIO_TRANSCRIBE_URL, settings.WHISPER_MODEL)
+    if name != "local":
+        logger.warning(f"Unknown transcriber '{name}', using local")
+    return LocalTranscriber()
+
+
+class AudioSession:
+    """One client's audio stream: ring buffer, segmenter and transcription worker
+
+    Audio is read from the ring only when the worker gets to a segment, so
+    memory stays at the ring's size however far the backend falls behind.
+    A partial is skipped when anything newer is already queued behind it.
+    """
+
+    def __init__(
+        self,
+        backend: TranscriptionBackend,
+        sample_rate: int,
+        channels: int,
+        send: Callable[[Dict[str, Any]], None],
+    ):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.send = send
+        self.ring = PCMRing(sample_rate * settings.AUDIO_BUFFER_SIZE)
+        self.segmenter = SpeechSegmenter(
+            sample_rate,
+            settings.AUDIO_CHUNK_SIZE,
+            settings.AUDIO_SILENCE_THRESHOLD,
+            settings.AUDIO_SILENCE_MS,
+            settings.AUDIO_MIN_SPEECH_MS,
+            settings.AUDIO_PARTIAL_INTERVAL,
+            self.ring.capacity - settings.AUDIO_CHUNK_SIZE,
+        )
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._work())
+        self.odd_byte = b""
+
+    def feed(self, pcm: bytes):
+        """Take raw 16-bit little-endian PCM, interleaved if multi-channel"""
+        pcm = self.odd_byte + pcm
+        frame_bytes = 2 * self.channels
+        whole = len(pcm) - len(pcm) % frame_bytes
+        self.odd_byte = pcm[whole:]
+        samples = np.frombuffer(pcm[:whole], dtype="<i2")
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(np.int16)
+        self.ring.write(samples)
+        self._submit(self.segmenter.feed(samples))
+
+    def flush(self):
+        """Finish the current segment now instead of waiting for silence"""
+        self._submit(self.segmenter.flush())
+
+    async def close(self):
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+
+    def _submit(self, segments: List[Segment]):
+        for segment in segments:
+            self.pending.put_nowait(segment)
+
+    async def _work(self):
+        while True:
+            segment = await self.pending.get()
+            if not segment.final and not self.pending.empty():
+                partials_skipped.inc()
+                continue
+            samples = self.ring.read(segment.start, segment.end)
+            if samples is None:
+                # The backend fell more than AUDIO_BUFFER_SIZE seconds behind
+                if segment.final:
+                    segments_dropped.inc()
+                    self._send(
+                        segment,
+                        AudioResponse(
+                            success=False,
+                            message="Audio dropped: transcription fell behind",
+                        ),
+                    )
+                continue
+            kind = "final" if segment.final else "partial"
+            started = time.perf_counter()
+            try:
+                text = await self.backend.transcribe(samples, self.sample_rate)
+                response = AudioResponse(text=text, success=True, message=kind)
+            except Exception as e:
+                hot_logger.error("Transcription error: %s", e)
+                response = AudioResponse(
+                    success=False, message=f"Failed to transcribe audio: {str(e)}"
+                )
+            transcribe_seconds.labels(kind).observe(time.perf_counter() - started)
+            self._send(segment, response)
+
+    def _send(self, segment: Segment, response: AudioResponse):
+        self.send(
+            {
+                "type": "transcript",
+                "final": segment.final,
+                "segment": segment.index,
+                "start": round(segment.start / self.sample_rate, 3),
+                "end": round(segment.end / self.sample_rate, 3),
+                "data": response.dict(),
+            }
+        )
+
+
+class AudioService:
+    def __init__(self, backend: Optional[TranscriptionBackend] = None):
+        self.backend = backend or create_transcriber(settings.AUDIO_TRANSCRIBER)
+        self.sessions: Set[AudioSession] = set()
+
+    def open_session(
+        self,
+        send: Callable[[Dict[str, Any]], None],
+        sample_rate: Optional[int] = None,
+        channels: Optional[int] = None,
+    ) -> AudioSession:
+        """Start transcribing a new stream; replies go out through send"""
+        session = AudioSession(
+            self.backend,
+            sample_rate or settings.AUDIO_SAMPLE_RATE,
+            channels or settings.AUDIO_CHANNELS,
+            send,
+        )
+        self.sessions.add(session)
+        return session
+
+    async def close_session(self, session: AudioSession):
+        self.sessions.discard(session)
+        await session.close()
+
+    async def stop(self):
+        """Stop every session's transcription worker"""
+        for session in list(self.sessions):
+            await self.close_session(session)
@@ -1,27 +1,120 @@
 # Authentication service
 import os
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt as jose_jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 from app.models.user import User, UserSession
 from app.models.schemas import TokenData
+from app.core.cache import ExpiringSet, TTLCache
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import registry
+from app.core.tracing import span
+from app.services.login_write_buffer import LoginWriteBuffer
+from app.services.pubsub_service import pubsub_service
 
 logger = logging.getLogger(__name__)
 
+bcrypt_seconds = registry.histogram(
+    "visionai_bcrypt_seconds", "Time spent in bcrypt per call", ["operation"]
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
 
 class AuthService:
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+        )
         self.JWT_SECRET_KEY = settings.JWT_SECRET_KEY
         self.JWT_ALGORITHM = settings.JWT_ALGORITHM
         self.JWT_ACCESS_TOKEN_EXPIRE_MINUTES = settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
         self.JWT_REFRESH_TOKEN_EXPIRE_DAYS = settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS
 
+        # Verified tokens and user rows, so authenticated requests skip the
+        # JWT decode and the users query in the steady state
+        self.token_cache = TTLCache(
+            settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL
+        )
+        self.user_cache = TTLCache(
+            settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL
+        )
+        # Revoked access tokens are the only record of a logout, so they are
+        # held until each token expires rather than cached
+        self.revoked_tokens = ExpiringSet()
+        # Refresh tokens that were rotated or logged out, so replays are
+        # rejected without a database round trip
+        self.revoked_sessions = TTLCache(
+            settings.AUTH_CACHE_MAX_ENTRIES, self.JWT_REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        )
+        pubsub_service.subscribe("auth", self._on_auth_event)
+        self._register_metrics()
+        self.cleanup_task: Optional[asyncio.Task] = None
+
+        # Login bookkeeping is written behind the response in batches
+        self.login_writes = (
+            LoginWriteBuffer(
+                SessionLocal,
+                settings.LOGIN_WRITE_BEHIND_INTERVAL,
+                settings.LOGIN_WRITE_BEHIND_MAX_BATCH,
+                buffer_sessions=settings.LOGIN_WRITE_BEHIND_SESSIONS,
+                on_flushed_user=self.invalidate_user,
+            )
+            if settings.LOGIN_WRITE_BEHIND
+            else None
+        )
+
+        # bcrypt releases the GIL, so a small thread pool keeps it off the
+        # event loop; BCRYPT_WORKERS=0 hashes inline
+        self.password_pool = (
+            ThreadPoolExecutor(
+                max_workers=settings.BCRYPT_WORKERS, thread_name_prefix="bcrypt"
+            )
+            if settings.BCRYPT_WORKERS > 0
+            else None
+        )
+        self.password_queue_limit = settings.BCRYPT_MAX_PENDING
+        self.password_pending = 0
+
+    def _register_metrics(self):
+        caches = {"token": self.token_cache, "user": self.user_cache}
+        registry.callback(
+            "visionai_auth_cache_hit_ratio",
+            "Hit ratio of the auth caches",
+            lambda: [
+                ((name,), c.get_stats()["hit_rate"]) for name, c in caches.items()
+            ],
+            labelnames=("cache",),
+        )
+        registry.callback(
+            "visionai_auth_cache_lookups_total",
+            "Auth cache lookups by result",
+            lambda: [
+                ((name, result), getattr(c, result))
+                for name, c in caches.items()
+                for result in ("hits", "misses")
+            ],
+            labelnames=("cache", "result"),
+            type="counter",
+        )
+        registry.callback(
+            "visionai_bcrypt_pending",
+            "bcrypt calls queued or running on the password pool",
+            lambda: self.password_pending,
+        )
+
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
         return self.pwd_context.verify(plain_password, hashed_password)
@@ -30,6 +123,42 @@ class AuthService:
         """Hash a password"""
         return self.pwd_context.hash(password)
 
+    def _timed_password_call(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            bcrypt_seconds.labels(fn.__name__).observe(time.perf_counter() - started)
+
+    async def _run_password_task(self, fn, *args):
+        """Run a bcrypt call on the password pool, refusing work past the queue limit"""
+        if self.password_pool is None:
+            return self._timed_password_call(fn, *args)
+        if self.password_pending >= self.password_queue_limit:
+            raise PasswordPoolBusy(
+                f"{self.password_pending} password operations already pending"
+            )
+        self.password_pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.password_pool, self._timed_password_call, fn, *args
+            )
+        finally:
+            self.password_pending -= 1
+
+    async def verify_password_async(
+        self, plain_password: str, hashed_password: str
+    ) -> bool:
+        """Verify a password without blocking the event loop"""
+        return await self._run_password_task(
+            self.verify_password, plain_password, hashed_password
+        )
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """Hash a password without blocking the event loop"""
+        return await self._run_password_task(self.get_password_hash, password)
+
     def create_access_token(
         self, data: dict, expires_delta: Optional[timedelta] = None
     ) -> str:
@@ -52,7 +181,8 @@ class AuthService:
         """Create JWT refresh token"""
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=self.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire, "type": "refresh"})
+        # jti keeps tokens issued in the same second unique (session_token is unique)
+        to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
         encoded_jwt = jose_jwt.encode(
             to_encode, self.JWT_SECRET_KEY, algorithm=self.JWT_ALGORITHM
         )
@@ -73,97 +203,325 @@ class AuthService:
             if username is None or token_type_check != token_type:
                 return None
 
-            return TokenData(username=username, user_id=user_id)
+            return TokenData(username=username, user_id=user_id, exp=payload.get("exp"))
         except JWTError:
             return None
 
-    def authenticate_user(
-        self, db: Session, username: str, password: str
+    async def get_user_for_token(self, db: AsyncSession, token: str) -> Optional[User]:
+        """Resolve an access token to its user, using the token and user caches
+
+        Cached users are detached from any session and must be treated as
+        read-only snapshots.
+        """
+        if token in self.revoked_tokens:
+            return None
+
+        token_data = self.token_cache.get(token)
+        if token_data is None:
+            with span("auth.verify_token"):
+                token_data = self.verify_token(token)
+            if token_data is None:
+                return None
+            # Never keep a token cached past its own expiry
+            ttl = None
+            if token_data.exp is not None:
+                ttl = token_data.exp - time.time()
+            self.token_cache.set(token, token_data, ttl)
+
+        with span("auth.load_user"):
+            return await self.get_cached_user(db, token_data.username)
+
+    async def get_cached_user(self, db: AsyncSession, username: str) -> Optional[User]:
+        """Get a user from the user cache, loading and caching it on a miss"""
+        user = self.user_cache.get(username)
+        if user is None:
+            user = await self.get_user(db, username=username)
+            if user is None:
+                return None
+            db.expunge(user)
+            self.user_cache.set(username, user)
+        return user
+
+    def invalidate_user(self, username: str):
+        """Drop a user's cached row in every worker"""
+        pubsub_service.publish("auth", {"event": "user_changed", "username": username})
+
+    def revoke_token(self, token: str, exp: Optional[float] = None):
+        """Reject an access token in every worker until it expires
+
+        exp is the token's expiry timestamp; without it the token is held
+        for a full access token lifetime.
+        """
+        if exp is None:
+            exp = time.time() + self.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        pubsub_service.publish(
+            "auth", {"event": "token_revoked", "token": token, "exp": exp}
+        )
+
+    def revoke_session(self, session_token: str):
+        """Reject a refresh token in every worker without a database lookup"""
+        pubsub_service.publish(
+            "auth", {"event": "session_revoked", "token": session_token}
+        )
+
+    def is_session_revoked(self, session_token: str) -> bool:
+        """True if the refresh token is known to be rotated or logged out"""
+        return session_token in self.revoked_sessions
+
+    def _on_auth_event(self, message: dict):
+        event = message.get("event")
+        if event == "user_changed":
+            self.user_cache.pop(message.get("username"))
+        elif event == "token_revoked":
+            token = message.get("token")
+            self.token_cache.pop(token)
+            self.revoked_tokens.add(token, message["exp"])
+        elif event == "session_revoked":
+            self.revoked_sessions.set(message.get("token"), True)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the auth caches"""
+        return {
+            "tokens": self.token_cache.get_stats(),
+            "users": self.user_cache.get_stats(),
+            "revoked_tokens": len(self.revoked_tokens),
+            "revoked_sessions": len(self.revoked_sessions.entries),
+            "login_writes": (
+                self.login_writes.get_stats() if self.login_writes else None
+            ),
+        }
+
+    async def authenticate_user(
+        self, db: AsyncSession, username: str, password: str
     ) -> Optional[User]:
         """Authenticate user with username and password"""
-        user = db.query(User).filter(User.username == username).first()
+        with span("auth.load_user"):
+            user = await self.get_user(db, username)
         if not user:
             return None
-        if not self.verify_password(password, user.hashed_password):
-            return None
+        with span("auth.verify_password"):
+            if not await self.verify_password_async(password, user.hashed_password):
+                return None
         return user
 
-    def create_user(self, db: Session, user_data) -> User:
+    async def create_user(self, db: AsyncSession, user_data) -> User:
         """Create a new user"""
-        hashed_password = self.get_password_hash(user_data.password)
+        hashed_password = await self.get_password_hash_async(user_data.password)
         db_user = User(
             username=user_data.username,
             email=user_data.email,
             hashed_password=hashed_password,
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
 
-    def get_user(self, db: Session, username: str) -> Optional[User]:
+    async def get_user(self, db: AsyncSession, username: str) -> Optional[User]:
         """Get user by username"""
-        return db.query(User).filter(User.username == username).first()
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
 
-    def get_user_by_id(self, db: Session, user_id: int) -> Optional[User]:
+    async def get_user_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        """Get user by email"""
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def get_user_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        return db.query(User).filter(User.id == user_id).first()
+        return await db.get(User, user_id)
 
-    def update_last_login(self, db: Session, user: User):
+    async def update_last_login(self, db: AsyncSession, user: User):
         """Update user's last login time"""
+        if self.login_writes:
+            self.login_writes.record_login(user, datetime.utcnow())
+            return
         user.last_login = datetime.utcnow()
-        db.commit()
+        await db.commit()
+        self.invalidate_user(user.username)
 
-    def create_session(
-        self, db: Session, user_id: int, session_token: str
-    ) -> UserSession:
-        """Create a new user session"""
+    async def deactivate_user(self, db: AsyncSession, user: User):
+        """Deactivate a user and end all of their sessions"""
+        # Update by id so this also works for detached users from the cache
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(UserSession)
+            .where(UserSession.user_id == user.id)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        self.invalidate_user(user.username)
+
+    async def create_session(
+        self, db: AsyncSession, user_id: int, session_token: str
+    ) -> Optional[UserSession]:
+        """Create a new user session (None if the insert was buffered)"""
+        expires_at = datetime.utcnow() + timedelta(
+            days=self.JWT_REFRESH_TOKEN_EXPIRE_DAYS
+        )
+        if self.login_writes and self.login_writes.buffer_sessions:
+            self.login_writes.add_session(user_id, session_token, expires_at)
+            return None
         session = UserSession(
-            user_id=user_id,
-            session_token=session_token,
-            expires_at=datetime.utcnow()
-            + timedelta(days=self.JWT_REFRESH_TOKEN_EXPIRE_DAYS),
+            user_id=user_id, session_token=session_token, expires_at=expires_at
         )
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
         return session
 
-    def get_active_session(
-        self, db: Session, session_token: str
+    async def get_active_session(
+        self, db: AsyncSession, session_token: str
     ) -> Optional[UserSession]:
         """Get active session by token"""
-        return (
-            db.query(UserSession)
-            .filter(
+        result = await db.execute(
+            select(UserSession).where(
                 UserSession.session_token == session_token,
                 UserSession.is_active == True,
                 UserSession.expires_at > datetime.utcnow(),
             )
-            .first()
         )
+        return result.scalars().first()
+
+    async def _flush_pending_session(self, session_token: str):
+        """Make sure a buffered session insert has reached the database"""
+        if self.login_writes and self.login_writes.has_session(session_token):
+            await self.login_writes.flush()
 
-    def deactivate_session(self, db: Session, session_token: str):
-        """Deactivate a session"""
-        session = (
-            db.query(UserSession)
-            .filter(UserSession.session_token == session_token)
-            .first()
+    async def deactivate_session(
+        self, db: AsyncSession, session_token: str, user_id: int
+    ):
+        """Deactivate one of a user's sessions; other users' are left alone"""
+        await self._flush_pending_session(session_token)
+        await db.execute(
+            update(UserSession)
+            .where(
+                UserSession.session_token == session_token,
+                UserSession.user_id == user_id,
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
         )
-        if session:
-            session.is_active = False
-            db.commit()
+        await db.commit()
+        self.revoke_session(session_token)
 
-    def cleanup_expired_sessions(self, db: Session):
-        """Clean up expired sessions"""
-        expired_sessions = (
-            db.query(UserSession)
-            .filter(UserSession.expires_at < datetime.utcnow())
-            .all()
+    async def end_user_sessions(self, db: AsyncSession, user_id: int):
+        """Deactivate every session a user has"""
+        await db.execute(
+            update(UserSession)
+            .where(UserSession.user_id == user_id, UserSession.is_active == True)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
         )
+        await db.commit()
+
+    async def rotate_session(
+        self, db: AsyncSession, user_id: int, old_token: str, new_token: str
+    ) -> bool:
+        """Swap a live refresh session for a new one in a single transaction
+
+        The old session is claimed with a conditional UPDATE, so concurrent
+        refreshes with the same token cannot both succeed. Presenting a token
+        that was already rotated away is treated as theft and ends all of the
+        user's sessions. Tokens already known to be revoked skip the claim
+        and go straight to that check.
+        """
+        claimed_one = False
+        if not self.is_session_revoked(old_token):
+            await self._flush_pending_session(old_token)
+            claimed = await db.execute(
+                update(UserSession)
+                .where(
+                    UserSession.session_token == old_token,
+                    UserSession.user_id == user_id,
+                    UserSession.is_active == True,
+                    UserSession.expires_at > datetime.utcnow(),
+                )
+                .values(is_active=False)
+                .execution_options(synchronize_session=False)
+            )
+            claimed_one = claimed.rowcount == 1
+        if not claimed_one:
+            await db.rollback()
+            reused = await db.execute(
+                select(UserSession.id).where(UserSession.session_token == old_token)
+            )
+            if reused.first() is not None:
+                logger.warning(
+                    f"Refresh token reuse for user {user_id}, ending all sessions"
+                )
+                await self.end_user_sessions(db, user_id)
+            self.revoke_session(old_token)
+            return False
+
+        db.add(
+            UserSession(
+                user_id=user_id,
+                session_token=new_token,
+                expires_at=datetime.utcnow()
+                + timedelta(days=self.JWT_REFRESH_TOKEN_EXPIRE_DAYS),
+            )
+        )
+        await db.commit()
+        self.revoke_session(old_token)
+        return True
+
+    async def cleanup_expired_sessions(self, db: AsyncSession):
+        """Deactivate expired sessions and delete those past the retention window"""
+        now = datetime.utcnow()
+        expired = await db.execute(
+            update(UserSession)
+            .where(UserSession.is_active == True, UserSession.expires_at < now)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        # Inactive rows are kept until the retention window passes so replayed
+        # refresh tokens are still recognised
+        deleted = await db.execute(
+            delete(UserSession)
+            .where(
+                UserSession.is_active == False,
+                UserSession.expires_at
+                < now - timedelta(hours=settings.SESSION_RETENTION_HOURS),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        logger.info(
+            f"Cleaned up {expired.rowcount} expired sessions, deleted {deleted.rowcount}"
+        )
+
+    def start(self):
+        """Start the session cleanup and the login write-behind flush"""
+        if settings.SESSION_CLEANUP_INTERVAL > 0 and self.cleanup_task is None:
+            self.cleanup_task = asyncio.create_task(self._session_cleanup_loop())
+        if self.login_writes:
+            self.login_writes.start()
 
-        for session in expired_sessions:
-            session.is_active = False
+    async def stop(self):
+        """Stop background work, flushing any buffered login writes"""
+        pubsub_service.unsubscribe("auth", self._on_auth_event)
+        if self.login_writes:
+            await self.login_writes.stop()
+        if self.cleanup_task:
+            self.cleanup_task.cancel()
+            try:
+                await self.cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self.cleanup_task = None
 
-        db.commit()
-        logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
+    async def _session_cleanup_loop(self):
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    await self.cleanup_expired_sessions(db)
+            except Exception as e:
+                logger.error(f"Session cleanup failed: {e}")
+            await asyncio.sleep(settings.SESSION_CLEANUP_INTERVAL)
@@ -1,17 +1,68 @@
 # Camera service
-import cv2
+import asyncio
 import base64
 import logging
+import os
+import time
 from typing import Optional
+from app.core.config import settings
+from app.core.frame_ring import SharedFrameRing
+from app.core.log import get_hot_path_logger
+from app.core.metrics import registry
+from app.core.tracing import span, start_trace
 from app.models.schemas import CameraConfig
+from app.services.pubsub_service import pubsub_service
 
 logger = logging.getLogger(__name__)
+hot_logger = get_hot_path_logger(__name__)
+
+capture_seconds = registry.histogram(
+    "visionai_camera_capture_seconds", "Time to read a frame from the camera"
+)
+encode_seconds = registry.histogram(
+    "visionai_camera_encode_seconds", "Time to JPEG-encode a captured frame"
+)
+frames_captured = registry.counter(
+    "visionai_camera_frames_total", "Frames captured and encoded"
+)
+
+# OpenCV and numpy take ~0.2s to import, so they load when a camera starts
+cv2 = None
+np = None
+
+
+def _load_imaging():
+    """Import OpenCV and numpy on first use"""
+    global cv2, np
+    if cv2 is None:
+        import cv2
+        import numpy as np
 
 
 class CameraService:
     def __init__(self):
         self.camera = None
+        self.mock_frame = None
         self.is_active = False
+        self.fps = 15
+        self.stream_task: Optional[asyncio.Task] = None
+        # The last raw frame captured, for consumers that sample the feed
+        self.latest_frame = None
+        self.latest_frame_at = 0.0
+        # Set when another worker process owns the camera
+        self.remote_active = False
+        self.instance_id = f"{os.getpid()}:{id(self)}"
+        pubsub_service.subscribe("camera", self._on_camera_state)
+
+        # Frames can travel through a shared-memory ring instead of the pub/sub
+        # payload, so other workers read them without a serialized copy
+        self.frame_ring: Optional[SharedFrameRing] = None
+        self.ring_id: Optional[str] = None
+        self.ring_generation = 0
+        self.reader_ring: Optional[SharedFrameRing] = None
+        self.reader_ring_id: Optional[str] = None
+        if settings.FRAME_RING_ENABLED:
+            pubsub_service.subscribe("frame_ready", self._on_frame_ready)
 
     async def start_camera(self, config: CameraConfig):
         """Start camera capture"""
@@ -21,8 +72,26 @@ class CameraService:
             logger.info("Starting mock camera for development")
 
             # Simulate camera initialization
+            _load_imaging()
             self.camera = "mock_camera"  # Mock camera object
+            if self.mock_frame is None:
+                # Create a 640x480 blue frame once, not on every capture
+                self.mock_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                self.mock_frame[:, :] = [100, 150, 200]
             self.is_active = True
+            self.fps = config.fps
+            self.remote_active = False
+            if settings.FRAME_RING_ENABLED and self.frame_ring is None:
+                self.frame_ring = SharedFrameRing.create(
+                    settings.FRAME_RING_NAME,
+                    settings.FRAME_BUFFER_SIZE,
+                    settings.FRAME_RING_SLOT_SIZE,
+                )
+                # Readers re-attach whenever the ring id changes
+                self.ring_generation += 1
+                self.ring_id = f"{self.instance_id}:{self.ring_generation}"
+            self._start_streaming()
+            self._publish_state()
 
             logger.info(
                 f"Mock camera started with resolution {config.width}x{config.height}"
@@ -33,38 +102,175 @@ class CameraService:
             logger.error(f"Failed to start camera: {e}")
             return False
 
-    async def stop_camera(self):
+    async def stop_camera(self, publish: bool = True):
         """Stop camera capture"""
+        self._stop_streaming()
+        if self.frame_ring is not None:
+            self.frame_ring.close()
+            self.frame_ring = None
+        self._close_reader_ring()
         if self.camera:
             # For mock camera, just set to None
             if self.camera != "mock_camera":
                 self.camera.release()
             self.camera = None
         self.is_active = False
+        self.latest_frame = None
         logger.info("Camera stopped")
+        if publish:
+            self._publish_state()
+
+    async def stop(self):
+        """Release the camera and stop listening to other workers"""
+        await self.stop_camera(publish=False)
+        pubsub_service.unsubscribe("camera", self._on_camera_state)
+        pubsub_service.unsubscribe("frame_ready", self._on_frame_ready)
+
+    def _publish_state(self):
+        """Tell other workers whether this process now owns the camera"""
+        pubsub_service.publish(
+            "camera", {"origin": self.instance_id, "active": self.is_active}
+        )
+
+    async def _on_camera_state(self, message: dict):
+        """Only one worker may hold the camera; yield it when another starts"""
+        if message.get("origin") == self.instance_id:
+            return
+        self.remote_active = bool(message.get("active"))
+        if self.frame_ring is not None:
+            # A new owner replaces the ring under the same name; a stop elsewhere
+            # leaves ours in place, and only we can remove it
+            self.frame_ring.close(unlink=not self.frame_ring.replaced())
+            self.frame_ring = None
+        if not self.remote_active:
+            self._close_reader_ring()
+        if self.is_active:
+            await self.stop_camera(publish=False)
+
+    def _start_streaming(self):
+        """Start publishing frames to every worker"""
+        self._stop_streaming()
+        self.stream_task = asyncio.create_task(self._stream_frames())
+
+    def _stop_streaming(self):
+        if self.stream_task and not self.stream_task.done():
+            self.stream_task.cancel()
+        self.stream_task = None
+
+    async def _stream_frames(self):
+        """Capture once per tick and fan the frame out, however many viewers"""
+        interval = 1 / max(self.fps, 1)
+        while self.is_active:
+            started = time.monotonic()
+            with start_trace("camera.frame") as trace:
+                if self.frame_ring is not None:
+                    self._write_ring_frame(await self.capture_jpeg(), trace.trace_id)
+                else:
+                    frame_data = await self.capture_frame()
+                    if frame_data:
+                        with span("camera.publish"):
+                            pubsub_service.publish(
+                                "frames",
+                                {
+                                    "type": "frame",
+                                    "data": frame_data,
+                                    "timestamp": time.time(),
+                                    "trace_id": trace.trace_id,
+                                },
+                            )
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _write_ring_frame(
+        self, buffer: Optional[bytes], trace_id: Optional[str] = None
+    ):
+        """Put a frame in shared memory and announce only its sequence number"""
+        if buffer is None:
+            return
+        timestamp = time.time()
+        try:
+            with span("camera.ring_write"):
+                seq = self.frame_ring.write(buffer, timestamp)
+        except ValueError as e:
+            hot_logger.warning("Skipping frame: %s", e)
+            return
+        with span("camera.publish"):
+            pubsub_service.publish(
+                "frame_ready",
+                {
+                    "ring": self.ring_id,
+                    "seq": seq,
+                    "timestamp": timestamp,
+                    "trace_id": trace_id,
+                },
+            )
+
+    def _on_frame_ready(self, message: dict):
+        """Read an announced frame from the shared ring and hand it to local viewers"""
+        ring = self._attach_ring(message["ring"])
+        if ring is None:
+            return
+        frame = ring.read_bytes(message["seq"])
+        if frame is None:
+            # Overwritten before we got to it; a newer frame is on its way
+            return
+        _, timestamp, buffer = frame
+        pubsub_service.deliver_local(
+            "frames",
+            {
+                "type": "frame",
+                "data": base64.b64encode(buffer).decode("utf-8"),
+                "timestamp": timestamp,
+                "trace_id": message.get("trace_id"),
+            },
+        )
+
+    def _attach_ring(self, ring_id: str) -> Optional[SharedFrameRing]:
+        if ring_id == self.ring_id:
+            return self.frame_ring
+        if self.reader_ring is None or self.reader_ring_id != ring_id:
+            self._close_reader_ring()
+            try:
+                self.reader_ring = SharedFrameRing.attach(settings.FRAME_RING_NAME)
+            except (FileNotFoundError, ValueError) as e:
+                hot_logger.warning("Cannot attach to frame ring: %s", e)
+                return None
+            self.reader_ring_id = ring_id
+        return self.reader_ring
+
+    def _close_reader_ring(self):
+        if self.reader_ring is not None:
+            self.reader_ring.close()
+            self.reader_ring = None
+            self.reader_ring_id = None
 
     async def capture_frame(self):
         """Capture a single frame"""
-        if not self.camera or not self.is_active:
+        buffer = await self.capture_jpeg()
+        if buffer is None:
             return None
+        with span("camera.base64"):
+            return base64.b64encode(buffer).decode("utf-8")
 
-        # For mock camera, return a placeholder frame
-        if self.camera == "mock_camera":
-            # Create a simple colored frame as base64
-            import numpy as np
-
-            # Create a 640x480 blue frame
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            frame[:, :] = [100, 150, 200]  # Blue color
+    async def capture_jpeg(self):
+        """Capture a single frame as JPEG bytes"""
+        if not self.camera or not self.is_active:
+            return None
 
-            _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            frame_base64 = base64.b64encode(buffer).decode("utf-8")
-            return frame_base64
+        with capture_seconds.time(), span("camera.capture"):
+            # For mock camera, return a placeholder frame
+            if self.camera == "mock_camera":
+                frame = self.mock_frame
+                ret = True
+            else:
+                # Real camera code would go here
+                ret, frame = self.camera.read()
+        if not ret:
+            return None
+        self.latest_frame = frame
+        self.latest_frame_at = time.monotonic()
 
-        # Real camera code would go here
-        ret, frame = self.camera.read()
-        if ret:
+        with encode_seconds.time(), span("camera.encode"):
             _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            frame_base64 = base64.b64encode(buffer).decode("utf-8")
-            return frame_base64
-        return None
+            data = buffer.tobytes()
+        frames_captured.inc()
+        return data
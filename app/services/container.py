@@ -0,0 +1,54 @@
+# Service container: the one instance of each service the app shares
+import asyncio
+
+from app.core.config import settings
+from app.services.audio_service import AudioService
+from app.services.auth_service import AuthService
+from app.services.camera_service import CameraService
+from app.services.llm_service import LLMService
+from app.services.pubsub_service import pubsub_service
+from app.services.scene_monitor_service import SceneMonitorService
+from app.services.upload_service import UploadService
+from app.services.video_service import VideoAnalysisService
+from app.services.websocket_service import WebSocketService
+
+
+class ServiceContainer:
+    """Services shared by every router and endpoint
+
+    Built by the app lifespan and kept on app.state, so importing the app
+    constructs nothing. Sharing one WebSocketService and CameraService is what
+    lets connection limits and the camera cover both /ws and /ws-direct.
+    """
+
+    def __init__(self):
+        self.audio = AudioService()
+        self.auth = AuthService()
+        self.camera = CameraService()
+        # Created here rather than at import, inside the loop that uses it
+        self.llm_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        self.llm = LLMService(self.llm_slots)
+        self.upload = UploadService()
+        self.video = VideoAnalysisService(self.llm)
+        self.websocket = WebSocketService()
+        self.scene_monitor = SceneMonitorService(self.camera, self.llm, self.websocket)
+
+    async def start(self):
+        """Connect pub/sub and start background work"""
+        await pubsub_service.start()
+        self.auth.start()
+        self.scene_monitor.start()
+
+    async def stop(self):
+        """Stop background work, release the camera and disconnect pub/sub
+
+        Every service drops its pub/sub subscriptions, so a later container
+        in the same process does not share messages with this one.
+        """
+        await self.video.stop()
+        await self.audio.stop()
+        await self.scene_monitor.stop()
+        await self.auth.stop()
+        await self.camera.stop()
+        await self.websocket.stop()
+        await pubsub_service.stop()
@@ -1,52 +1,164 @@
 # LLM service
+import asyncio
+import base64
+import aiofiles
 import httpx
+import json
 import logging
-from typing import Dict, Any
+import os
+import time
+from typing import AsyncIterator, Dict, Any, Optional
 from app.models.schemas import LLMResponse
 from app.core.config import settings
+from app.core.log import get_hot_path_logger
+from app.core.metrics import registry
+from app.core.tracing import record_span, span
 
 logger = logging.getLogger(__name__)
+# Per-request messages; sampled and rate limited so they stay cheap under load
+hot_logger = get_hot_path_logger(__name__)
+
+queue_wait_seconds = registry.histogram(
+    "visionai_llm_queue_wait_seconds", "Time LLM requests wait for an upstream slot"
+)
+upstream_seconds = registry.histogram(
+    "visionai_llm_upstream_seconds", "Ollama generate request latency", ["kind"]
+)
+first_token_seconds = registry.histogram(
+    "visionai_llm_time_to_first_token_seconds",
+    "Time from sending a generate request to Ollama's first streamed token",
+    ["kind"],
+)
+llm_requests = registry.counter(
+    "visionai_llm_requests_total", "Ollama generate requests by outcome", ["kind", "outcome"]
+)
+llm_in_flight = registry.gauge(
+    "visionai_llm_in_flight", "Generate requests currently sent to Ollama"
+)
+
+DEFAULT_IMAGE_PROMPT = "Analyze this image and provide helpful insights. Be conversational and helpful."
+
+
+# A multiple of 3 bytes, so each chunk base64-encodes without padding
+FILE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+async def _image_file_body(request_data: Dict[str, Any], path: str) -> AsyncIterator[bytes]:
+    """Yield a generate request body with the file base64-encoded into "images"
+
+    Only one chunk of the file is in memory at a time, however large it is.
+    """
+    head = json.dumps({**request_data, "stream": True})
+    yield (head[:-1] + ', "images": ["').encode("utf-8")
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(FILE_CHUNK_SIZE):
+            yield base64.b64encode(chunk)
+    yield b'"]}'
 
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, upstream_slots: Optional[asyncio.Semaphore] = None):
         self.ollama_url = settings.OLLAMA_URL
         self.model_name = settings.MODEL_NAME
+        # Caps calls in flight to Ollama; pass one semaphore to every
+        # instance that feeds the same GPU
+        self.upstream_slots = upstream_slots or asyncio.Semaphore(
+            settings.LLM_MAX_CONCURRENCY
+        )
+
+    async def _generate(
+        self,
+        kind: str,
+        request_data: Dict[str, Any],
+        timeout: float,
+        body: Optional[AsyncIterator[bytes]] = None,
+    ) -> Dict[str, Any]:
+        """Stream a generate request and return Ollama's final chunk with the full response
+
+        Streaming lets us time the first token; the result has the same shape
+        as a non-streamed reply. A body iterator, if given, is sent chunked
+        in place of request_data.
+        """
+        if body is None:
+            with span("llm.encode_body"):
+                body = json.dumps({**request_data, "stream": True}).encode("utf-8")
+
+        queued_at = time.perf_counter()
+        async with self.upstream_slots:
+            queue_wait = time.perf_counter() - queued_at
+            queue_wait_seconds.observe(queue_wait)
+            record_span("llm.queue_wait", queued_at, queue_wait)
+            llm_in_flight.inc()
+            started = time.perf_counter()
+            parse_seconds = 0.0
+            outcome = "error"
+            try:
+                async with httpx.AsyncClient(timeout=timeout) as client:
+                    async with client.stream(
+                        "POST",
+                        f"{self.ollama_url}/api/generate",
+                        content=body,
+                        headers={"Content-Type": "application/json"},
+                    ) as response:
+                        logger.debug("Ollama %s response status: %s", kind, response.status_code)
+
+                        if response.status_code != 200:
+                            error_text = await response.aread()
+                            hot_logger.error("Ollama %s API error: %s, %s", kind, response.status_code, error_text)
+                            raise Exception(f"LLM API error: {response.status_code} - {error_text}")
+
+                        parts = []
+                        result: Dict[str, Any] = {}
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            parse_started = time.perf_counter()
+                            chunk = json.loads(line)
+                            parse_seconds += time.perf_counter() - parse_started
+                            if "error" in chunk:
+                                raise Exception(f"LLM API error: {chunk['error']}")
+                            if chunk.get("response"):
+                                if not parts:
+                                    first_token = parse_started - started
+                                    first_token_seconds.labels(kind).observe(first_token)
+                                    record_span("llm.first_token", started, first_token)
+                                parts.append(chunk["response"])
+                            if chunk.get("done"):
+                                result = chunk
+                                break
+
+                result["response"] = "".join(parts) or result.get("response")
+                outcome = "success"
+                return result
+            finally:
+                upstream = time.perf_counter() - started
+                upstream_seconds.labels(kind).observe(upstream)
+                record_span("llm.upstream", started, upstream)
+                # Summed over every streamed chunk, inside llm.upstream
+                record_span("llm.parse", started, parse_seconds)
+                llm_requests.labels(kind, outcome).inc()
+                llm_in_flight.dec()
 
     async def process_text_with_llm(self, prompt: str) -> LLMResponse:
         """Process text-only message with LLM using Ollama"""
         try:
-            logger.info(f"Processing text prompt: {prompt}")
+            hot_logger.info("Sending text prompt to Ollama (%d chars)", len(prompt))
             
             request_data = {
                 "model": self.model_name,
                 "prompt": prompt,
-                "stream": False,
+                "stream": True,
             }
 
-            logger.info(f"Sending text request to Ollama: {self.ollama_url}/api/generate")
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.ollama_url}/api/generate", json=request_data
-                )
-
-                logger.info(f"Ollama text response status: {response.status_code}")
-
-                if response.status_code == 200:
-                    result = response.json()
-                    return LLMResponse(
-                        response=result.get("response", "No response generated"),
-                        confidence=0.9,
-                        processing_time=result.get("total_duration", 0) / 1e9,
-                    )
-                else:
-                    error_text = await response.aread()
-                    logger.error(f"Ollama text API error: {response.status_code}, {error_text}")
-                    raise Exception(f"LLM API error: {response.status_code} - {error_text}")
+            result = await self._generate("text", request_data, timeout=30.0)
+            return LLMResponse(
+                response=result.get("response") or "No response generated",
+                confidence=0.9,
+                processing_time=result.get("total_duration", 0) / 1e9,
+            )
 
         except Exception as e:
-            logger.error(f"LLM text processing error: {e}", exc_info=True)
+            hot_logger.error("LLM text processing error: %s", e)
             return LLMResponse(
                 response=f"Error processing text: {str(e)}",
                 confidence=0.0,
@@ -59,86 +171,93 @@ class LLMService:
         """Process image with LLM using Ollama"""
         try:
             if prompt is None:
-                prompt = "Analyze this image and provide helpful insights. Be conversational and helpful."
+                prompt = DEFAULT_IMAGE_PROMPT
 
             # Clean and validate base64 data
-            import base64
-            
             # Remove any data URL prefix if present
-            if image_data.startswith("data:image"):
-                image_data = image_data.split(",")[1]
-            elif image_data.startswith("data:"):
-                image_data = image_data.split(",")[1]
+            with span("llm.strip_data_url"):
+                if image_data.startswith("data:image"):
+                    image_data = image_data.split(",")[1]
+                elif image_data.startswith("data:"):
+                    image_data = image_data.split(",")[1]
             
             # Validate base64
             try:
-                # Try to decode and re-encode to ensure it's valid
-                decoded = base64.b64decode(image_data)
-                
-                # Check image size - if too large, resize it
-                if len(decoded) > 2 * 1024 * 1024:  # 2MB limit
-                    logger.warning(f"Image too large ({len(decoded)} bytes), resizing...")
-                    # For now, just truncate the base64 to a smaller size
-                    # In production, you'd want to actually resize the image
-                    image_data = image_data[:int(len(image_data) * 0.5)]  # Reduce by 50%
+                with span("llm.validate_base64"):
+                    # Try to decode and re-encode to ensure it's valid
                     decoded = base64.b64decode(image_data)
-                
-                validated_base64 = base64.b64encode(decoded).decode('utf-8')
-                logger.info(f"Base64 validation successful. Length: {len(validated_base64)}")
-                logger.info(f"Image size: {len(decoded)} bytes")
+                    
+                    # Check image size - if too large, resize it
+                    if len(decoded) > 2 * 1024 * 1024:  # 2MB limit
+                        hot_logger.warning("Image too large (%d bytes), resizing...", len(decoded))
+                        # For now, just truncate the base64 to a smaller size
+                        # In production, you'd want to actually resize the image
+                        image_data = image_data[:int(len(image_data) * 0.5)]  # Reduce by 50%
+                        decoded = base64.b64decode(image_data)
+                    
+                    validated_base64 = base64.b64encode(decoded).decode('utf-8')
             except Exception as e:
-                logger.error(f"Base64 validation failed: {e}")
+                hot_logger.error("Base64 validation failed: %s", e)
                 raise Exception(f"Invalid base64 data: {e}")
 
             # Format for Ollama - just the base64 string without data URL prefix
-            logger.info(f"Sending image to Ollama. Base64 length: {len(validated_base64)}")
-            logger.info(f"Base64 starts with: {validated_base64[:20]}...")
-
-            request_data = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "images": [validated_base64],
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 200
-                }
-            }
+            hot_logger.info(
+                "Sending image to Ollama (%d bytes, %d base64 chars)",
+                len(decoded),
+                len(validated_base64),
+            )
 
-            logger.info(f"Sending request to Ollama: {self.ollama_url}/api/generate")
+            request_data = {**self._image_request(prompt), "images": [validated_base64]}
+            result = await self._generate("image", request_data, timeout=120.0)
+            return self._image_response(result)
 
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    f"{self.ollama_url}/api/generate", json=request_data
-                )
+        except Exception as e:
+            hot_logger.error("LLM processing error: %s", e)
+            return LLMResponse(
+                response=f"Error processing image: {str(e)}",
+                confidence=0.0,
+                processing_time=0.0,
+            )
 
-                logger.info(f"Ollama response status: {response.status_code}")
+    async def process_image_file(self, path: str, prompt: str = None) -> LLMResponse:
+        """Process a stored image file with LLM, streaming it from disk to Ollama"""
+        try:
+            hot_logger.info("Sending image file to Ollama (%d bytes)", os.path.getsize(path))
 
-                if response.status_code == 200:
-                    result = response.json()
-                    return LLMResponse(
-                        response=result.get("response", "No response generated"),
-                        confidence=0.8,
-                        processing_time=result.get("total_duration", 0) / 1e9,
-                    )
-                else:
-                    error_text = await response.aread()
-                    logger.error(
-                        f"Ollama API error: {response.status_code}, {error_text}"
-                    )
-                    raise Exception(
-                        f"LLM API error: {response.status_code} - {error_text}"
-                    )
+            request_data = self._image_request(prompt or DEFAULT_IMAGE_PROMPT)
+            result = await self._generate(
+                "image", request_data, timeout=120.0, body=_image_file_body(request_data, path)
+            )
+            return self._image_response(result)
 
         except Exception as e:
-            logger.error(f"LLM processing error: {e}")
+            hot_logger.error("LLM file processing error: %s", e)
             return LLMResponse(
                 response=f"Error processing image: {str(e)}",
                 confidence=0.0,
                 processing_time=0.0,
             )
 
+    def _image_request(self, prompt: str) -> Dict[str, Any]:
+        """Generate request fields for an image prompt, minus the image"""
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_predict": 200
+            }
+        }
+
+    def _image_response(self, result: Dict[str, Any]) -> LLMResponse:
+        return LLMResponse(
+            response=result.get("response") or "No response generated",
+            confidence=0.8,
+            processing_time=result.get("total_duration", 0) / 1e9,
+        )
+
     async def get_status(self) -> Dict[str, Any]:
         """Get LLM service status"""
         try:
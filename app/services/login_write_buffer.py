@@ -0,0 +1,148 @@
+# Write-behind buffer for login bookkeeping
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import insert, update
+
+from app.models.user import User, UserSession
+
+logger = logging.getLogger(__name__)
+
+
+class LoginWriteBuffer:
+    """Batches last_login updates (and optionally session inserts) into bulk transactions
+
+    Repeated logins by one user between flushes collapse into a single
+    UPDATE. Pending writes are flushed at least every flush_interval seconds,
+    as soon as max_batch writes are waiting, and on stop().
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        flush_interval: float,
+        max_batch: int,
+        buffer_sessions: bool = False,
+        on_flushed_user: Optional[Callable[[str], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.buffer_sessions = buffer_sessions
+        self.on_flushed_user = on_flushed_user
+
+        self.last_logins: Dict[int, Tuple[datetime, str]] = {}
+        self.sessions: Dict[str, dict] = {}
+        self.flush_requested = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Start the periodic flush"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write out anything still pending"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+    def pending(self) -> int:
+        return len(self.last_logins) + len(self.sessions)
+
+    def record_login(self, user: User, when: datetime):
+        """Queue a last_login update, replacing any earlier one for the user"""
+        self.last_logins[user.id] = (when, user.username)
+        self._maybe_request_flush()
+
+    def add_session(self, user_id: int, session_token: str, expires_at: datetime):
+        """Queue a session insert"""
+        self.sessions[session_token] = {
+            "user_id": user_id,
+            "session_token": session_token,
+            "expires_at": expires_at,
+            "is_active": True,
+        }
+        self._maybe_request_flush()
+
+    def has_session(self, session_token: str) -> bool:
+        return session_token in self.sessions
+
+    def _maybe_request_flush(self):
+        if self.pending() >= self.max_batch:
+            self.flush_requested.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.flush_requested.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every pending change in one transaction"""
+        async with self.flush_lock:
+            if not self.pending():
+                return
+            last_logins, self.last_logins = self.last_logins, {}
+            sessions, self.sessions = self.sessions, {}
+
+            try:
+                async with self.session_factory() as db:
+                    if last_logins:
+                        await db.execute(
+                            update(User),
+                            [
+                                {"id": user_id, "last_login": when}
+                                for user_id, (when, _) in last_logins.items()
+                            ],
+                        )
+                    if sessions:
+                        await db.execute(insert(UserSession), list(sessions.values()))
+                    await db.commit()
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Login write-behind flush failed: {e}")
+                self._requeue(last_logins, sessions)
+                return
+
+            self.flushes += 1
+            self.rows_written += len(last_logins) + len(sessions)
+            if self.on_flushed_user:
+                for _, username in last_logins.values():
+                    self.on_flushed_user(username)
+
+    def _requeue(
+        self, last_logins: Dict[int, Tuple[datetime, str]], sessions: Dict[str, dict]
+    ):
+        # Newer logins recorded during the failed flush win
+        for user_id, entry in last_logins.items():
+            self.last_logins.setdefault(user_id, entry)
+        for token, row in sessions.items():
+            self.sessions.setdefault(token, row)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get flush counters"""
+        return {
+            "pending_last_logins": len(self.last_logins),
+            "pending_sessions": len(self.sessions),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,284 @@
+# Pub/sub service for fanning messages out across worker processes
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+from collections import defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+from app.core.serialization import get_codec
+
+logger = logging.getLogger(__name__)
+hot_logger = get_hot_path_logger(__name__)
+
+# Frame header: total length, channel name length
+HEADER = struct.Struct(">IH")
+
+MessageHandler = Callable[[Any], Any]
+
+
+class PubSubTransport:
+    """Moves published messages between processes"""
+
+    async def start(self, on_message: Callable[[str, bytes], None]):
+        pass
+
+    def publish(self, channel: str, data: bytes):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class LocalTransport(PubSubTransport):
+    """Single-process transport; messages are only delivered locally"""
+
+
+def _pack(channel: str, data: bytes) -> bytes:
+    name = channel.encode("utf-8")
+    return HEADER.pack(HEADER.size + len(name) + len(data), len(name)) + name + data
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(HEADER.size)
+    length, _ = HEADER.unpack(header)
+    return header + await reader.readexactly(length - HEADER.size)
+
+
+def _unpack(frame: bytes):
+    _, name_length = HEADER.unpack_from(frame)
+    start = HEADER.size
+    channel = frame[start : start + name_length].decode("utf-8")
+    return channel, frame[start + name_length :]
+
+
+class UnixSocketBroker:
+    """Relays frames between worker connections on a Unix socket"""
+
+    def __init__(self, path: str, max_buffer: int):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.writers: Set[asyncio.StreamWriter] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.dropped_frames = 0
+
+    async def start(self) -> bool:
+        """Try to become the broker; returns False if another process already is"""
+        try:
+            self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        except OSError:
+            return False
+        logger.info(f"Pub/sub broker listening on {self.path} (pid {os.getpid()})")
+        return True
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                for other in self.writers:
+                    if other is writer:
+                        continue
+                    # Never let one stalled worker back up the broker
+                    if other.transport.get_write_buffer_size() > self.max_buffer:
+                        self.dropped_frames += 1
+                        continue
+                    other.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for writer in list(self.writers):
+            writer.close()
+        self.writers.clear()
+
+
+class UnixSocketTransport(PubSubTransport):
+    """Fans out through a broker on a Unix socket
+
+    The first worker to take the broker lock runs the broker; every worker,
+    including that one, connects to it as a client. If the broker process
+    exits its lock is released and the remaining workers race to take over.
+    """
+
+    def __init__(self, path: str, max_buffer: int, reconnect_delay: float = 0.5):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.reconnect_delay = reconnect_delay
+        self.broker: Optional[UnixSocketBroker] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.task: Optional[asyncio.Task] = None
+        self.lock_fd: Optional[int] = None
+        self.dropped_frames = 0
+
+    async def start(self, on_message: Callable[[str, bytes], None]):
+        self.task = asyncio.create_task(self._run(on_message))
+
+    def _acquire_broker_lock(self) -> bool:
+        """Take the lock that elects this process as broker; released by the OS on exit"""
+        if self.lock_fd is not None:
+            return True
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.lock_fd = fd
+        return True
+
+    async def _connect(self):
+        try:
+            return await asyncio.open_unix_connection(self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not self._acquire_broker_lock():
+                raise
+
+        # We hold the broker lock, so any socket file left behind is stale
+        if self.broker is None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            broker = UnixSocketBroker(self.path, self.max_buffer)
+            if await broker.start():
+                self.broker = broker
+        return await asyncio.open_unix_connection(self.path)
+
+    async def _run(self, on_message: Callable[[str, bytes], None]):
+        while True:
+            try:
+                reader, self.writer = await self._connect()
+                while True:
+                    channel, data = _unpack(await _read_frame(reader))
+                    on_message(channel, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pub/sub connection lost: {e}")
+            self.writer = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    def publish(self, channel: str, data: bytes):
+        writer = self.writer
+        if writer is None or writer.is_closing():
+            self.dropped_frames += 1
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.dropped_frames += 1
+            return
+        writer.write(_pack(channel, data))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.broker:
+            await self.broker.stop()
+            self.broker = None
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+
+
+def create_transport(name: str) -> PubSubTransport:
+    """Build the transport named in settings"""
+    if name == "unix":
+        return UnixSocketTransport(
+            settings.PUBSUB_SOCKET_PATH, settings.PUBSUB_MAX_BUFFER
+        )
+    if name != "local":
+        logger.warning(f"Unknown pub/sub transport '{name}', using local")
+    return LocalTransport()
+
+
+class PubSubService:
+    def __init__(self, transport: Optional[PubSubTransport] = None):
+        self.transport = transport or create_transport(settings.PUBSUB_TRANSPORT)
+        self.handlers: Dict[str, List[MessageHandler]] = defaultdict(list)
+        self.codec = get_codec("msgpack")
+        self.started = False
+        # Running async handlers; the loop itself only holds weak references
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Connect the transport"""
+        if not self.started:
+            await self.transport.start(self._on_remote)
+            self.started = True
+
+    async def stop(self):
+        """Disconnect the transport"""
+        if self.started:
+            await self.transport.stop()
+            self.started = False
+
+    def subscribe(self, channel: str, handler: MessageHandler):
+        """Call handler for every message on channel, local or remote"""
+        self.handlers[channel].append(handler)
+
+    def unsubscribe(self, channel: str, handler: MessageHandler):
+        """Stop calling handler for channel"""
+        if handler in self.handlers.get(channel, []):
+            self.handlers[channel].remove(handler)
+
+    def publish(self, channel: str, message: Any):
+        """Deliver message to local subscribers and to every other worker"""
+        self._deliver(channel, message)
+        if self.started:
+            data = self.codec.encode(message)
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            self.transport.publish(channel, data)
+
+    def deliver_local(self, channel: str, message: Any):
+        """Deliver message to this process's subscribers only"""
+        self._deliver(channel, message)
+
+    def _on_remote(self, channel: str, data: bytes):
+        if channel not in self.handlers:
+            return
+        try:
+            message = self.codec.decode(data)
+        except Exception as e:
+            hot_logger.error(
+                "Dropping undecodable pub/sub message on '%s': %s", channel, e
+            )
+            return
+        self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: Any):
+        for handler in list(self.handlers.get(channel, [])):
+            try:
+                result = handler(message)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self.tasks.add(task)
+                    task.add_done_callback(partial(self._handler_done, channel))
+            except Exception as e:
+                hot_logger.error("Pub/sub handler error on '%s': %s", channel, e)
+
+    def _handler_done(self, channel: str, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            hot_logger.error(
+                "Pub/sub handler error on '%s': %s", channel, task.exception()
+            )
+
+
+# One broker connection per process, shared by every service that fans out
+pubsub_service = PubSubService()
@@ -0,0 +1,165 @@
+# Scene monitor: analyzes the live camera feed when the scene changes
+import asyncio
+import base64
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.tracing import start_trace
+from app.services.camera_service import CameraService
+from app.services.llm_service import LLMService
+from app.services.video_service import change_score, scene_thumbnail
+from app.services.websocket_service import WebSocketService
+
+logger = logging.getLogger(__name__)
+
+scene_samples = registry.counter(
+    "visionai_scene_samples_total",
+    "Camera frames scored by the scene monitor, by what was decided",
+    ["decision"],
+)
+
+BUDGET_WINDOW = 3600.0
+
+
+class SceneMonitorService:
+    """Samples camera frames and sends one to the LLM when the scene changes
+
+    Each sample is scored against the last frame that was analyzed, not the
+    previous sample, so slow drift adds up and an unchanged scene never
+    costs a call. A change only triggers an analysis when none is in flight,
+    SCENE_MIN_INTERVAL has passed and SCENE_MAX_PER_HOUR is not spent; until
+    then it keeps scoring high and goes out as soon as it is allowed.
+    """
+
+    def __init__(
+        self,
+        camera_service: CameraService,
+        llm_service: LLMService,
+        websocket_service: WebSocketService,
+    ):
+        self.camera_service = camera_service
+        self.llm_service = llm_service
+        self.websocket_service = websocket_service
+        self.enabled = settings.SCENE_MONITOR_ENABLED
+        self.sample_interval = 1 / max(settings.SCENE_SAMPLE_FPS, 0.01)
+        self.threshold = settings.SCENE_CHANGE_THRESHOLD
+        self.min_interval = settings.SCENE_MIN_INTERVAL
+        self.max_per_hour = settings.SCENE_MAX_PER_HOUR
+        self.prompt = settings.SCENE_PROMPT
+        self.task: Optional[asyncio.Task] = None
+        self.analysis: Optional[asyncio.Task] = None
+        self.reference = None  # thumbnail of the last analyzed frame
+        self.last_sampled_at = 0.0
+        self.last_analysis_at: Optional[float] = None
+        self.recent: Deque[float] = deque()  # analysis times within the budget window
+        self.last_score = 0.0
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.decisions: Dict[str, int] = {}
+
+    def start(self):
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self.task, self.analysis):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.task = None
+
+    def decide(self, thumbnail, now: float) -> Tuple[str, float]:
+        """Score a sample and decide whether it is analyzed
+
+        Returns the decision (analyze, unchanged, busy, min_interval or budget)
+        and the score. An analyze decision makes this sample the new reference.
+        """
+        if self.reference is None:
+            score = 1.0
+        else:
+            score = change_score(thumbnail, self.reference)
+        self.last_score = score
+        if score <= self.threshold:
+            return "unchanged", score
+        if self.analysis is not None and not self.analysis.done():
+            return "busy", score
+        if (
+            self.last_analysis_at is not None
+            and now - self.last_analysis_at < self.min_interval
+        ):
+            return "min_interval", score
+        while self.recent and now - self.recent[0] >= BUDGET_WINDOW:
+            self.recent.popleft()
+        if self.max_per_hour and len(self.recent) >= self.max_per_hour:
+            return "budget", score
+        self.reference = thumbnail
+        self.last_analysis_at = now
+        self.recent.append(now)
+        return "analyze", score
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            camera = self.camera_service
+            # Only the worker that owns the camera sees frames here
+            if not camera.is_active or camera.latest_frame is None:
+                self.reference = None
+                continue
+            if camera.latest_frame_at == self.last_sampled_at:
+                continue
+            self.last_sampled_at = camera.latest_frame_at
+            frame = camera.latest_frame
+            try:
+                decision, score = self.decide(scene_thumbnail(frame), time.monotonic())
+            except Exception as e:
+                logger.error(f"Scene scoring failed: {e}")
+                continue
+            scene_samples.labels(decision).inc()
+            self.decisions[decision] = self.decisions.get(decision, 0) + 1
+            if decision == "analyze":
+                self.analysis = asyncio.create_task(self._analyze(frame, score))
+
+    async def _analyze(self, frame, score: float):
+        import cv2
+
+        with start_trace("scene.analyze") as trace:
+            _, buffer = cv2.imencode(
+                ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, settings.FRAME_QUALITY]
+            )
+            image = base64.b64encode(buffer.tobytes()).decode("ascii")
+            try:
+                result = await self.llm_service.process_image_with_llm(
+                    image, self.prompt
+                )
+            except Exception as e:
+                logger.error(f"Scene analysis failed: {e}")
+                return
+            self.last_result = {
+                "data": result.dict(),
+                "score": round(score, 4),
+                "timestamp": time.time(),
+                "trace_id": trace.trace_id,
+            }
+            await self.websocket_service.broadcast_to_all(
+                {"type": "scene_analysis", **self.last_result}
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        """Monitor settings, decision counts and the latest analysis"""
+        return {
+            "enabled": self.enabled,
+            "running": self.task is not None and not self.task.done(),
+            "threshold": self.threshold,
+            "min_interval": self.min_interval,
+            "max_per_hour": self.max_per_hour,
+            "analyses_last_hour": len(self.recent),
+            "last_score": round(self.last_score, 4),
+            "decisions": dict(self.decisions),
+            "last_result": self.last_result,
+        }
@@ -0,0 +1,315 @@
+# Upload service: stream multipart file uploads to disk
+import logging
+import os
+import re
+import uuid
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+import aiofiles
+from multipart.multipart import (
+    MultipartParseError,
+    MultipartParser,
+    parse_options_header,
+)
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+upload_bytes = registry.counter(
+    "visionai_upload_bytes_total", "File bytes written to UPLOAD_DIR"
+)
+uploads = registry.counter(
+    "visionai_uploads_total", "Multipart uploads by outcome", ["outcome"]
+)
+
+# Multipart field the file must be sent in
+FILE_FIELD = b"file"
+# Enough leading bytes to recognise every type in FILE_TYPES
+SNIFF_BYTES = 12
+# Stored files are named <uuid4 hex>.<extension>
+FILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+# Allowance for boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class FileType(NamedTuple):
+    extension: str
+    names: Tuple[str, ...]  # how ALLOWED_FILE_TYPES may spell it
+    content_type: str
+    kind: str  # 'image', 'audio' or 'video'
+
+
+def _is_mp3(head: bytes) -> bool:
+    # An ID3 tag, or an MPEG audio frame sync (11 set bits)
+    return head.startswith(b"ID3") or (
+        len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+    )
+
+
+# Checked in order against the first SNIFF_BYTES of the file
+FILE_TYPES = [
+    (
+        FileType("jpg", ("jpg", "jpeg"), "image/jpeg", "image"),
+        lambda head: head.startswith(b"\xff\xd8\xff"),
+    ),
+    (
+        FileType("png", ("png",), "image/png", "image"),
+        lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    ),
+    (
+        FileType("gif", ("gif",), "image/gif", "image"),
+        lambda head: head[:6] in (b"GIF87a", b"GIF89a"),
+    ),
+    (
+        FileType("wav", ("wav",), "audio/wav", "audio"),
+        lambda head: head[:4] == b"RIFF" and head[8:12] == b"WAVE",
+    ),
+    (
+        FileType("mp4", ("mp4",), "video/mp4", "video"),
+        lambda head: head[4:8] == b"ftyp",
+    ),
+    (FileType("mp3", ("mp3",), "audio/mpeg", "audio"), _is_mp3),
+]
+
+
+def sniff_file_type(head: bytes) -> Optional[FileType]:
+    """Identify a file from its leading bytes, ignoring the client's claims"""
+    for file_type, matches in FILE_TYPES:
+        if matches(head):
+            return file_type
+    return None
+
+
+class StoredUpload(NamedTuple):
+    file_id: str
+    path: str
+    filename: str
+    file_type: FileType
+    size: int
+
+
+class InvalidUpload(Exception):
+    """Raised when the request is not a multipart body with a file part"""
+
+
+class UploadTooLarge(Exception):
+    """Raised when the file grows past MAX_FILE_SIZE"""
+
+
+class UnsupportedFileType(Exception):
+    """Raised when the file's leading bytes are not an allowed type"""
+
+
+class _PartEvents:
+    """Collects MultipartParser callbacks so they can be handled with await"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, object]] = []
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: List[Tuple[bytes, bytes]] = []
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": lambda: self.events.append(("end", None)),
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": lambda: self.events.append(
+                ("headers", Headers(raw=self.headers))
+            ),
+        }
+
+    def on_part_begin(self):
+        self.headers = []
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.events.append(("data", data[start:end]))
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers.append((self.header_field.lower(), self.header_value))
+        self.header_field = b""
+        self.header_value = b""
+
+    def drain(self) -> List[Tuple[str, object]]:
+        events, self.events = self.events, []
+        return events
+
+
+class _FileWriter:
+    """Writes one file part to disk once its leading bytes pass the type check"""
+
+    def __init__(self, service: "UploadService", filename: str):
+        self.service = service
+        self.filename = os.path.basename(filename)[:255]
+        self.head = b""
+        self.file = None
+        self.file_id = uuid.uuid4().hex
+        self.file_type: Optional[FileType] = None
+        self.path: Optional[str] = None
+        self.size = 0
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.service.max_size:
+            raise UploadTooLarge(f"File exceeds {self.service.max_size} bytes")
+        if self.file is None:
+            self.head += data
+            if len(self.head) >= SNIFF_BYTES:
+                await self._open()
+            return
+        await self.file.write(data)
+
+    async def finish(self) -> StoredUpload:
+        if self.file is None:
+            await self._open()
+        await self.file.close()
+        return StoredUpload(
+            self.file_id, self.path, self.filename, self.file_type, self.size
+        )
+
+    async def discard(self):
+        if self.file is not None:
+            await self.file.close()
+            os.remove(self.path)
+
+    async def _open(self):
+        self.file_type = sniff_file_type(self.head[:SNIFF_BYTES])
+        if (
+            self.file_type is None
+            or self.file_type.extension not in self.service.allowed
+        ):
+            raise UnsupportedFileType("File type is not allowed")
+        self.path = os.path.join(
+            self.service.upload_dir, f"{self.file_id}.{self.file_type.extension}"
+        )
+        self.file = await aiofiles.open(self.path, "wb")
+        head, self.head = self.head, b""
+        await self.file.write(head)
+
+
+class UploadService:
+    def __init__(self):
+        self.upload_dir = settings.UPLOAD_DIR
+        self.max_size = settings.MAX_FILE_SIZE
+        allowed_names = {
+            name.lower().lstrip(".") for name in settings.ALLOWED_FILE_TYPES
+        }
+        self.allowed = {
+            file_type.extension
+            for file_type, _ in FILE_TYPES
+            if allowed_names.intersection(file_type.names)
+        }
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def find(self, file_id: str) -> Optional[StoredUpload]:
+        """Look up a stored upload by its ID"""
+        if not FILE_ID_PATTERN.fullmatch(file_id):
+            return None
+        for file_type, _ in FILE_TYPES:
+            path = os.path.join(self.upload_dir, f"{file_id}.{file_type.extension}")
+            if os.path.exists(path):
+                return StoredUpload(
+                    file_id,
+                    path,
+                    os.path.basename(path),
+                    file_type,
+                    os.path.getsize(path),
+                )
+        return None
+
+    def remove(self, stored: StoredUpload):
+        """Delete a stored upload"""
+        os.remove(stored.path)
+
+    async def save_stream(
+        self, headers: Headers, stream: AsyncIterator[bytes]
+    ) -> StoredUpload:
+        """Write the multipart 'file' part to UPLOAD_DIR chunk by chunk
+
+        Only one chunk of the request is held in memory at a time. The size
+        limit is enforced as bytes arrive and the type is checked from the
+        file's first bytes, so a bad upload is rejected before it is read in
+        full. When the upload fails, whatever it wrote to disk is removed,
+        including a file part that was complete when the rest of the body broke.
+        """
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise InvalidUpload("Expected a multipart/form-data body")
+        # Refuse an oversized body up front when the client declares its size
+        content_length = headers.get("content-length", "")
+        if (
+            content_length.isdigit()
+            and int(content_length) > self.max_size + MULTIPART_OVERHEAD
+        ):
+            uploads.labels("too_large").inc()
+            raise UploadTooLarge(f"File exceeds {self.max_size} bytes")
+
+        parts = _PartEvents()
+        parser = MultipartParser(params[b"boundary"], parts.callbacks())
+        writer: Optional[_FileWriter] = None
+        stored: Optional[StoredUpload] = None
+        body_read = False
+        try:
+            with span("upload.stream"):
+                async for chunk in stream:
+                    parser.write(chunk)
+                    for event, value in parts.drain():
+                        if event == "headers" and stored is None and writer is None:
+                            _, options = parse_options_header(
+                                value.get("content-disposition", "")
+                            )
+                            if (
+                                options.get(b"name") == FILE_FIELD
+                                and b"filename" in options
+                            ):
+                                writer = _FileWriter(
+                                    self,
+                                    options[b"filename"].decode("utf-8", "replace"),
+                                )
+                        elif event == "data" and writer is not None:
+                            await writer.write(value)
+                        elif event == "end" and writer is not None:
+                            stored = await writer.finish()
+                            writer = None
+                parser.finalize()
+            body_read = True
+        except UploadTooLarge:
+            uploads.labels("too_large").inc()
+            raise
+        except UnsupportedFileType:
+            uploads.labels("unsupported").inc()
+            raise
+        except MultipartParseError as e:
+            uploads.labels("invalid").inc()
+            raise InvalidUpload(f"Malformed multipart body: {e}")
+        finally:
+            if writer is not None:
+                await writer.discard()
+            if stored is not None and not body_read:
+                self.remove(stored)
+
+        if stored is None:
+            uploads.labels("invalid").inc()
+            raise InvalidUpload("No file part named 'file'")
+        uploads.labels("success").inc()
+        upload_bytes.inc(stored.size)
+        logger.info(
+            "Stored upload %s (%s, %d bytes)",
+            stored.file_id,
+            stored.file_type.content_type,
+            stored.size,
+        )
+        return stored
@@ -0,0 +1,355 @@
+# Video analysis service: scene-change keyframes sent to the LLM
+import asyncio
+import base64
+import concurrent.futures
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.rate_limit import check_rate_limit
+from app.services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+decode_seconds = registry.histogram(
+    "visionai_video_decode_seconds", "Time to decode a video and find its scenes"
+)
+video_frames = registry.counter(
+    "visionai_video_frames_total", "Video frames decoded for analysis"
+)
+video_segments = registry.counter(
+    "visionai_video_segments_total", "Video segments sent to the LLM"
+)
+
+# Scene detection compares frames at this size, in grayscale
+DETECT_SIZE = (64, 36)
+
+
+class Scene(NamedTuple):
+    index: int
+    start: float  # seconds
+    end: float
+    keyframe: str  # base64 JPEG of the scene's first frame, downscaled
+
+
+class JobCancelled(Exception):
+    """Raised in the decode thread when its job is cancelled"""
+
+
+def scene_thumbnail(frame):
+    """Small grayscale copy of a BGR frame, for change_score"""
+    import cv2
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, DETECT_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def change_score(thumbnail, reference) -> float:
+    """Mean absolute difference of two thumbnails, from 0 (same) to 1"""
+    import cv2
+    import numpy as np
+
+    return float(np.mean(cv2.absdiff(thumbnail, reference))) / 255.0
+
+
+def iter_scenes(
+    path: str,
+    sample_fps: float,
+    threshold: float,
+    min_scene: float,
+    max_scenes: int,
+    keyframe_width: int,
+    progress=None,
+) -> Iterator[Scene]:
+    """Decode a video and yield one Scene per detected shot, in order
+
+    Every frame is grabbed but only sample_fps frames per second are
+    converted and compared. A sample starts a new scene when its mean
+    absolute difference from the previous sample, on a small grayscale copy,
+    exceeds threshold (0-1) and the current scene is at least min_scene long.
+    After max_scenes the last scene runs to the end. progress(frames, total)
+    is called after each sample. Runs in a worker thread.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open video")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, round(fps / sample_fps))
+
+        def keyframe(frame) -> str:
+            height, width = frame.shape[:2]
+            if width > keyframe_width:
+                size = (keyframe_width, round(height * keyframe_width / width))
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            return base64.b64encode(buffer.tobytes()).decode("ascii")
+
+        previous = None
+        scene_start = 0.0
+        scene_keyframe: Optional[str] = None
+        index = 0
+        frame_number = 0
+        while capture.grab():
+            frame_number += 1
+            if (frame_number - 1) % step:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            timestamp = (frame_number - 1) / fps
+            small = scene_thumbnail(frame)
+            if previous is None:
+                scene_keyframe = keyframe(frame)
+            elif (
+                index + 1 < max_scenes
+                and timestamp - scene_start >= min_scene
+                and change_score(small, previous) > threshold
+            ):
+                yield Scene(index, scene_start, timestamp, scene_keyframe)
+                index += 1
+                scene_start = timestamp
+                scene_keyframe = keyframe(frame)
+            previous = small
+            if progress:
+                progress(frame_number, total)
+
+        if scene_keyframe is not None:
+            if progress:
+                progress(frame_number, frame_number)
+            yield Scene(index, scene_start, frame_number / fps, scene_keyframe)
+    finally:
+        capture.release()
+
+
+class VideoJob:
+    """One video analysis: progress, finished segments and live subscribers"""
+
+    def __init__(self, user_id: int, file_id: str, prompt: Optional[str]):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.file_id = file_id
+        self.prompt = prompt
+        self.status = "queued"  # running, completed, failed or cancelled
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # Written by the decode thread, read on the event loop
+        self.frames_decoded = 0
+        self.total_frames = 0
+        self.segments_detected = 0
+        self.segments: List[Dict[str, Any]] = []
+        self.cancelled = threading.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def progress(self, frames: int, total: int):
+        self.frames_decoded = frames
+        self.total_frames = max(total, frames)
+
+    def publish(self, event: Dict[str, Any]):
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "file_id": self.file_id,
+            "status": self.status,
+            "error": self.error,
+            "progress": (
+                self.frames_decoded / self.total_frames if self.total_frames else 0.0
+            ),
+            "frames_decoded": self.frames_decoded,
+            "total_frames": self.total_frames,
+            "segments_detected": self.segments_detected,
+            "segments_completed": sum(
+                segment["status"] == "completed" for segment in self.segments
+            ),
+            "segments_failed": sum(
+                segment["status"] == "failed" for segment in self.segments
+            ),
+            "segments": sorted(self.segments, key=lambda s: s["index"]),
+        }
+
+
+class VideoAnalysisService:
+    def __init__(self, llm_service: LLMService):
+        self.llm_service = llm_service
+        self.jobs: "OrderedDict[str, VideoJob]" = OrderedDict()
+        self.max_jobs = settings.VIDEO_MAX_JOBS
+        # Decoding holds a thread for the whole video; jobs beyond the pool wait
+        self.decode_pool = ThreadPoolExecutor(
+            max_workers=settings.VIDEO_DECODE_WORKERS,
+            thread_name_prefix="video-decode",
+        )
+
+    def start_job(
+        self, user_id: int, file_id: str, path: str, prompt: Optional[str] = None
+    ) -> VideoJob:
+        """Queue a video for analysis and return its job right away"""
+        job = VideoJob(user_id, file_id, prompt)
+        self.jobs[job.job_id] = job
+        self._evict_finished()
+        job.task = asyncio.create_task(self._run(job, path))
+        return job
+
+    def get_job(self, job_id: str, user_id: int) -> Optional[VideoJob]:
+        job = self.jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    async def stop(self):
+        """Cancel running jobs and release the decode threads"""
+        for job in self.jobs.values():
+            if job.task and not job.task.done():
+                job.cancelled.set()
+                job.task.cancel()
+        await asyncio.gather(
+            *(job.task for job in self.jobs.values() if job.task),
+            return_exceptions=True,
+        )
+        self.decode_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _evict_finished(self):
+        """Forget the oldest finished jobs beyond VIDEO_MAX_JOBS"""
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done]:
+            if len(self.jobs) <= self.max_jobs:
+                break
+            del self.jobs[job_id]
+
+    async def _run(self, job: VideoJob, path: str):
+        loop = asyncio.get_running_loop()
+        # Small, so decoding pauses while the LLM falls behind
+        pending: asyncio.Queue = asyncio.Queue(settings.VIDEO_LLM_CONCURRENCY * 2)
+        slots = asyncio.Semaphore(settings.VIDEO_LLM_CONCURRENCY)
+        analyses: Set[asyncio.Task] = set()
+        decode = loop.run_in_executor(
+            self.decode_pool, self._decode, job, path, pending, loop
+        )
+        try:
+            while (scene := await pending.get()) is not None:
+                # Starting the job paid for the first segment
+                if scene.index:
+                    await self._take_llm_token(job.user_id)
+                await slots.acquire()
+                task = asyncio.create_task(self._analyze(job, scene, slots))
+                analyses.add(task)
+                task.add_done_callback(analyses.discard)
+            await decode
+            await asyncio.gather(*analyses)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.cancelled.set()
+            job.status = "cancelled"
+            for task in analyses:
+                task.cancel()
+        except Exception as e:
+            job.cancelled.set()
+            logger.error("Video job %s failed: %s", job.job_id, e)
+            job.status = "failed"
+            job.error = str(e)
+            for task in analyses:
+                task.cancel()
+        finally:
+            job.finished_at = time.time()
+            job.publish({"type": "done", **job.get_status()})
+
+    async def _take_llm_token(self, user_id: int):
+        """Charge one "llm" rate-limit token to the job's user, waiting for a refill"""
+        while True:
+            # Same bucket limit_by_user("llm") charges for the user's other calls
+            result = check_rate_limit("llm", f"user:{user_id}")
+            if result is None or result.allowed:
+                return
+            await asyncio.sleep(result.retry_after)
+
+    def _decode(
+        self,
+        job: VideoJob,
+        path: str,
+        pending: asyncio.Queue,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        """Worker thread: find scenes and hand them to the event loop"""
+
+        def put(item: Optional[Scene]):
+            future = asyncio.run_coroutine_threadsafe(pending.put(item), loop)
+            # Wait for queue space, but give up if the job is cancelled
+            while True:
+                try:
+                    return future.result(timeout=0.5)
+                except concurrent.futures.TimeoutError:
+                    if job.cancelled.is_set():
+                        future.cancel()
+                        raise JobCancelled()
+
+        if job.cancelled.is_set():
+            return
+        job.status = "running"
+        started = time.perf_counter()
+        try:
+            for scene in iter_scenes(
+                path,
+                settings.VIDEO_SAMPLE_FPS,
+                settings.VIDEO_SCENE_THRESHOLD,
+                settings.VIDEO_MIN_SCENE_SECONDS,
+                settings.VIDEO_MAX_SEGMENTS,
+                settings.VIDEO_KEYFRAME_WIDTH,
+                job.progress,
+            ):
+                if job.cancelled.is_set():
+                    raise JobCancelled()
+                job.segments_detected += 1
+                put(scene)
+        except JobCancelled:
+            return
+        finally:
+            decode_seconds.observe(time.perf_counter() - started)
+            video_frames.inc(job.frames_decoded)
+            if not job.cancelled.is_set():
+                try:
+                    put(None)
+                except JobCancelled:
+                    pass
+
+    async def _analyze(self, job: VideoJob, scene: Scene, slots: asyncio.Semaphore):
+        try:
+            result = await self.llm_service.process_image_with_llm(
+                scene.keyframe, job.prompt
+            )
+        finally:
+            slots.release()
+        segment = {
+            "index": scene.index,
+            "start": round(scene.start, 3),
+            "end": round(scene.end, 3),
+            # process_image_with_llm reports errors as a zero-confidence response
+            "status": "failed" if result.confidence == 0.0 else "completed",
+            **result.dict(),
+        }
+        job.segments.append(segment)
+        video_segments.inc()
+        job.publish({"type": "segment", **segment})
@@ -1,31 +1,485 @@
 # WebSocket service
-from fastapi import WebSocket
-from typing import Set
+from fastapi import WebSocket, WebSocketDisconnect
+from typing import Any, Dict, List, Optional, Set
+import asyncio
 import logging
+import time
+
+from app.core.config import settings
+from app.core.log import get_hot_path_logger
+from app.core.metrics import registry
+from app.core.rate_limit import check_rate_limit
+from app.core.serialization import Codec, Payload, get_json_codec, negotiate_codec
+from app.core.tracing import span
+from app.services.pubsub_service import pubsub_service
 
 logger = logging.getLogger(__name__)
+hot_logger = get_hot_path_logger(__name__)
+
+QUEUE_POLICY_DROP_OLDEST = "drop_oldest"
+QUEUE_POLICY_DISCONNECT = "disconnect"
+
+# Close codes (RFC 6455)
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TRY_AGAIN_LATER = 1013
+
+# Smoothing factor for the per-client send rate
+SEND_RATE_ALPHA = 0.1
+
+send_lag_seconds = registry.histogram(
+    "visionai_websocket_send_lag_seconds",
+    "Time a message waits in a client's send queue before reaching the socket",
+)
+messages_dropped = registry.counter(
+    "visionai_websocket_messages_dropped_total",
+    "Messages dropped from full client send queues",
+)
+
+
+class ClientConnection:
+    """A connected client with its own bounded send queue and writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int,
+        policy: str,
+        max_dropped: int,
+        codec: Optional[Codec] = None,
+        broadcasts: bool = True,
+    ):
+        self.websocket = websocket
+        client = websocket.client
+        self.client_id = f"{client.host}:{client.port}" if client else str(id(self))
+        self.codec = codec or get_json_codec()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.policy = policy
+        self.max_dropped = max_dropped
+        # False for clients that only want replies, not frames or broadcasts
+        self.broadcasts = broadcasts
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+        self.last_activity = self.connected_at
+        self.closed = False
+        self.writer_task: Optional[asyncio.Task] = None
+        # Requests being answered, so the receive loop never waits on them
+        self.tasks: Set[asyncio.Task] = set()
+
+        # Lag metrics
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_sent_at = 0.0
+        self.send_interval = 0.0
+
+    def start(self):
+        """Start the writer task draining this client's queue"""
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def run(self, coro) -> asyncio.Task:
+        """Handle a request in the background; replies go through the send queue"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel_tasks(self):
+        """Stop the writer and any requests still being handled"""
+        if self.writer_task and not self.writer_task.done():
+            self.writer_task.cancel()
+        for task in list(self.tasks):
+            task.cancel()
+
+    def enqueue(self, payload: Payload) -> bool:
+        """Queue an encoded payload without blocking; returns False if the client must be evicted"""
+        if self.closed:
+            return False
+
+        item = (time.monotonic(), payload)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        # Queue is full: drop the oldest message to make room for the newest
+        try:
+            self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.queue.put_nowait(item)
+        self.messages_dropped += 1
+        messages_dropped.inc()
+
+        if (
+            self.policy == QUEUE_POLICY_DISCONNECT
+            and self.messages_dropped >= self.max_dropped
+        ):
+            hot_logger.warning(
+                "Evicting slow WebSocket client after %d dropped messages",
+                self.messages_dropped,
+            )
+            return False
+        return True
+
+    async def _writer(self):
+        """Send queued messages to the socket one at a time"""
+        try:
+            while True:
+                enqueued_at, payload = await self.queue.get()
+                if isinstance(payload, bytes):
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+
+                now = time.monotonic()
+                lag = now - enqueued_at
+                send_lag_seconds.observe(lag)
+                if self.last_sent_at:
+                    interval = now - self.last_sent_at
+                    self.send_interval += SEND_RATE_ALPHA * (
+                        interval - self.send_interval
+                    )
+                self.last_sent_at = now
+                self.messages_sent += 1
+                self.last_lag = lag
+                self.total_lag += lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            hot_logger.info("WebSocket writer stopped: %s", e)
+        finally:
+            self.closed = True
+
+    def touch(self, message: Any):
+        """Record that the client is alive; pongs do not count as activity"""
+        now = time.monotonic()
+        self.last_seen = now
+        if not (isinstance(message, dict) and message.get("type") == "pong"):
+            self.last_activity = now
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Stop the writer task and close the socket"""
+        self.closed = True
+        self.cancel_tasks()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def send_rate(self) -> float:
+        """Smoothed messages/s actually written to the socket (mostly camera frames)"""
+        if not self.last_sent_at or not self.send_interval:
+            return 0.0
+        # A client that stopped receiving decays towards zero
+        interval = max(self.send_interval, time.monotonic() - self.last_sent_at)
+        return 1.0 / interval
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lag metrics for this client; its address is left out"""
+        return {
+            "codec": self.codec.name,
+            "send_rate": self.send_rate(),
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "messages_sent": self.messages_sent,
+            "messages_dropped": self.messages_dropped,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "avg_lag": (
+                self.total_lag / self.messages_sent if self.messages_sent else 0.0
+            ),
+            "connected_for": time.monotonic() - self.connected_at,
+            "last_seen": time.monotonic() - self.last_seen,
+        }
+
 
 class WebSocketService:
     def __init__(self):
         self.connected_clients: Set[WebSocket] = set()
-    
-    def add_client(self, websocket: WebSocket):
-        """Add a new client connection"""
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.queue_size = settings.WS_SEND_QUEUE_SIZE
+        self.queue_policy = settings.WS_QUEUE_FULL_POLICY
+        self.max_dropped = settings.WS_MAX_DROPPED_MESSAGES
+        self.max_connections = settings.MAX_CONNECTIONS
+        self.heartbeat_interval = settings.WS_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = settings.WS_HEARTBEAT_TIMEOUT
+        self.idle_timeout = settings.WS_IDLE_TIMEOUT
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.rejected_connections = 0
+        self.reaped_connections = 0
+
+        # Broadcasts and camera frames can originate in any worker process
+        pubsub_service.subscribe("broadcast", self.broadcast_local)
+        pubsub_service.subscribe("frames", self.broadcast_local)
+        self._register_metrics()
+
+    async def stop(self):
+        """Stop the heartbeat and stop receiving broadcasts and frames"""
+        pubsub_service.unsubscribe("broadcast", self.broadcast_local)
+        pubsub_service.unsubscribe("frames", self.broadcast_local)
+        if self.heartbeat_task and not self.heartbeat_task.done():
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+        self.heartbeat_task = None
+
+    def _register_metrics(self):
+        def clients():
+            return list(self.clients.values())
+
+        registry.callback(
+            "visionai_websocket_connections",
+            "Open WebSocket connections in this worker",
+            lambda: len(self.clients),
+        )
+        registry.callback(
+            "visionai_websocket_rejected_connections_total",
+            "Connections refused at MAX_CONNECTIONS",
+            lambda: self.rejected_connections,
+            type="counter",
+        )
+        registry.callback(
+            "visionai_websocket_reaped_connections_total",
+            "Connections closed by the heartbeat reaper",
+            lambda: self.reaped_connections,
+            type="counter",
+        )
+        # Aggregates only: a label per client would publish viewer addresses
+        # and grow with every connection
+        registry.callback(
+            "visionai_websocket_send_rate",
+            "Achieved send rate summed over clients (messages/s, mostly camera frames)",
+            lambda: sum(c.send_rate() for c in clients()),
+        )
+        registry.callback(
+            "visionai_websocket_queued_messages",
+            "Messages waiting in send queues, summed over clients",
+            lambda: sum(c.queue.qsize() for c in clients()),
+        )
+        registry.callback(
+            "visionai_websocket_max_queue_depth",
+            "Deepest send queue of any client",
+            lambda: max((c.queue.qsize() for c in clients()), default=0),
+        )
+        registry.callback(
+            "visionai_websocket_max_send_lag_seconds",
+            "Largest queue lag of the last message sent to any client",
+            lambda: max((c.last_lag for c in clients()), default=0.0),
+        )
+
+    async def accept(
+        self, websocket: WebSocket, broadcasts: bool = True
+    ) -> Optional[ClientConnection]:
+        """Negotiate a codec, accept the handshake and register the client
+
+        Returns None if the server is at capacity; the socket is then closed
+        with 1013 (Try Again Later). Clients accepted with broadcasts=False
+        get heartbeats and their own replies only.
+        """
+        codec, subprotocol = negotiate_codec(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+
+        if len(self.clients) >= self.max_connections:
+            self.rejected_connections += 1
+            hot_logger.warning(
+                "Rejecting WebSocket client: %d/%d connections in use",
+                len(self.clients),
+                self.max_connections,
+            )
+            await websocket.close(
+                code=CLOSE_TRY_AGAIN_LATER, reason="Server at capacity"
+            )
+            return None
+
+        client = self.add_client(websocket, codec, broadcasts)
+        self._ensure_heartbeat()
+        return client
+
+    def add_client(
+        self,
+        websocket: WebSocket,
+        codec: Optional[Codec] = None,
+        broadcasts: bool = True,
+    ) -> ClientConnection:
+        """Add a new client connection and start its writer"""
+        client = ClientConnection(
+            websocket,
+            self.queue_size,
+            self.queue_policy,
+            self.max_dropped,
+            codec,
+            broadcasts,
+        )
+        client.start()
         self.connected_clients.add(websocket)
-    
+        self.clients[websocket] = client
+        return client
+
     def remove_client(self, websocket: WebSocket):
         """Remove a client connection"""
         self.connected_clients.discard(websocket)
-    
+        client = self.clients.pop(websocket, None)
+        if client:
+            client.cancel_tasks()
+
+    def get_client(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        """Get the connection wrapper for a socket"""
+        return self.clients.get(websocket)
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        """Receive and decode one message using the client's codec"""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        return self.decode(websocket, message)
+
+    def decode(self, websocket: WebSocket, message: dict) -> Any:
+        """Decode a received frame using the client's codec
+
+        Text frames are JSON even for clients on a binary codec. A frame that
+        does not decode gets an error reply and comes back as None.
+        """
+        client = self.clients.get(websocket)
+        codec = client.codec if client else get_json_codec()
+        try:
+            if message.get("bytes") is not None:
+                data = codec.decode(message["bytes"])
+            elif codec.binary:
+                data = get_json_codec().decode(message["text"])
+            else:
+                data = codec.decode(message["text"])
+        except ValueError as e:
+            hot_logger.warning("Dropping malformed WebSocket message: %s", e)
+            self.send_to(
+                websocket, {"type": "error", "message": f"Malformed message: {e}"}
+            )
+            data = None
+
+        if client:
+            client.touch(data)
+        return data
+
+    def send_to(self, websocket: WebSocket, message: dict):
+        """Encode and queue a message for a single client"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        # The socket write happens later on the client's writer task; its
+        # delay shows up in visionai_websocket_send_lag_seconds
+        with span("ws.encode_enqueue"):
+            queued = client.enqueue(client.codec.encode(message))
+        if not queued:
+            self._evict(client)
+
+    def rate_limited(self, websocket: WebSocket, route_class: str) -> bool:
+        """Check the client's IP against a route class limit, telling it when it is over"""
+        host = websocket.client.host if websocket.client else "unknown"
+        result = check_rate_limit(route_class, f"ip:{host}")
+        if result is None or result.allowed:
+            return False
+        self.send_to(
+            websocket,
+            {
+                "type": "error",
+                "code": "rate_limited",
+                "message": "Rate limit exceeded",
+                "retry_after": round(result.retry_after, 2),
+                "limit": result.limit,
+            },
+        )
+        return True
+
     async def broadcast_to_all(self, message: dict):
-        """Broadcast message to all connected clients"""
-        disconnected = set()
-        for client in self.connected_clients:
-            try:
-                await client.send_json(message)
-            except:
-                disconnected.add(client)
-        
-        # Remove disconnected clients
-        for client in disconnected:
-            self.remove_client(client)
+        """Broadcast message to all clients connected to any worker"""
+        pubsub_service.publish("broadcast", message)
+
+    def broadcast_local(self, message: dict, everyone: bool = False):
+        """Broadcast message to this worker's clients without waiting on any socket
+
+        Clients that opted out of broadcasts are skipped unless everyone is set.
+        """
+        # Encode once per codec, not once per client
+        payloads: Dict[str, Payload] = {}
+        evicted: List[ClientConnection] = []
+        with span("ws.fanout"):
+            for client in self.clients.values():
+                if not (client.broadcasts or everyone):
+                    continue
+                payload = payloads.get(client.codec.name)
+                if payload is None:
+                    payload = payloads[client.codec.name] = client.codec.encode(message)
+                if not client.enqueue(payload):
+                    evicted.append(client)
+
+        # Remove slow or disconnected clients
+        for client in evicted:
+            self._evict(client)
+
+    def _evict(
+        self,
+        client: ClientConnection,
+        code: int = CLOSE_POLICY_VIOLATION,
+        reason: str = "Client too slow",
+    ):
+        """Drop a client and close its socket in the background"""
+        self.remove_client(client.websocket)
+        asyncio.create_task(client.close(code, reason))
+
+    def _ensure_heartbeat(self):
+        """Start the heartbeat/reaper task if it is not running"""
+        if self.heartbeat_task is None or self.heartbeat_task.done():
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        """Ping clients and reap dead, unresponsive or idle connections"""
+        while self.clients:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.reap()
+            self.broadcast_local(
+                {"type": "ping", "timestamp": time.time()}, everyone=True
+            )
+
+    def reap(self) -> int:
+        """Evict connections that stopped answering pings or went idle"""
+        now = time.monotonic()
+        reaped = 0
+        for client in list(self.clients.values()):
+            if client.closed:
+                self.remove_client(client.websocket)
+            elif now - client.last_seen > self.heartbeat_timeout:
+                logger.info(
+                    f"Reaping unresponsive WebSocket client (silent for {now - client.last_seen:.1f}s)"
+                )
+                self._evict(client, CLOSE_GOING_AWAY, "Heartbeat timeout")
+            elif (
+                self.idle_timeout
+                and not client.tasks  # waiting on its own request is not idle
+                and now - client.last_activity > self.idle_timeout
+            ):
+                logger.info("Reaping idle WebSocket client")
+                self._evict(client, CLOSE_GOING_AWAY, "Idle timeout")
+            else:
+                continue
+            reaped += 1
+
+        self.reaped_connections += reaped
+        return reaped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-client queue and lag metrics"""
+        return {
+            "total_clients": len(self.clients),
+            "max_connections": self.max_connections,
+            "rejected_connections": self.rejected_connections,
+            "reaped_connections": self.reaped_connections,
+            "queue_policy": self.queue_policy,
+            "clients": [client.get_stats() for client in self.clients.values()],
+        }
@@ -0,0 +1,180 @@
+# Streaming transcription: segmenter throughput and transcript latency on /ws/audio
+#
+# Usage: python -m benchmarks.bench_audio [--utterances N] [--seconds S]
+#                                         [--sample-rate HZ] [--json]
+#
+# Segmenter: how many times faster than real time the vectorized chunk energies
+# are computed, next to the same energies summed in a Python loop, and what a
+# full feed() costs per 20 ms message.
+# Latency: synthetic speech (tone bursts separated by silence) is streamed in
+# real time, 20 ms per message, to the app under uvicorn with the local
+# transcriber. First partial is measured from each utterance's start, final
+# from its end. "Whole recording" is what each utterance would wait if the
+# recording were transcribed only once it finished.
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import websockets
+
+from app.core.config import settings
+from app.services.audio_service import SpeechSegmenter
+from benchmarks import fake_ollama
+from benchmarks.harness import app_stack, percentiles, write_report
+
+GAP_SECONDS = 0.8
+MESSAGE_SECONDS = 0.02
+
+
+def synthetic_speech(
+    utterances: int, seconds: float, sample_rate: int
+) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """Tone bursts with amplitude wobble, and the (start, end) of each"""
+    parts, spans, now = [], [], GAP_SECONDS
+    gap = np.zeros(int(GAP_SECONDS * sample_rate), dtype=np.int16)
+    parts.append(gap)
+    for i in range(utterances):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        envelope = 0.2 + 0.1 * np.sin(2 * math.pi * 3 * t)
+        tone = envelope * np.sin(2 * math.pi * (220 + 40 * i) * t)
+        parts.extend([(tone * 32767).astype(np.int16), gap])
+        spans.append((now, now + seconds))
+        now += seconds + GAP_SECONDS
+    return np.concatenate(parts), spans
+
+
+def make_segmenter(sample_rate: int) -> SpeechSegmenter:
+    return SpeechSegmenter(
+        sample_rate,
+        settings.AUDIO_CHUNK_SIZE,
+        settings.AUDIO_SILENCE_THRESHOLD,
+        settings.AUDIO_SILENCE_MS,
+        settings.AUDIO_MIN_SPEECH_MS,
+        settings.AUDIO_PARTIAL_INTERVAL,
+        sample_rate * settings.AUDIO_BUFFER_SIZE,
+    )
+
+
+def python_energy(samples: np.ndarray, chunk_size: int) -> List[float]:
+    values = samples.tolist()
+    energies = []
+    for start in range(0, len(values) - chunk_size + 1, chunk_size):
+        total = 0.0
+        for value in values[start : start + chunk_size]:
+            total += value * value
+        energies.append(math.sqrt(total / chunk_size) / 32768.0)
+    return energies
+
+
+def bench_segmenter(audio: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    duration = len(audio) / sample_rate
+    step = int(MESSAGE_SECONDS * sample_rate)
+    messages = [audio[i : i + step] for i in range(0, len(audio), step)]
+
+    segmenter = make_segmenter(sample_rate)
+    start = time.perf_counter()
+    for message in messages:
+        segmenter.feed(message)
+    feed = time.perf_counter() - start
+
+    chunk_size = settings.AUDIO_CHUNK_SIZE
+    whole = audio[: len(audio) - len(audio) % chunk_size]
+    start = time.perf_counter()
+    segmenter.energy(whole)
+    vectorized = time.perf_counter() - start
+    start = time.perf_counter()
+    python_energy(whole, chunk_size)
+    loop = time.perf_counter() - start
+    return {
+        "audio_seconds": duration,
+        "energy_vectorized_x_realtime": duration / vectorized,
+        "energy_python_loop_x_realtime": duration / loop,
+        "feed_us_per_message": feed / len(messages) * 1e6,
+    }
+
+
+async def stream(
+    url: str, audio: np.ndarray, spans: List[Tuple[float, float]], sample_rate: int
+) -> Dict[str, Any]:
+    step = int(MESSAGE_SECONDS * sample_rate)
+    partials: Dict[int, float] = {}
+    finals: Dict[int, float] = {}
+    async with websockets.connect(f"{url}/ws/audio?sample_rate={sample_rate}") as ws:
+        started = time.perf_counter()
+
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") != "transcript":
+                    continue
+                at = time.perf_counter() - started
+                index = message["segment"]
+                if message["final"]:
+                    finals[index] = at
+                    if len(finals) == len(spans):
+                        return
+                else:
+                    partials.setdefault(index, at)
+
+        receiver = asyncio.create_task(receive())
+        for n, i in enumerate(range(0, len(audio), step)):
+            # Paced against the start, so send overhead does not accumulate
+            await asyncio.sleep(
+                max(0.0, started + n * MESSAGE_SECONDS - time.perf_counter())
+            )
+            await ws.send(audio[i : i + step].tobytes())
+        await asyncio.wait_for(receiver, timeout=10.0)
+
+    recording_end = len(audio) / sample_rate
+    return {
+        "first_partial_ms": percentiles([partials[i] - spans[i][0] for i in partials]),
+        "final_ms": percentiles([finals[i] - spans[i][1] for i in finals]),
+        "whole_recording_ms": percentiles([recording_end - end for _, end in spans]),
+        "segments": len(finals),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming transcription")
+    parser.add_argument("--utterances", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    fake_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    audio, spans = synthetic_speech(args.utterances, args.seconds, args.sample_rate)
+    report = {"segmenter": bench_segmenter(audio, args.sample_rate)}
+    with app_stack(args, {"AUDIO_TRANSCRIBER": "local"}) as (app_url, _server):
+        ws_url = app_url.replace("http://", "ws://")
+        report["latency"] = asyncio.run(stream(ws_url, audio, spans, args.sample_rate))
+
+    if args.json:
+        write_report(report, None)
+        return
+
+    segmenter, latency = report["segmenter"], report["latency"]
+    print(f"{args.utterances} x {args.seconds}s utterances at {args.sample_rate} Hz")
+    print(
+        f"  chunk energy: {segmenter['energy_vectorized_x_realtime']:.0f}x real time "
+        f"vectorized, {segmenter['energy_python_loop_x_realtime']:.0f}x "
+        f"with a Python loop"
+    )
+    print(
+        f"  segmenter feed: {segmenter['feed_us_per_message']:.0f} us "
+        f"per 20 ms message"
+    )
+    print(f"  {latency['segments']} segments transcribed")
+    for name in ("first_partial_ms", "final_ms", "whole_recording_ms"):
+        r = latency[name]
+        print(f"  {name:20s} p50 {r['p50']:8.1f}  max {r['max']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
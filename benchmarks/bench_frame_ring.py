@@ -0,0 +1,160 @@
+# Shared-memory frame ring vs multiprocessing.Queue benchmark
+#
+# Usage: python -m benchmarks.bench_frame_ring [--frames N] [--frame-size BYTES] [--fps N] [--json]
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, List
+
+from app.core.frame_ring import SharedFrameRing
+
+RING_NAME = f"visionai-bench-{os.getpid()}"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+    samples = sorted(samples)
+    return {
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        "max_us": samples[-1] * 1e6,
+    }
+
+
+def ring_consumer(name: str, frames: int, poll_interval: float, results):
+    # The ring is latest-wins: a consumer that falls behind skips frames
+    # instead of queueing them, so "delivered" can be below the frame count
+    ring = SharedFrameRing.attach(name)
+    latencies = []
+    last = 0
+    received = 0
+    while last < frames:
+        seq = ring.latest_seq()
+        if seq == last:
+            time.sleep(poll_interval)
+            continue
+        frame = ring.read(seq)
+        if frame is None:
+            continue
+        seq, timestamp, view = frame
+        # Touch the payload in place, as a consumer forwarding it would
+        size = len(view)
+        view.release()
+        if ring.is_current(seq) and size:
+            latencies.append(time.perf_counter() - timestamp)
+            received += 1
+        last = seq
+    ring.close()
+    results.put({"received": received, "latencies": latencies})
+
+
+def queue_consumer(queue, frames: int, results):
+    latencies = []
+    received = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        timestamp, data = item
+        latencies.append(time.perf_counter() - timestamp)
+        received += 1
+    results.put({"received": received, "latencies": latencies})
+
+
+def produce(write, frames: int, payload: bytes, fps: float) -> float:
+    interval = 1 / fps if fps else 0.0
+    start = time.perf_counter()
+    for i in range(frames):
+        write(payload)
+        if interval:
+            delay = start + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return time.perf_counter() - start
+
+
+def bench_ring(
+    frames: int, payload: bytes, fps: float, poll_interval: float
+) -> Dict[str, Any]:
+    ring = SharedFrameRing.create(RING_NAME, 8, len(payload))
+    results = mp.Queue()
+    consumer = mp.Process(
+        target=ring_consumer, args=(RING_NAME, frames, poll_interval, results)
+    )
+    consumer.start()
+    time.sleep(0.5)
+
+    elapsed = produce(
+        lambda data: ring.write(data, time.perf_counter()), frames, payload, fps
+    )
+    outcome = results.get()
+    consumer.join()
+    ring.close()
+    return {
+        "write_fps": frames / elapsed,
+        "delivered": outcome["received"],
+        **percentiles(outcome["latencies"]),
+    }
+
+
+def bench_queue(frames: int, payload: bytes, fps: float) -> Dict[str, Any]:
+    queue = mp.Queue(maxsize=8)
+    results = mp.Queue()
+    consumer = mp.Process(target=queue_consumer, args=(queue, frames, results))
+    consumer.start()
+    time.sleep(0.5)
+
+    elapsed = produce(
+        lambda data: queue.put((time.perf_counter(), data)), frames, payload, fps
+    )
+    queue.put(None)
+    outcome = results.get()
+    consumer.join()
+    return {
+        "write_fps": frames / elapsed,
+        "delivered": outcome["received"],
+        **percentiles(outcome["latencies"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cross-process frame transfer"
+    )
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--frame-size", type=int, default=40 * 1024)
+    parser.add_argument("--fps", type=float, default=30, help="0 = as fast as possible")
+    parser.add_argument(
+        "--poll-interval", type=float, default=0.0005, help="Ring reader poll sleep"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    payload = os.urandom(args.frame_size)
+    results = {
+        "frames": args.frames,
+        "frame_size": args.frame_size,
+        "fps": args.fps,
+        "shared_ring": bench_ring(args.frames, payload, args.fps, args.poll_interval),
+        "mp_queue": bench_queue(args.frames, payload, args.fps),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.frames} frames of {args.frame_size} B at {args.fps or 'max'} fps")
+    for name in ("shared_ring", "mp_queue"):
+        r = results[name]
+        print(
+            f"  {name:12s} write {r['write_fps']:9.0f} fps  delivered {r['delivered']:6d}  "
+            f"latency p50 {r['p50_us']:8.1f} us  p99 {r['p99_us']:8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
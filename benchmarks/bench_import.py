@@ -0,0 +1,142 @@
+# Cold-start latency: importing the app and running its lifespan startup
+#
+# Usage: python -m benchmarks.bench_import [--runs N] [--module app.main] [--top N]
+#                                          [--output report.json] [--compare baseline.json] [--json]
+#
+# Every run is a fresh interpreter, as for a newly scaled-up worker or a test
+# session. A final run under -X importtime lists the packages that cost the
+# most, and the report notes which heavy optional modules the import pulled in.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.harness import (
+    REPO_ROOT,
+    compare_reports,
+    percentiles,
+    report_metadata,
+    write_report,
+)
+
+# Modules only some subsystems need; none should load with the app itself
+HEAVY_MODULES = ("cv2", "numpy")
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+app = getattr(target, "app", None)
+
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+
+started = asyncio.run(startup()) if app is not None else imported
+print(json.dumps({{
+    "import": imported - start,
+    "startup": started - imported,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    directory = tempfile.mkdtemp(prefix="visionai-import-")
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{directory}/bench.db",
+        "PUBSUB_TRANSPORT": "local",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def measure(module: str) -> Dict[str, Any]:
+    code = CHILD.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        env=child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(module: str, top: int) -> List[Dict[str, Any]]:
+    """Self time per top-level package from -X importtime, largest first"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [{"package": name, "self_ms": us / 1e3} for name, us in ranked[:top]]
+
+
+def run(module: str, runs: int, top: int) -> Dict[str, Any]:
+    # The first run warms the filesystem cache and writes bytecode
+    first = measure(module)
+    samples = [measure(module) for _ in range(runs)] or [first]
+    return {
+        "module": module,
+        "import_ms": percentiles([s["import"] for s in samples]),
+        "startup_ms": percentiles([s["startup"] for s in samples]),
+        "heavy_modules_loaded": first["heavy"],
+        "top_packages": import_profile(module, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import and startup")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    results = run(args.module, args.runs, args.top)
+    report = {"meta": report_metadata(), "results": results}
+    if args.json or args.output:
+        write_report(report, args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare_reports(json.load(f), report)))
+    if args.json:
+        return
+
+    print(f"{args.module}, {args.runs} fresh interpreters")
+    for name in ("import_ms", "startup_ms"):
+        r = results[name]
+        print(f"  {name:10s} p50 {r['p50']:7.1f} ms  max {r['max']:7.1f} ms")
+    print(
+        f"  heavy modules loaded: {', '.join(results['heavy_modules_loaded']) or 'none'}"
+    )
+    print("  self time by package:")
+    for entry in results["top_packages"]:
+        print(f"    {entry['package']:24s} {entry['self_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Caller-side cost of a log call: synchronous file handler vs the queued setup
+#
+# Usage: python -m benchmarks.bench_logging [--calls N] [--json]
+#
+# Times what the event loop pays per call, in microseconds. Queued cases also
+# report how long the writer thread took to drain, which happens off the loop.
+import argparse
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+from typing import Callable, Dict
+
+from app.core import log
+from app.core.config import settings
+
+IMAGE = "A" * 120_000  # base64 frame-sized payload, as the old logs sliced
+
+
+def file_handler(path: str) -> logging.Handler:
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(settings.LOG_FORMAT))
+    return handler
+
+
+def time_calls(fn: Callable[[int], None], calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run(calls: int) -> Dict[str, Dict[str, float]]:
+    directory = tempfile.mkdtemp(prefix="visionai-log-")
+    results: Dict[str, Dict[str, float]] = {}
+
+    sync_logger = logging.getLogger("bench.sync")
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    sync_logger.addHandler(file_handler(os.path.join(directory, "sync.log")))
+
+    def sync_fstring(i):
+        sync_logger.info(f"Sending image to Ollama. Base64 length: {len(IMAGE)}")
+        sync_logger.info(f"Base64 starts with: {IMAGE[:20]}...")
+
+    results["sync file handler, 2 f-string INFO"] = {
+        "loop_us": time_calls(sync_fstring, calls)
+    }
+
+    log_queue: queue.Queue = queue.Queue(calls * 2 + 1)
+    queued_logger = logging.getLogger("bench.queued")
+    queued_logger.propagate = False
+    queued_logger.setLevel(logging.INFO)
+    queued_logger.addHandler(log.NonBlockingQueueHandler(log_queue))
+    listener = log.RoutingQueueListener(
+        log_queue, {"": [file_handler(os.path.join(directory, "queued.log"))]}
+    )
+    listener.start()
+    hot = log.HotPathLogger(queued_logger)
+
+    def queued_lazy(i):
+        queued_logger.info(
+            "Sending image to Ollama (%d bytes, %d base64 chars)", 90_000, len(IMAGE)
+        )
+
+    def hot_path(i):
+        hot.info(
+            "Sending image to Ollama (%d bytes, %d base64 chars)", 90_000, len(IMAGE)
+        )
+
+    for name, fn in (
+        ("queued, 1 lazy INFO", queued_lazy),
+        ("hot path logger (rate limited)", hot_path),
+    ):
+        loop_us = time_calls(fn, calls)
+        start = time.perf_counter()
+        while log_queue.qsize():
+            time.sleep(0.001)
+        results[name] = {
+            "loop_us": loop_us,
+            "drain_ms": (time.perf_counter() - start) * 1e3,
+        }
+    listener.stop()
+
+    # Below LOG_LEVEL: f-strings still format, %-style args do not
+    queued_logger.setLevel(logging.WARNING)
+    results["disabled level, f-string"] = {
+        "loop_us": time_calls(
+            lambda i: queued_logger.info(f"Base64 starts with: {IMAGE[:20]}..."), calls
+        )
+    }
+    results["disabled level, lazy args"] = {
+        "loop_us": time_calls(
+            lambda i: queued_logger.info("Base64 starts with: %s...", IMAGE[:20]),
+            calls,
+        )
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log call overhead")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    results = run(args.calls)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.calls} calls; loop_us is what the caller (event loop) pays per call")
+    for name, values in results.items():
+        drain = (
+            f"  (writer drained in {values['drain_ms']:.0f} ms)"
+            if "drain_ms" in values
+            else ""
+        )
+        print(f"  {name:36s} {values['loop_us']:8.2f} us{drain}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Login throughput and frame-loop jitter under a login storm
+#
+# Usage: python -m benchmarks.bench_login [--logins N] [--concurrency N] [--rounds N] [--json]
+#
+# Runs the app in-process against a throwaway SQLite database. A 15 fps
+# ticker shares the event loop with the login handlers, standing in for a
+# WebSocket frame stream, so any bcrypt work done on the loop shows up as
+# frame jitter.
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+DB_DIR = tempfile.mkdtemp(prefix="visionai-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_DIR}/bench.db")
+
+import httpx  # noqa: E402
+
+from app.core.database import engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.container import ServiceContainer  # noqa: E402
+
+# ASGITransport does not run the lifespan, so build the services here
+app.state.services = ServiceContainer()
+auth_service = app.state.services.auth
+
+FRAME_INTERVAL = 1 / 15
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1e3,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e3,
+        "max_ms": samples[-1] * 1e3,
+    }
+
+
+async def frame_ticker(stop: asyncio.Event, jitter: List[float]):
+    """Record how late each 15 fps tick fires"""
+    next_tick = time.perf_counter() + FRAME_INTERVAL
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        jitter.append(max(0.0, time.perf_counter() - next_tick))
+        next_tick += FRAME_INTERVAL
+
+
+async def run_storm(
+    client: httpx.AsyncClient, username: str, logins: int, concurrency: int
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/auth/login", json={"username": username, "password": "benchmark"}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    jitter: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(frame_ticker(stop, jitter))
+    start = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "statuses": statuses,
+        "login_latency": percentiles(latencies),
+        "frame_jitter": percentiles(jitter),
+    }
+
+
+async def run(logins: int, concurrency: int, workers: int) -> Dict[str, Any]:
+    # ASGITransport does not run the lifespan
+    await init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        username = f"bench{os.getpid()}"
+        await client.post(
+            "/auth/register",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": "benchmark",
+            },
+        )
+
+        results = {}
+        pool = auth_service.password_pool
+        # Old behaviour: bcrypt on the event loop
+        auth_service.password_pool = None
+        results["inline"] = await run_storm(client, username, logins, concurrency)
+        auth_service.password_pool = pool
+        results[f"pool_{workers}"] = await run_storm(
+            client, username, logins, concurrency
+        )
+    # Pooled aiosqlite connections hold non-daemon threads
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login under load")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rounds", type=int, default=None, help="bcrypt rounds (default: settings)"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    if args.rounds:
+        auth_service.pwd_context.update(bcrypt__rounds=args.rounds)
+    rounds = auth_service.pwd_context.to_dict().get("bcrypt__rounds")
+    workers = (
+        auth_service.password_pool._max_workers if auth_service.password_pool else 0
+    )
+
+    results = asyncio.run(run(args.logins, args.concurrency, workers))
+    results["bcrypt_rounds"] = rounds
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{args.logins} logins, concurrency {args.concurrency}, bcrypt rounds {rounds}"
+    )
+    for name, r in results.items():
+        if not isinstance(r, dict):
+            continue
+        print(
+            f"  {name:8s} {r['logins_per_second']:6.1f} logins/s  "
+            f"login p50 {r['login_latency']['p50_ms']:7.1f} ms  "
+            f"frame jitter p99 {r['frame_jitter']['p99_ms']:7.1f} ms  "
+            f"max {r['frame_jitter']['max_ms']:7.1f} ms  statuses {r['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Per-observation cost of the metrics module and tracing spans
+#
+# Usage: python -m benchmarks.bench_metrics [--iterations N] [--json]
+#
+# Reports nanoseconds per call with the cost of an empty loop subtracted.
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from app.core import tracing
+from app.core.metrics import MetricsRegistry
+
+
+def time_loop(fn: Callable[[], None], iterations: int) -> float:
+    """Best-of-three nanoseconds per call"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / iterations)
+    return best
+
+
+def run(iterations: int) -> Dict[str, float]:
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "Counter")
+    gauge = registry.gauge("bench_gauge", "Gauge")
+    histogram = registry.histogram("bench_seconds", "Histogram")
+    labelled = registry.histogram("bench_labelled_seconds", "Histogram", ["kind"])
+    child = labelled.labels("text")
+
+    def timed():
+        with histogram.time():
+            pass
+
+    def traced_span():
+        with tracing.span("stage"):
+            pass
+
+    def traced():
+        # Span cost inside a trace, without the trace's own start/finish
+        trace.spans.clear()
+        traced_span()
+
+    cases = {
+        "counter.inc": counter.inc,
+        "gauge.set": lambda: gauge.set(1.0),
+        "histogram.observe": lambda: histogram.observe(0.0042),
+        "labelled child observe": lambda: child.observe(0.0042),
+        "labels().observe": lambda: labelled.labels("text").observe(0.0042),
+        "histogram.time()": timed,
+        "span (no trace)": traced_span,
+    }
+    baseline = time_loop(lambda: None, iterations)
+    results = {
+        name: max(0.0, time_loop(fn, iterations) - baseline)
+        for name, fn in cases.items()
+    }
+    with tracing.start_trace("bench") as trace:
+        clear_cost = time_loop(trace.spans.clear, iterations)
+        results["span (in trace)"] = max(
+            0.0, time_loop(traced, iterations) - clear_cost - baseline
+        )
+
+    # A scrape with every app metric family is rendered once per interval,
+    # not per observation, but should stay cheap too
+    for i in range(40):
+        registry.histogram(f"bench_family_{i}_seconds", "Histogram", ["kind"]).labels(
+            "a"
+        ).observe(0.01)
+    start = time.perf_counter_ns()
+    registry.render()
+    results["render (44 families), us"] = (time.perf_counter_ns() - start) / 1e3
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metric recording cost")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.iterations} iterations, empty-loop cost subtracted")
+    for name, value in results.items():
+        unit = "" if name.endswith("us") else " ns"
+        print(f"  {name:28s} {value:8.1f}{unit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Scene monitor: LLM calls and cut detection delay under each gating rule
+#
+# Usage: python -m benchmarks.bench_scene [--minutes M] [--seed N] [--json]
+#
+# Simulates a camera feed sampled at SCENE_SAMPLE_FPS: scenes of 5-90 s,
+# alternating dark and light so every cut is a real change, each with sensor
+# noise and some with a slow lighting drift. Samples go through
+# SceneMonitorService.decide() on a simulated clock, so an hour of feed runs
+# in seconds, with the LLM call itself treated as instant. Each policy reports
+# LLM calls, how many cuts got an analysis before the next cut, and the delay
+# from a cut to that analysis. "every_sample" is monitoring without gating.
+import argparse
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.scene_monitor_service import SceneMonitorService
+from app.services.video_service import scene_thumbnail
+from benchmarks.harness import percentiles, write_report
+
+NOISE_FRAMES = 8
+
+
+def make_feed(minutes: float, fps: float, seed: int):
+    """Yield (time, frame, scene index) samples of a synthetic camera feed"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    size = (settings.CAMERA_WIDTH, settings.CAMERA_HEIGHT)
+    noise = [
+        rng.normal(0, 4, (size[1], size[0], 3)).astype(np.int16)
+        for _ in range(NOISE_FRAMES)
+    ]
+    duration = minutes * 60
+    now, scene, sample = 0.0, 0, 0
+    while now < duration:
+        length = float(rng.uniform(5, 90))
+        low = 128 if scene % 2 else 0
+        tile = rng.integers(low, low + 128, (6, 8, 3), dtype=np.uint8)
+        pattern = cv2.resize(tile, size, interpolation=cv2.INTER_CUBIC)
+        pattern = pattern.astype(np.int16)
+        drift = float(rng.choice([0.0, 0.0, 40.0]))  # a third get lighting drift
+        start = now
+        while now < min(start + length, duration):
+            offset = drift * (now - start) / length
+            frame = pattern + noise[sample % NOISE_FRAMES] + int(offset)
+            yield now, np.clip(frame, 0, 255).astype(np.uint8), scene
+            sample += 1
+            now = sample / fps
+        scene += 1
+
+
+def run_policy(
+    samples: List, threshold: float, min_interval: float, max_per_hour: int
+) -> Dict[str, Any]:
+    # decide() only scores; nothing is captured, analyzed or broadcast
+    monitor = SceneMonitorService(None, None, None)
+    monitor.threshold = threshold
+    monitor.min_interval = min_interval
+    monitor.max_per_hour = max_per_hour
+    decisions: Dict[str, int] = {}
+    first_analysis: Dict[int, float] = {}
+    scene_start: Dict[int, float] = {}
+    started = time.perf_counter()
+    for now, thumbnail, scene in samples:
+        scene_start.setdefault(scene, now)
+        if threshold < 0:
+            decision = "analyze"
+        else:
+            decision, _ = monitor.decide(thumbnail, now)
+        decisions[decision] = decisions.get(decision, 0) + 1
+        if decision == "analyze":
+            first_analysis.setdefault(scene, now)
+    elapsed = time.perf_counter() - started
+
+    cuts = [scene for scene in scene_start if scene > 0]
+    delays = [first_analysis[s] - scene_start[s] for s in cuts if s in first_analysis]
+    return {
+        "llm_calls": decisions.get("analyze", 0),
+        "cuts": len(cuts),
+        "cuts_analyzed": len(delays),
+        "delay_ms": percentiles(delays),
+        "decisions": decisions,
+        "decide_us_per_sample": elapsed / len(samples) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scene monitor gating")
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    fps = settings.SCENE_SAMPLE_FPS
+    samples, thumbnail_seconds = [], 0.0
+    for now, frame, scene in make_feed(args.minutes, fps, args.seed):
+        started = time.perf_counter()
+        samples.append((now, scene_thumbnail(frame), scene))
+        thumbnail_seconds += time.perf_counter() - started
+    thumbnail_us = thumbnail_seconds / len(samples) * 1e6
+
+    threshold = settings.SCENE_CHANGE_THRESHOLD
+    interval = settings.SCENE_MIN_INTERVAL
+    budget = settings.SCENE_MAX_PER_HOUR
+    policies = {
+        "every_sample": (-1.0, 0.0, 0),
+        "threshold": (threshold, 0.0, 0),
+        "threshold+interval": (threshold, interval, 0),
+        "threshold+interval+budget": (threshold, interval, budget),
+    }
+    report = {
+        "samples": len(samples),
+        "sample_fps": fps,
+        "thumbnail_us_per_sample": thumbnail_us,
+        "policies": {
+            name: run_policy(samples, *policy) for name, policy in policies.items()
+        },
+    }
+
+    if args.json:
+        write_report(report, None)
+        return
+
+    print(
+        f"{args.minutes:g} min feed, {len(samples)} samples at {fps:g} fps, "
+        f"threshold {threshold}, min interval {interval}s, budget {budget}/h"
+    )
+    print(
+        f"  thumbnail {thumbnail_us:.0f} us per {settings.CAMERA_WIDTH}x"
+        f"{settings.CAMERA_HEIGHT} frame"
+    )
+    for name, r in report["policies"].items():
+        print(
+            f"  {name:26s} {r['llm_calls']:5d} LLM calls  "
+            f"cuts analyzed {r['cuts_analyzed']:3d}/{r['cuts']:<3d}  "
+            f"delay p50 {r['delay_ms']['p50'] / 1e3:5.1f}s "
+            f"max {r['delay_ms']['max'] / 1e3:6.1f}s  "
+            f"{r['decide_us_per_sample']:5.1f} us/sample"
+        )
+
+
+if __name__ == "__main__":
+    main()
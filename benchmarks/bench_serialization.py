@@ -0,0 +1,111 @@
+# Serialization codec benchmark
+#
+# Usage: python -m benchmarks.bench_serialization [--iterations N] [--clients N] [--json]
+import argparse
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from app.core.serialization import available_codecs
+from app.models.schemas import LLMResponse, UserResponse
+
+
+def build_messages() -> Dict[str, Any]:
+    """Build payloads shaped like the ones the server actually sends"""
+    # A 640x480 JPEG at quality 80 is roughly 20-40 KB
+    frame_data = base64.b64encode(os.urandom(30 * 1024)).decode("utf-8")
+    llm_response = LLMResponse(
+        response="The image shows a person sitting at a desk in front of a laptop. "
+        * 8,
+        confidence=0.8,
+        processing_time=2.315,
+    )
+    user = UserResponse(
+        id=1,
+        username="admin",
+        email="admin@example.com",
+        is_active=True,
+        is_verified=False,
+        created_at=datetime.utcnow(),
+        last_login=datetime.utcnow(),
+    )
+    return {
+        "frame": {"type": "frame", "data": frame_data, "timestamp": 12345.678},
+        "llm_response": {"type": "llm_response", "data": llm_response.model_dump()},
+        "error": {"type": "error", "message": "Failed to process image: timeout"},
+        "user": user.model_dump(mode="json"),
+    }
+
+
+def timeit(fn: Callable[[], Any], iterations: int) -> float:
+    """Return mean microseconds per call"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int, clients: int) -> Dict[str, Any]:
+    codecs = available_codecs()
+    messages = build_messages()
+    results: Dict[str, Any] = {"iterations": iterations, "clients": clients}
+
+    for shape, message in messages.items():
+        shape_results = {}
+        for name, codec in codecs.items():
+            encoded = codec.encode(message)
+            shape_results[name] = {
+                "encode_us": timeit(lambda: codec.encode(message), iterations),
+                "decode_us": timeit(lambda: codec.decode(encoded), iterations),
+                "size_bytes": len(encoded),
+            }
+        results[shape] = shape_results
+
+    # Broadcasting a frame: encode per client (old behaviour) vs once per message
+    frame = messages["frame"]
+    broadcast = {}
+    for name, codec in codecs.items():
+        per_client = timeit(
+            lambda: [codec.encode(frame) for _ in range(clients)], iterations
+        )
+        once = timeit(lambda: [codec.encode(frame)] * clients, iterations)
+        broadcast[name] = {"per_client_us": per_client, "once_us": once}
+    results["broadcast_frame"] = broadcast
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serialization codecs")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.clients)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for shape in ("frame", "llm_response", "error", "user"):
+        print(f"\n{shape}")
+        for name, r in results[shape].items():
+            print(
+                f"  {name:8s} encode {r['encode_us']:8.2f} us  "
+                f"decode {r['decode_us']:8.2f} us  size {r['size_bytes']:7d} B"
+            )
+    print(f"\nbroadcast frame to {args.clients} clients")
+    for name, r in results["broadcast_frame"].items():
+        print(
+            f"  {name:8s} per-client {r['per_client_us']:9.2f} us  "
+            f"once {r['once_us']:9.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Register/login throughput with SQLite's default settings vs the tuned profile
+#
+# Usage: python -m benchmarks.bench_sqlite [--users N] [--logins N] [--concurrency N] [--rounds N] [--json]
+#
+# Each profile gets a fresh database file. bcrypt runs with few rounds by
+# default so the database, not hashing, dominates each request.
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from app.core.database import Base, create_engine, get_db
+from app.main import app
+from app.services.container import ServiceContainer
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# ASGITransport does not run the lifespan, so build the services here
+app.state.services = ServiceContainer()
+auth_service = app.state.services.auth
+
+PROFILES = ("default", "tuned")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1e3,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e3,
+        "max_ms": samples[-1] * 1e3,
+    }
+
+
+async def run_requests(requests, concurrency: int) -> Dict[str, Any]:
+    """Run request coroutine factories with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(make_request):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(r) for r in requests])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": len(requests) / elapsed,
+        "statuses": statuses,
+        "latency": percentiles(latencies),
+    }
+
+
+async def bench_profile(
+    profile: str, users: int, logins: int, concurrency: int
+) -> Dict[str, Any]:
+    path = os.path.join(tempfile.mkdtemp(prefix="visionai-bench-"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", sqlite_profile=profile)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+    sessions = async_sessionmaker(
+        bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            names = [f"{profile}{i}" for i in range(users)]
+            register = await run_requests(
+                [
+                    lambda name=name: client.post(
+                        "/auth/register",
+                        json={
+                            "username": name,
+                            "email": f"{name}@example.com",
+                            "password": "benchmark",
+                        },
+                    )
+                    for name in names
+                ],
+                concurrency,
+            )
+            login = await run_requests(
+                [
+                    lambda name=names[i % users]: client.post(
+                        "/auth/login",
+                        json={"username": name, "password": "benchmark"},
+                    )
+                    for i in range(logins)
+                ],
+                concurrency,
+            )
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
+
+    return {"journal_mode": journal_mode, "register": register, "login": login}
+
+
+async def run(users: int, logins: int, concurrency: int) -> Dict[str, Any]:
+    results = {}
+    for profile in PROFILES:
+        results[profile] = await bench_profile(profile, users, logins, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark SQLite default vs tuned profile"
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt rounds")
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    auth_service.pwd_context.update(bcrypt__rounds=args.rounds)
+    results = asyncio.run(run(args.users, args.logins, args.concurrency))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{args.users} registrations, {args.logins} logins, "
+        f"concurrency {args.concurrency}, bcrypt rounds {args.rounds}"
+    )
+    for profile, r in results.items():
+        for name in ("register", "login"):
+            print(
+                f"  {profile:8s} {name:8s} {r[name]['requests_per_second']:7.1f} req/s  "
+                f"p50 {r[name]['latency']['p50_ms']:7.1f} ms  "
+                f"p99 {r[name]['latency']['p99_ms']:7.1f} ms  statuses {r[name]['statuses']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
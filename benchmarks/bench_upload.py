@@ -0,0 +1,148 @@
+# Server memory per request: base64 JSON images vs streamed multipart uploads
+#
+# Usage: python -m benchmarks.bench_upload [--sizes MB ...] [--repeat N] [--json]
+#                                          [fake Ollama options]
+#
+# Each mode gets its own app server (harness.app_stack). Before every request
+# the server's peak RSS is reset through /proc/<pid>/clear_refs, so the
+# reported footprint is how far that one request pushed RSS above where it
+# started. Linux only.
+import argparse
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.harness import app_stack, percentiles, write_report
+
+MODES = {
+    "base64_json": "POST /llm/process with the image as a base64 string",
+    "upload": "POST /files/upload, stored only",
+    "upload_analyze": "POST /files/upload?analyze=true, stored then sent to the LLM",
+}
+
+
+def read_status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak_rss(pid: int):
+    """Make VmHWM start again from the current RSS"""
+    with open(f"/proc/{pid}/clear_refs", "w") as f:
+        f.write("5")
+
+
+def fake_jpeg(size: int) -> bytes:
+    # Only the leading bytes are checked; the LLM stand-in ignores the rest
+    return b"\xff\xd8\xff\xe0" + os.urandom(size - 4)
+
+
+async def login(client: httpx.AsyncClient) -> Dict[str, str]:
+    user = {"username": "uploader", "password": "benchmark"}
+    await client.post("/auth/register", json={**user, "email": "uploader@example.com"})
+    response = await client.post("/auth/login", json=user)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def send(
+    client: httpx.AsyncClient, mode: str, image: bytes, headers: Dict[str, str]
+) -> httpx.Response:
+    if mode == "base64_json":
+        body = json.dumps({"image_data": base64.b64encode(image).decode("ascii")})
+        return await client.post(
+            "/llm/process",
+            content=body,
+            headers={**headers, "Content-Type": "application/json"},
+        )
+    params = {"analyze": "true"} if mode == "upload_analyze" else {}
+    return await client.post(
+        "/files/upload",
+        params=params,
+        files={"file": ("bench.jpg", image, "image/jpeg")},
+        headers=headers,
+    )
+
+
+async def bench_mode(
+    app_url: str, pid: int, mode: str, sizes: List[int], repeat: int
+) -> Dict[str, Any]:
+    results = {}
+    async with httpx.AsyncClient(base_url=app_url, timeout=300.0) as client:
+        headers = await login(client)
+        # One small request first so imports and caches are not counted
+        await send(client, mode, fake_jpeg(64 * 1024), headers)
+        for size in sizes:
+            image = fake_jpeg(size)
+            footprints, latencies, statuses = [], [], {}
+            for _ in range(repeat):
+                reset_peak_rss(pid)
+                before = read_status_kb(pid, "VmRSS")
+                start = time.perf_counter()
+                response = await send(client, mode, image, headers)
+                latencies.append(time.perf_counter() - start)
+                footprints.append(read_status_kb(pid, "VmHWM") - before)
+                statuses[response.status_code] = (
+                    statuses.get(response.status_code, 0) + 1
+                )
+            results[f"{size // (1024 * 1024)}MB"] = {
+                "peak_rss_delta_mb": max(footprints) / 1024,
+                "file_to_peak_ratio": max(footprints) * 1024 / size,
+                "latency_ms": percentiles(latencies),
+                "statuses": statuses,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload memory footprint")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    fake_ollama.add_arguments(parser)
+    parser.set_defaults(latency=0.0, tokens=5)
+    args = parser.parse_args()
+
+    sizes = [mb * 1024 * 1024 for mb in sorted(args.sizes)]
+    env = {
+        "BCRYPT_ROUNDS": "4",
+        "MAX_FILE_SIZE": str(max(sizes) + 1024 * 1024),
+        "UPLOAD_DIR": tempfile.mkdtemp(prefix="visionai-uploads-"),
+    }
+    results = {}
+    for mode in args.modes:
+        with app_stack(args, env) as (app_url, server):
+            results[mode] = asyncio.run(
+                bench_mode(app_url, server.pid, mode, sizes, args.repeat)
+            )
+
+    if args.json:
+        write_report(results, None)
+        return
+
+    print(f"Peak server RSS above its starting point, worst of {args.repeat} requests")
+    for mode, by_size in results.items():
+        print(f"  {mode} ({MODES[mode]})")
+        for size, r in by_size.items():
+            print(
+                f"    {size:>5s}  +{r['peak_rss_delta_mb']:7.1f} MB "
+                f"({r['file_to_peak_ratio']:4.1f}x file)  "
+                f"p50 {r['latency_ms']['p50']:7.1f} ms  statuses {r['statuses']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
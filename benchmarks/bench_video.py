@@ -0,0 +1,146 @@
+# Video analysis jobs: LLM calls and job time as videos get longer or busier
+#
+# Usage: python -m benchmarks.bench_video [--seconds S ...] [--scenes N ...]
+#                                         [--fps F] [--json] [fake Ollama options]
+#
+# Synthetic videos are written with OpenCV: each scene is a smooth random
+# pattern panning a pixel per frame, alternating dark and light, so frames within
+# a scene differ a little and frames across a cut differ a lot. Two series run against one app server
+# (harness.app_stack): a fixed scene count with growing length, and a fixed
+# length with growing scene counts. LLM calls should follow scenes, not frames.
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from benchmarks import fake_ollama
+from benchmarks.bench_upload import login
+from benchmarks.harness import app_stack, write_report
+
+SIZE = (640, 360)
+
+
+def write_video(path: str, seconds: float, scenes: int, fps: int, seed: int = 0):
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, SIZE)
+    frames = int(seconds * fps)
+    per_scene = frames / scenes
+    pattern = None
+    for i in range(frames):
+        if i % per_scene < 1 or pattern is None:
+            low = 128 if int(i // per_scene) % 2 else 0
+            tile = rng.integers(low, low + 128, (9, 16, 3), dtype=np.uint8)
+            pattern = cv2.resize(tile, SIZE, interpolation=cv2.INTER_CUBIC)
+        writer.write(np.roll(pattern, int(i % per_scene), axis=1))
+    writer.release()
+
+
+async def run_job(
+    client: httpx.AsyncClient, path: str, headers: Dict[str, str]
+) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        response = await client.post(
+            "/files/upload",
+            files={"file": (os.path.basename(path), f, "video/mp4")},
+            headers=headers,
+        )
+    response.raise_for_status()
+    start = time.perf_counter()
+    response = await client.post(
+        "/video/jobs", json={"file_id": response.json()["file_id"]}, headers=headers
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    first_segment = None
+    async with client.stream(
+        "GET", f"/video/jobs/{job_id}/stream", headers=headers
+    ) as stream:
+        async for line in stream.aiter_lines():
+            event = json.loads(line)
+            if event["type"] == "segment" and first_segment is None:
+                first_segment = time.perf_counter() - start
+            if event["type"] == "done":
+                status = event
+    elapsed = time.perf_counter() - start
+    return {
+        "status": status["status"],
+        "frames": status["total_frames"],
+        "llm_calls": len(status["segments"]),
+        "job_s": elapsed,
+        "first_segment_s": first_segment,
+        "frames_per_s": status["total_frames"] / elapsed,
+    }
+
+
+async def bench(
+    app_url: str, cases: List[Tuple[str, float, int]], fps: int, workdir: str
+) -> Dict[str, Any]:
+    results = {}
+    async with httpx.AsyncClient(base_url=app_url, timeout=600.0) as client:
+        headers = await login(client)
+        for series, seconds, scenes in cases:
+            path = os.path.join(workdir, f"{seconds:g}s_{scenes}scenes.mp4")
+            if not os.path.exists(path):
+                write_video(path, seconds, scenes, fps)
+            result = await run_job(client, path, headers)
+            result["scenes"] = scenes
+            results.setdefault(series, {})[f"{seconds:g}s/{scenes}"] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video analysis jobs")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 30, 90])
+    parser.add_argument("--scenes", type=int, nargs="+", default=[2, 6, 18])
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    fake_ollama.add_arguments(parser)
+    parser.set_defaults(latency=0.2, tokens=5)
+    args = parser.parse_args()
+
+    # Length grows at the fewest scenes; scenes grow at the middle length
+    seconds, scenes = sorted(args.seconds), sorted(args.scenes)
+    cases = [("by_length", s, scenes[0]) for s in seconds] + [
+        ("by_scenes", seconds[len(seconds) // 2], n) for n in scenes
+    ]
+    workdir = tempfile.mkdtemp(prefix="visionai-videos-")
+    env = {
+        "BCRYPT_ROUNDS": "4",
+        "MAX_FILE_SIZE": str(1024 * 1024 * 1024),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "VIDEO_MAX_SEGMENTS": str(max(scenes) * 2),
+        # Jobs pay one LLM token per segment; pacing would hide the job time
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    with app_stack(args, env) as (app_url, _server):
+        results = asyncio.run(bench(app_url, cases, args.fps, workdir))
+
+    if args.json:
+        write_report(results, None)
+        return
+
+    print(f"{SIZE[0]}x{SIZE[1]} @ {args.fps} fps, LLM latency {args.latency}s")
+    for series, by_case in results.items():
+        print(f"  {series}")
+        for case, r in by_case.items():
+            print(
+                f"    {case:>10s}  {r['frames']:6d} frames  "
+                f"{r['llm_calls']:3d} LLM calls ({r['scenes']} scenes)  "
+                f"job {r['job_s']:6.2f}s  first segment {r['first_segment_s']:5.2f}s  "
+                f"{r['frames_per_s']:6.0f} frames/s  {r['status']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
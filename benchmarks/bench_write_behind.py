@@ -0,0 +1,140 @@
+# Login latency and database commits with and without the login write-behind buffer
+#
+# Usage: python -m benchmarks.bench_write_behind [--users N] [--logins N] [--concurrency N] [--json]
+#
+# Runs a bursty login storm three times against fresh SQLite databases:
+# inline writes, buffered last_login updates, and buffered last_login updates
+# plus session inserts.
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from typing import Any, Dict
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, create_engine, get_db
+from app.main import app
+from app.services.login_write_buffer import LoginWriteBuffer
+from benchmarks.bench_sqlite import auth_service, run_requests
+
+MODES = {
+    "inline": None,
+    "last_login": False,
+    "last_login+sessions": True,
+}
+
+
+async def bench_mode(
+    mode: str, users: int, logins: int, concurrency: int
+) -> Dict[str, Any]:
+    path = os.path.join(tempfile.mkdtemp(prefix="visionai-bench-"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(
+        bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    buffer_sessions = MODES[mode]
+    auth_service.login_writes = (
+        LoginWriteBuffer(
+            sessions,
+            settings.LOGIN_WRITE_BEHIND_INTERVAL,
+            settings.LOGIN_WRITE_BEHIND_MAX_BATCH,
+            buffer_sessions=buffer_sessions,
+            on_flushed_user=auth_service.invalidate_user,
+        )
+        if buffer_sessions is not None
+        else None
+    )
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            names = [f"wb{i}" for i in range(users)]
+            for name in names:
+                await client.post(
+                    "/auth/register",
+                    json={
+                        "username": name,
+                        "email": f"{name}@example.com",
+                        "password": "benchmark",
+                    },
+                )
+
+            commits = 0
+
+            def count_commit(conn):
+                nonlocal commits
+                commits += 1
+
+            event.listen(engine.sync_engine, "commit", count_commit)
+            if auth_service.login_writes:
+                auth_service.login_writes.start()
+            login = await run_requests(
+                [
+                    lambda name=names[i % users]: client.post(
+                        "/auth/login",
+                        json={"username": name, "password": "benchmark"},
+                    )
+                    for i in range(logins)
+                ],
+                concurrency,
+            )
+            if auth_service.login_writes:
+                await auth_service.login_writes.stop()
+                login["write_buffer"] = auth_service.login_writes.get_stats()
+            login["commits"] = commits
+            login["commits_per_login"] = commits / logins
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        auth_service.login_writes = None
+        await engine.dispose()
+    return login
+
+
+async def run(users: int, logins: int, concurrency: int) -> Dict[str, Any]:
+    results = {}
+    for mode in MODES:
+        results[mode] = await bench_mode(mode, users, logins, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login write-behind")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt rounds")
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    args = parser.parse_args()
+
+    auth_service.pwd_context.update(bcrypt__rounds=args.rounds)
+    results = asyncio.run(run(args.users, args.logins, args.concurrency))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.logins} logins by {args.users} users, concurrency {args.concurrency}")
+    for mode, r in results.items():
+        print(
+            f"  {mode:20s} {r['requests_per_second']:7.1f} logins/s  "
+            f"p50 {r['latency']['p50_ms']:7.1f} ms  p99 {r['latency']['p99_ms']:7.1f} ms  "
+            f"commits/login {r['commits_per_login']:5.2f}  statuses {r['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Local stand-in for the Ollama API used by benchmarks
+#
+# Usage: python -m benchmarks.fake_ollama [--port N] [--latency S] [--token-delay S]
+#                                        [--tokens N] [--failure-rate P] [--seed N]
+#
+# Serves /api/generate (streamed NDJSON or a single JSON reply, as the request
+# asks) and /api/tags. Latency is applied before the first token, then each
+# token is spaced by token_delay, so time-to-first-token and total duration
+# can be set independently. failure_rate is the fraction of requests answered
+# with a 500.
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MODELS = ["llava:7b", "whisper:latest"]
+
+
+def create_app(
+    latency: float = 0.2,
+    token_delay: float = 0.01,
+    tokens: int = 20,
+    failure_rate: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    rng = random.Random(seed)
+    app.state.requests = 0
+    app.state.failures = 0
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name} for name in MODELS]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "failures": app.state.failures}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        started = time.perf_counter_ns()
+
+        if rng.random() < failure_rate:
+            app.state.failures += 1
+            await asyncio.sleep(latency)
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+
+        words = [f"word{i} " for i in range(tokens)]
+        final = {
+            "model": body.get("model"),
+            "response": "",
+            "done": True,
+            "eval_count": tokens,
+        }
+
+        if not body.get("stream", True):
+            await asyncio.sleep(latency + token_delay * tokens)
+            final["response"] = "".join(words)
+            final["total_duration"] = time.perf_counter_ns() - started
+            return final
+
+        async def stream():
+            await asyncio.sleep(latency)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_delay)
+                yield json.dumps({"response": word, "done": False}) + "\n"
+            final["total_duration"] = time.perf_counter_ns() - started
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="Seconds to first token"
+    )
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency, args.token_delay, args.tokens, args.failure_rate, args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
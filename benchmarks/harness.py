@@ -0,0 +1,213 @@
+# Shared helpers for benchmarks that run the app as a real server
+import base64
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples: List[float], scale: float = 1e3) -> Dict[str, float]:
+    """p50/p90/p99/max of samples in seconds, reported in ms by default"""
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    samples = sorted(samples)
+    last = len(samples) - 1
+
+    def pick(q: float) -> float:
+        return samples[min(last, int(len(samples) * q))] * scale
+
+    return {
+        "count": len(samples),
+        "p50": pick(0.5),
+        "p90": pick(0.9),
+        "p99": pick(0.99),
+        "max": samples[-1] * scale,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """Run `python -m <module> ...` in a subprocess and wait until it answers"""
+
+    def __init__(
+        self,
+        args: List[str],
+        ready_url: str,
+        env: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+    ):
+        self.args = args
+        self.ready_url = ready_url
+        self.env = {**os.environ, **(env or {})}
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "ServerProcess":
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", *self.args], cwd=REPO_ROOT, env=self.env
+        )
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"{self.args[0]} exited with {self.process.returncode}"
+                )
+            try:
+                if httpx.get(self.ready_url, timeout=1.0).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"{self.args[0]} did not answer {self.ready_url}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+
+@contextmanager
+def app_stack(
+    args, env: Optional[Dict[str, str]] = None
+) -> Iterator[Tuple[str, ServerProcess]]:
+    """Run a fake Ollama and the app (uvicorn, one worker), yielding (url, server)
+
+    args carries the fake_ollama.add_arguments options. The app gets a
+    throwaway SQLite database and rate limiting off unless env overrides it.
+    """
+    ollama_port, app_port = free_port(), free_port()
+    ollama_url = f"http://127.0.0.1:{ollama_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    db_dir = tempfile.mkdtemp(prefix="visionai-bench-")
+    app_env = {
+        "OLLAMA_URL": ollama_url,
+        "DATABASE_URL": f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+        "RATE_LIMIT_ENABLED": "false",
+        "PUBSUB_TRANSPORT": "local",
+        **(env or {}),
+    }
+    fake_args = [
+        "--port", str(ollama_port),
+        "--latency", str(args.latency),
+        "--token-delay", str(args.token_delay),
+        "--tokens", str(args.tokens),
+        "--failure-rate", str(args.failure_rate),
+        "--seed", str(args.seed),
+    ]  # fmt: skip
+    app_args = [
+        "uvicorn",
+        "app.main:app",
+        "--host", "127.0.0.1",
+        "--port", str(app_port),
+        "--log-level", "warning",
+    ]  # fmt: skip
+
+    with ServerProcess(
+        ["benchmarks.fake_ollama", *fake_args], f"{ollama_url}/api/tags"
+    ), ServerProcess(app_args, f"{app_url}/health", env=app_env) as server:
+        yield app_url, server
+
+
+def sample_image() -> str:
+    """A camera-sized JPEG, base64 encoded"""
+    import cv2
+    import numpy as np
+
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return base64.b64encode(buffer.tobytes()).decode("utf-8")
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """User+system CPU time of a process and its children (Linux /proc)"""
+    with open(f"/proc/{pid}/stat") as f:
+        # Skip past the command name, which may contain spaces
+        fields = f.read().rsplit(")", 1)[1].split()
+    utime, stime, cutime, cstime = (int(v) for v in fields[11:15])
+    return (utime + stime + cutime + cstime) / os.sysconf("SC_CLK_TCK")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def report_metadata() -> Dict[str, Any]:
+    """Where and when a report was produced, for comparing runs"""
+    return {
+        "git_revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(report: Dict[str, Any], path: Optional[str]):
+    """Write a JSON report to path, or stdout when path is None or '-'"""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path in (None, "-"):
+        print(text)
+        return
+    with open(path, "w") as f:
+        f.write(text + "\n")
+
+
+def _numeric_leaves(value: Any, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: float(value)}
+    if isinstance(value, dict):
+        leaves = {}
+        for key, item in value.items():
+            leaves.update(_numeric_leaves(item, f"{prefix}.{key}" if prefix else key))
+        return leaves
+    return {}
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """One line per numeric result present in both reports, with the relative change"""
+    before = _numeric_leaves(baseline.get("results", {}))
+    after = _numeric_leaves(current.get("results", {}))
+    lines = [
+        f"baseline {baseline.get('meta', {}).get('git_revision')} -> "
+        f"current {current.get('meta', {}).get('git_revision')}"
+    ]
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+        lines.append(f"  {key:60s} {old:12.3f} -> {new:12.3f}  {change}")
+    return lines
@@ -0,0 +1,228 @@
+# End-to-end benchmark suite against a fake Ollama server
+#
+# Usage: python -m benchmarks.suite [--only CASE ...] [--output report.json]
+#                                   [--compare baseline.json] [fake Ollama options]
+#
+# Starts the fake Ollama server and the app (uvicorn, one worker) with
+# harness.app_stack, runs each case and writes a JSON report. Pass a previous
+# report to --compare to print relative changes between commits.
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import websockets
+
+from benchmarks import fake_ollama
+from benchmarks.harness import (
+    app_stack,
+    compare_reports,
+    percentiles,
+    report_metadata,
+    sample_image,
+    write_report,
+)
+
+CASES = ["llm_chat", "llm_process", "auth_login", "capture_frame", "ws_frames"]
+
+
+async def run_requests(
+    send: Callable[[], Any], requests: int, concurrency: int
+) -> Dict[str, Any]:
+    """Issue requests through send() with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send()
+            latencies.append(time.perf_counter() - start)
+            key = str(response.status_code)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": requests / elapsed,
+        "latency_ms": percentiles(latencies),
+        "statuses": statuses,
+    }
+
+
+async def login(client: httpx.AsyncClient, username: str) -> str:
+    """Register (if needed) and log in a benchmark user, returning its access token"""
+    await client.post(
+        "/auth/register",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "benchmark",
+        },
+    )
+    response = await client.post(
+        "/auth/login", json={"username": username, "password": "benchmark"}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def bench_llm_chat(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    return await run_requests(
+        lambda: client.post("/llm/chat", json={"prompt": "Describe the scene"}),
+        args.requests,
+        args.concurrency,
+    )
+
+
+async def bench_llm_process(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {await login(client, 'bench_process')}"}
+    body = {"image_data": sample_image(), "prompt": "Describe the scene"}
+    return await run_requests(
+        lambda: client.post("/llm/process", json=body, headers=headers),
+        args.requests,
+        args.concurrency,
+    )
+
+
+async def bench_auth_login(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    await login(client, "bench_login")
+    return await run_requests(
+        lambda: client.post(
+            "/auth/login", json={"username": "bench_login", "password": "benchmark"}
+        ),
+        args.logins,
+        args.concurrency,
+    )
+
+
+async def bench_capture_frame(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    # In-process: this measures the mock capture + JPEG + base64 path only
+    from app.models.schemas import CameraConfig
+    from app.services.camera_service import CameraService
+
+    camera = CameraService()
+    await camera.start_camera(CameraConfig())
+    samples = []
+    size = 0
+    try:
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            frame = await camera.capture_frame()
+            samples.append(time.perf_counter() - start)
+            size = len(frame)
+    finally:
+        await camera.stop()
+    return {
+        "frames": args.frames,
+        "frame_base64_bytes": size,
+        "frames_per_second": len(samples) / sum(samples),
+        "latency_ms": percentiles(samples),
+    }
+
+
+async def bench_ws_frames(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    ws_url = str(client.base_url).replace("http", "ws", 1) + "/ws/"
+    await client.post("/camera/start", json={"fps": args.fps})
+
+    async def viewer() -> Dict[str, Any]:
+        latencies = []
+        frames = 0
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            deadline = time.monotonic() + args.duration
+            while time.monotonic() < deadline:
+                try:
+                    raw = await asyncio.wait_for(
+                        ws.recv(), timeout=deadline - time.monotonic()
+                    )
+                except asyncio.TimeoutError:
+                    break
+                message = json.loads(raw)
+                if message.get("type") == "ping":
+                    await ws.send(json.dumps({"type": "pong"}))
+                elif message.get("type") == "frame":
+                    frames += 1
+                    latencies.append(time.time() - message["timestamp"])
+        return {"frames": frames, "latencies": latencies}
+
+    try:
+        viewers = await asyncio.gather(*[viewer() for _ in range(args.clients)])
+    finally:
+        await client.post("/camera/stop")
+
+    fps = [v["frames"] / args.duration for v in viewers]
+    return {
+        "clients": args.clients,
+        "target_fps": args.fps,
+        "duration": args.duration,
+        "achieved_fps_min": min(fps),
+        "achieved_fps_mean": sum(fps) / len(fps),
+        "frame_latency_ms": percentiles([l for v in viewers for l in v["latencies"]]),
+    }
+
+
+BENCHMARKS = {
+    "llm_chat": bench_llm_chat,
+    "llm_process": bench_llm_process,
+    "auth_login": bench_auth_login,
+    "capture_frame": bench_capture_frame,
+    "ws_frames": bench_ws_frames,
+}
+
+
+async def run_cases(base_url: str, cases: List[str], args) -> Dict[str, Any]:
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0) as client:
+        for case in cases:
+            results[case] = await BENCHMARKS[case](client, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument(
+        "--requests", type=int, default=50, help="LLM requests per case"
+    )
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=200, help="capture_frame calls")
+    parser.add_argument("--clients", type=int, default=4, help="WebSocket viewers")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--duration", type=float, default=5.0, help="WebSocket seconds")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--output", help="Write the JSON report here (default stdout)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    fake_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    env = {
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "MAX_CONNECTIONS": str(args.clients + 10),
+    }
+    with app_stack(args, env) as (app_url, _):
+        results = asyncio.run(run_cases(app_url, args.only, args))
+
+    report = {
+        "meta": report_metadata(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "only")
+        },
+        "results": results,
+    }
+    write_report(report, args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare_reports(json.load(f), report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# Synthetic WebSocket load: N viewers on /ws and /ws-direct with optional LLM traffic
+#
+# Usage: python -m benchmarks.ws_load [--clients N] [--endpoint ws|ws-direct|both]
+#                                     [--image-rate R] [--chat-rate R] [--duration S]
+#                                     [--url http://host:port [--server-pid PID]]
+#                                     [--output report.json] [--json]
+#
+# Without --url the app and a fake Ollama are started locally (harness.app_stack)
+# with the connection limit raised to fit the clients. Each client answers
+# heartbeats and records frame arrivals; process_image and chat_message
+# requests are spread over random clients as Poisson arrivals at the given
+# aggregate rates (messages per second). Replies on one socket come back in
+# request order, so LLM latency is matched FIFO per client.
+#
+# The clients run in this process; on a small host they compete with the
+# server for CPU, so compare server CPU % against the host's cores.
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks import fake_ollama
+from benchmarks.harness import (
+    app_stack,
+    percentiles,
+    process_cpu_seconds,
+    report_metadata,
+    sample_image,
+    write_report,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class LoadClient:
+    """One WebSocket viewer and its measurements"""
+
+    def __init__(self, index: int, url: str, encoding: str):
+        self.index = index
+        self.url = url
+        self.encoding = encoding
+        self.ws = None
+        self.connected = False
+        self.rejected = False
+        self.frames = 0
+        self.last_arrival: Optional[float] = None
+        self.gaps: List[float] = []
+        self.latencies: List[float] = []
+        self.pending: Deque[tuple] = deque()
+        self.llm_latencies: Dict[str, List[float]] = {"image": [], "chat": []}
+        self.llm_errors = 0
+        self.rate_limited = 0
+
+    def decode(self, raw: Any) -> Dict[str, Any]:
+        if isinstance(raw, bytes):
+            return msgpack.unpackb(raw, raw=False)
+        return json.loads(raw)
+
+    def encode(self, message: Dict[str, Any]) -> Any:
+        if self.encoding == "msgpack":
+            return msgpack.packb(message, use_bin_type=True)
+        return json.dumps(message)
+
+    async def send_request(self, kind: str, message: Dict[str, Any]):
+        if not self.connected:
+            return
+        self.pending.append((kind, time.perf_counter()))
+        try:
+            await self.ws.send(self.encode(message))
+        except websockets.ConnectionClosed:
+            self.pending.pop()
+
+    def _complete(self, ok: bool):
+        if not self.pending:
+            return
+        kind, sent = self.pending.popleft()
+        if ok:
+            self.llm_latencies[kind].append(time.perf_counter() - sent)
+        else:
+            self.llm_errors += 1
+
+    async def run(self, deadline: float):
+        subprotocols = ["msgpack"] if self.encoding == "msgpack" else None
+        try:
+            async with websockets.connect(
+                self.url, max_size=None, subprotocols=subprotocols
+            ) as ws:
+                self.ws = ws
+                self.connected = True
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    self.handle(self.decode(raw))
+        except websockets.ConnectionClosed as e:
+            # 1013 is the server refusing a connection over MAX_CONNECTIONS
+            self.rejected = not self.frames and e.code == 1013
+        finally:
+            self.connected = False
+
+    def handle(self, message: Dict[str, Any]):
+        kind = message.get("type")
+        if kind == "frame":
+            now = time.time()
+            self.frames += 1
+            self.latencies.append(now - message["timestamp"])
+            if self.last_arrival is not None:
+                self.gaps.append(now - self.last_arrival)
+            self.last_arrival = now
+        elif kind == "ping":
+            asyncio.ensure_future(self.ws.send(self.encode({"type": "pong"})))
+        elif kind == "llm_response":
+            self._complete(True)
+        elif kind == "error":
+            if message.get("code") == "rate_limited":
+                self.rate_limited += 1
+            self._complete(False)
+
+
+async def drive_requests(
+    clients: List[LoadClient],
+    kind: str,
+    rate: float,
+    deadline: float,
+    rng: random.Random,
+    image_data: Optional[str],
+):
+    """Send one request type as Poisson arrivals at rate/s to random clients"""
+    if rate <= 0:
+        return
+    while True:
+        delay = rng.expovariate(rate)
+        if time.monotonic() + delay >= deadline:
+            return
+        await asyncio.sleep(delay)
+        client = rng.choice(clients)
+        if kind == "image":
+            message = {
+                "type": "process_image",
+                "image_data": image_data,
+                "prompt": "Describe the scene",
+            }
+        else:
+            message = {"type": "chat_message", "message": "What do you see?"}
+        await client.send_request(kind, message)
+
+
+def summarize(clients: List[LoadClient], duration: float, fps: int) -> Dict[str, Any]:
+    connected = [c for c in clients if not c.rejected]
+    client_fps = [c.frames / duration for c in connected]
+    gaps = [g for c in connected for g in c.gaps]
+    interval = 1.0 / fps
+    return {
+        "clients": len(clients),
+        "rejected": len(clients) - len(connected),
+        "fps_per_client": {
+            "target": fps,
+            "min": min(client_fps, default=0.0),
+            "mean": statistics.fmean(client_fps) if client_fps else 0.0,
+            "max": max(client_fps, default=0.0),
+            "all": [round(value, 2) for value in client_fps],
+        },
+        "frame_interarrival_ms": percentiles(gaps),
+        # Spread of arrival gaps around the target interval
+        "frame_jitter_ms": {
+            "stdev": statistics.pstdev(gaps) * 1e3 if gaps else 0.0,
+            "mean_abs_deviation": (
+                statistics.fmean(abs(g - interval) for g in gaps) * 1e3 if gaps else 0.0
+            ),
+        },
+        "frame_latency_ms": percentiles([l for c in connected for l in c.latencies]),
+        "llm_latency_ms": {
+            kind: percentiles([l for c in clients for l in c.llm_latencies[kind]])
+            for kind in ("image", "chat")
+        },
+        "llm_errors": sum(c.llm_errors for c in clients),
+        "llm_rate_limited": sum(c.rate_limited for c in clients),
+        "llm_unanswered": sum(len(c.pending) for c in clients),
+    }
+
+
+async def run_load(base_url: str, args, server_pid: Optional[int]) -> Dict[str, Any]:
+    ws_base = base_url.replace("http", "ws", 1)
+    paths = {
+        "ws": ["/ws/"],
+        "ws-direct": ["/ws-direct"],
+        "both": ["/ws/", "/ws-direct"],
+    }
+    endpoints = paths[args.endpoint]
+    clients = [
+        LoadClient(i, ws_base + endpoints[i % len(endpoints)], args.encoding)
+        for i in range(args.clients)
+    ]
+    rng = random.Random(args.seed)
+    image_data = sample_image() if args.image_rate > 0 else None
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as http:
+        await http.post("/camera/start", json={"fps": args.fps})
+        try:
+            # Ramp connections so the handshake burst isn't part of the measurement
+            deadline = time.monotonic() + args.ramp + args.duration
+            tasks = []
+            for client in clients:
+                tasks.append(asyncio.ensure_future(client.run(deadline)))
+                await asyncio.sleep(args.ramp / max(1, len(clients)))
+
+            cpu_before = process_cpu_seconds(server_pid) if server_pid else None
+            started = time.monotonic()
+            for client in clients:
+                client.frames = 0
+                client.gaps.clear()
+                client.latencies.clear()
+                client.last_arrival = None
+            drivers = [
+                drive_requests(
+                    clients, "image", args.image_rate, deadline, rng, image_data
+                ),
+                drive_requests(clients, "chat", args.chat_rate, deadline, rng, None),
+            ]
+            await asyncio.gather(*tasks, *drivers)
+            elapsed = time.monotonic() - started
+            cpu_after = process_cpu_seconds(server_pid) if server_pid else None
+        finally:
+            await http.post("/camera/stop")
+
+    results = summarize(clients, elapsed, args.fps)
+    if cpu_before is not None:
+        cpu = cpu_after - cpu_before
+        results["server_cpu"] = {"seconds": cpu, "percent": cpu / elapsed * 100}
+    return results
+
+
+def print_summary(results: Dict[str, Any]):
+    fps = results["fps_per_client"]
+    print(
+        f"{results['clients']} clients ({results['rejected']} rejected), "
+        f"target {fps['target']} fps"
+    )
+    print(
+        f"  fps per client       min {fps['min']:.1f}  mean {fps['mean']:.1f}  max {fps['max']:.1f}"
+    )
+    for name in ("frame_interarrival_ms", "frame_latency_ms"):
+        p = results[name]
+        print(
+            f"  {name:20s} p50 {p['p50']:.1f}  p90 {p['p90']:.1f}  p99 {p['p99']:.1f}  max {p['max']:.1f}"
+        )
+    jitter = results["frame_jitter_ms"]
+    print(
+        f"  frame jitter (ms)    stdev {jitter['stdev']:.1f}  "
+        f"mean |gap - interval| {jitter['mean_abs_deviation']:.1f}"
+    )
+    for kind, p in results["llm_latency_ms"].items():
+        if p["count"]:
+            print(
+                f"  llm {kind:5s} latency ms  n={p['count']}  p50 {p['p50']:.0f}  p90 {p['p90']:.0f}  p99 {p['p99']:.0f}"
+            )
+    print(
+        f"  llm errors {results['llm_errors']}, rate limited {results['llm_rate_limited']}, "
+        f"unanswered {results['llm_unanswered']}"
+    )
+    if "server_cpu" in results:
+        cpu = results["server_cpu"]
+        print(
+            f"  server cpu           {cpu['seconds']:.2f}s ({cpu['percent']:.0f}% of one core)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate WebSocket viewer load")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument(
+        "--endpoint", choices=["ws", "ws-direct", "both"], default="both"
+    )
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--fps", type=int, default=15, help="Camera fps to request")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument(
+        "--ramp", type=float, default=1.0, help="Seconds to connect all"
+    )
+    parser.add_argument("--image-rate", type=float, default=0.0, help="process_image/s")
+    parser.add_argument("--chat-rate", type=float, default=0.0, help="chat_message/s")
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="Server PID for CPU with --url")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument(
+        "--json", action="store_true", help="Print machine-readable JSON"
+    )
+    fake_ollama.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.encoding == "msgpack" and msgpack is None:
+        parser.error("msgpack is not installed")
+
+    if args.url:
+        results = asyncio.run(run_load(args.url.rstrip("/"), args, args.server_pid))
+    else:
+        env = {"MAX_CONNECTIONS": str(args.clients + 10)}
+        with app_stack(args, env) as (app_url, server):
+            results = asyncio.run(run_load(app_url, args, server.pid))
+
+    report = {
+        "meta": report_metadata(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "json")
+        },
+        "results": results,
+    }
+    if args.output:
+        write_report(report, args.output)
+    if args.json:
+        write_report(report, None)
+    else:
+        print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
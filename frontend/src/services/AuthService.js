@@ -78,8 +78,9 @@ class AuthService {
         refresh_token: this.refreshToken
       });
 
-      const { access_token } = response.data;
-      this.setAccessToken(access_token);
+      // The server rotates refresh tokens, so keep the new one
+      const { access_token, refresh_token } = response.data;
+      this.setTokens(access_token, refresh_token);
       
       return { success: true, access_token };
     } catch (error) {
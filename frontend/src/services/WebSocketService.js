@@ -26,6 +26,11 @@ class WebSocketService {
     this.ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        if (data.type === 'ping') {
+          // Answer server heartbeats so the connection is not reaped
+          this.send({ type: 'pong', timestamp: data.timestamp });
+          return;
+        }
         if (this.onMessage) {
           this.onMessage(data);
         }